@@ -1,2 +1,10 @@
-from . import passstore
-from . import ui
+import importlib
+
+__all__ = ["passphrase", "passstore", "ui"]
+
+
+def __getattr__(name):
+    # Submodules are imported on first use, so the backend does not pull in Qt
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,12 +1,41 @@
-from PyQt5 import QtWidgets
-from . import PassPy, PassUI
 import sys
+import time
+import argparse
 
+# Time to the first painted window, reported by --startup-profile
+STARTUP_BUDGET = 0.5
 
-def run():
-    app = QtWidgets.QApplication([])  # Create an instance of QtWidgets.QApplication
-    passpy_obj = PassPy()  # Init of backend
-    PassUI(passpy_obj)  # Init of frontend
+
+def run(argv=None):
+    t_start = time.perf_counter()
+    parser = argparse.ArgumentParser(prog="passui")
+    parser.add_argument(
+        "--startup-profile", action="store_true",
+        help="print the startup times once the store is loaded, then quit")
+    args = parser.parse_args(argv)
+
+    from PyQt5 import QtWidgets
+    from .passphrase import CachedProvider, QtDialogProvider
+    from .passstore import PassStore
+    from .ui import PassUI
+    t_imports = time.perf_counter()
+
+    app = QtWidgets.QApplication(sys.argv[:1])  # Create an instance of QtWidgets.QApplication
+    # Selecting entries decrypts them, the passphrase is asked once for a while
+    passpy_obj = PassStore(passphrase_provider=CachedProvider(QtDialogProvider()))  # Init of backend
+    t_backend = time.perf_counter()
+    window = PassUI(passpy_obj)  # Init of frontend, painted before the store is loaded
+    t_window = time.perf_counter()
+
+    if args.startup_profile:
+        def report():
+            t_loaded = time.perf_counter()
+            print(f"imports:      {(t_imports - t_start) * 1000:7.1f} ms")
+            print(f"backend:      {(t_backend - t_imports) * 1000:7.1f} ms")
+            print(f"first window: {(t_window - t_start) * 1000:7.1f} ms (budget {STARTUP_BUDGET * 1000:.0f} ms)")
+            print(f"store loaded: {(t_loaded - t_start) * 1000:7.1f} ms")
+            app.exit(0 if t_window - t_start <= STARTUP_BUDGET else 1)
+        window.loaded.connect(report)
     sys.exit(app.exec_())  # Start the application
 
 
@@ -0,0 +1,536 @@
+"""archive.py - Directory archives streamed through an encrypted container
+
+encrypt_directory(zip=True) used to write a plaintext zip next to the
+directory, then encrypt it in memory. The archive is now written straight
+into a stream.EncryptedWriter, and read back from a stream.EncryptedReader
+member after member, so no plaintext archive ever reaches the disk and
+memory stays bounded by the chunk size.
+
+Written into a stream.SeekableWriter, a zip archive can also be read at
+random: its central directory, then the bytes of a single member.
+
+Besides zip, directories can be archived as tar, uncompressed or compressed
+with gzip, bzip2 or xz. Compression is done by blocks in threads, each
+block an independent member of the compressed stream, which every
+decompressor reads as one stream.
+"""
+
+import io
+import os
+import bz2
+import gzip
+import lzma
+import time
+import zlib
+import struct
+import tarfile
+import zipfile
+from collections import deque
+
+FORMATS = ("zip", "tar")
+CODECS = ("none", "gz", "bz2", "xz")
+
+# Default compression level of each codec
+LEVELS = {"gz": 6, "bz2": 9, "xz": 6}
+
+# Bytes copied at once between files and archives
+COPY_SIZE = 1 << 20
+
+# Uncompressed bytes per compressed block, one block per thread at a time
+BLOCK_SIZE = 4 << 20
+
+# Blocks in flight per thread, bounds the memory used by the compression
+MAX_PENDING_PER_THREAD = 2
+
+LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+LOCAL_SIGNATURE = b"PK\x03\x04"
+CENTRAL_SIGNATURE = b"PK\x01\x02"
+END_SIGNATURE = b"PK\x05\x06"
+DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+FLAG_ENCRYPTED = 0x01
+FLAG_DESCRIPTOR = 0x08
+ZIP64_EXTRA = 0x0001
+
+
+def iter_directory(path_abs_dir):
+    """Directories and files of a directory, as (path_abs, arcname) in walk order"""
+    for root, dirs, files in os.walk(path_abs_dir):
+        dirs.sort()
+        path_rel_root = os.path.relpath(root, path_abs_dir)
+        for name in dirs + sorted(files):
+            path_abs = os.path.join(root, name)
+            arcname = name if path_rel_root == "." else os.path.join(path_rel_root, name)
+            yield path_abs, arcname.replace(os.sep, "/")
+
+
+def directory_size(path_abs_dir):
+    """Number of files and bytes of a directory, the work of a job archiving it"""
+    nb_files = nb_bytes = 0
+    for root, dirs, files in os.walk(path_abs_dir):
+        for name in files:
+            try:
+                nb_bytes += os.path.getsize(os.path.join(root, name))
+                nb_files += 1
+            except OSError:
+                continue
+    return nb_files, nb_bytes
+
+
+def write_zip(path_abs_dir, file, compresslevel=6, job=None):
+    """Write a directory as a zip archive into an unseekable file
+
+    Args:
+        path_abs_dir: Directory to archive
+        file: Binary file to write to, e.g. a stream.EncryptedWriter
+        compresslevel: Deflate level
+        job: jobs.Job advanced by the bytes and files read, checked for cancellation
+
+    Returns:
+        int: Number of files archived
+    """
+    nb_files = 0
+    with zipfile.ZipFile(file, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as zf:
+        for path_abs, arcname in iter_directory(path_abs_dir):
+            if os.path.isdir(path_abs):
+                zf.write(path_abs, arcname + "/")
+                continue
+            zinfo = zipfile.ZipInfo.from_file(path_abs, arcname)
+            zinfo.compress_type = zipfile.ZIP_DEFLATED
+            with open(path_abs, "rb") as source, zf.open(zinfo, "w") as dest:
+                while True:
+                    data = source.read(COPY_SIZE)
+                    if not data:
+                        break
+                    dest.write(data)
+                    if job is not None:
+                        job.advance(nbytes=len(data))
+            nb_files += 1
+            if job is not None:
+                job.advance(files=1)
+    return nb_files
+
+
+def _read_exact(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated zip archive")
+    return data
+
+
+def _safe_path(path_abs_dest, arcname):
+    """Destination of an archive member, refusing paths outside path_abs_dest"""
+    parts = [part for part in arcname.replace("\\", "/").split("/") if part not in ("", ".")]
+    if arcname.startswith("/") or ".." in parts or (parts and ":" in parts[0]):
+        raise ValueError(f"Unsafe path in archive: {arcname}")
+    return os.path.join(path_abs_dest, *parts)
+
+
+def _has_zip64(extra):
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, size = struct.unpack("<HH", extra[offset:offset + 4])
+        if header_id == ZIP64_EXTRA:
+            return True
+        offset += 4 + size
+    return False
+
+
+def _copy_stored(file, dest, size):
+    crc = 0
+    while size:
+        data = _read_exact(file, min(COPY_SIZE, size))
+        size -= len(data)
+        crc = zlib.crc32(data, crc)
+        dest.write(data)
+    return crc
+
+
+def _copy_deflated(file, dest):
+    """Inflate a member up to the end of its deflate stream
+
+    Returns:
+        tuple: CRC32 of the data, bytes read past the end of the stream
+    """
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    crc = 0
+    while not decompressor.eof:
+        data = file.read1(COPY_SIZE)
+        if not data:
+            raise ValueError("Truncated zip archive")
+        data = decompressor.decompress(data)
+        crc = zlib.crc32(data, crc)
+        dest.write(data)
+    return crc, decompressor.unused_data
+
+
+class _Pushback:
+    """Binary reader with bytes put back in front of it"""
+
+    def __init__(self, file):
+        self.file = file
+        self.pending = b""
+
+    def unread(self, data):
+        self.pending = data + self.pending
+
+    def read(self, size):
+        data, self.pending = self.pending[:size], self.pending[size:]
+        if len(data) < size:
+            data += self.file.read(size - len(data))
+        return data
+
+    def read1(self, size):
+        if self.pending:
+            return self.read(min(size, len(self.pending)))
+        return self.file.read1(size)
+
+
+def extract_zip(file, path_abs_dest, job=None):
+    """Extract a zip archive from an unseekable file, member by member
+
+    Only the local file headers are used, the central directory at the end
+    of the archive is skipped.
+
+    Args:
+        file: Buffered binary file to read from, e.g. EncryptedReader.reader()
+        path_abs_dest: Directory to extract into
+        job: jobs.Job advanced by the files extracted, checked for cancellation
+
+    Returns:
+        int: Number of files extracted
+
+    Raises:
+        ValueError: If the archive is truncated, corrupted or unsafe
+    """
+    file = _Pushback(file)
+    nb_files = 0
+    os.makedirs(path_abs_dest, exist_ok=True)
+    while True:
+        signature = file.read(4)
+        if signature in (CENTRAL_SIGNATURE, END_SIGNATURE):
+            return nb_files
+        if signature != LOCAL_SIGNATURE:
+            raise ValueError("Truncated zip archive" if not signature else "Invalid zip local header")
+        file.unread(signature)
+        (_, _, flags, method, mtime, mdate, crc, compressed_size, size,
+         name_length, extra_length) = LOCAL_HEADER.unpack(_read_exact(file, LOCAL_HEADER.size))
+        name = _read_exact(file, name_length).decode("utf-8" if flags & 0x800 else "cp437")
+        extra = _read_exact(file, extra_length)
+        if flags & FLAG_ENCRYPTED:
+            raise ValueError(f"Encrypted zip member not supported: {name}")
+        if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise ValueError(f"Unsupported compression method {method} for {name}")
+        zip64 = _has_zip64(extra)
+        if zip64 and not flags & FLAG_DESCRIPTOR:
+            raise ValueError(f"Zip64 member without data descriptor not supported: {name}")
+
+        path_abs = _safe_path(path_abs_dest, name)
+        is_dir = name.endswith("/")
+        if is_dir:
+            os.makedirs(path_abs, exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(path_abs), exist_ok=True)
+        with open(os.devnull if is_dir else path_abs, "wb") as dest:
+            if method == zipfile.ZIP_DEFLATED:
+                crc_data, unused = _copy_deflated(file, dest)
+                file.unread(unused)
+            elif flags & FLAG_DESCRIPTOR:
+                raise ValueError(f"Stored zip member with data descriptor not supported: {name}")
+            else:
+                crc_data = _copy_stored(file, dest, compressed_size)
+
+        if flags & FLAG_DESCRIPTOR:
+            data = _read_exact(file, 4)
+            if data != DESCRIPTOR_SIGNATURE:
+                file.unread(data)
+            crc = struct.unpack("<I", _read_exact(file, 4))[0]
+            _read_exact(file, 16 if zip64 else 8)
+        if crc_data != crc:
+            raise ValueError(f"Bad CRC for {name}")
+        if not is_dir:
+            date_time = (
+                (mdate >> 9) + 1980, (mdate >> 5) & 0x0f, mdate & 0x1f,
+                mtime >> 11, (mtime >> 5) & 0x3f, (mtime & 0x1f) * 2, 0, 0, -1)
+            try:
+                timestamp = time.mktime(date_time)
+                os.utime(path_abs, (timestamp, timestamp))
+            except (OverflowError, ValueError):
+                pass
+            nb_files += 1
+            if job is not None:
+                job.advance(files=1)
+
+
+def compress_block(codec, level, data):
+    if codec == "gz":
+        # mtime=0 so that the same directory gives the same archive
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if codec == "bz2":
+        return bz2.compress(data, compresslevel=level)
+    return lzma.compress(data, preset=level)
+
+
+class BlockCompressor(io.RawIOBase):
+    """Writable file compressing blocks in threads, written in order to a file
+
+    zlib, bz2 and lzma release the GIL while compressing, so the blocks
+    really are compressed in parallel.
+    """
+
+    def __init__(self, file, codec, level=None, threads=None, block_size=BLOCK_SIZE):
+        """
+        Args:
+            file: Binary file receiving the compressed stream
+            codec: "gz", "bz2" or "xz"
+            level: Compression level, LEVELS[codec] if None
+            threads: Number of compression threads, the number of CPUs if None
+            block_size: Uncompressed bytes per block
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        self.file = file
+        self.codec = codec
+        self.level = LEVELS[codec] if level is None else level
+        self.threads = threads or os.cpu_count() or 1
+        self.block_size = block_size
+        self._buffer = bytearray()
+        self._pending = deque()
+        self._executor = ThreadPoolExecutor(max_workers=self.threads)
+
+    def writable(self):
+        return True
+
+    def _submit(self, data):
+        if len(self._pending) >= self.threads * MAX_PENDING_PER_THREAD:
+            self.file.write(self._pending.popleft().result())
+        self._pending.append(self._executor.submit(compress_block, self.codec, self.level, bytes(data)))
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._submit(self._buffer[:self.block_size])
+            del self._buffer[:self.block_size]
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._buffer or not self._pending:
+                self._submit(self._buffer)
+                self._buffer = bytearray()
+            while self._pending:
+                self.file.write(self._pending.popleft().result())
+        finally:
+            self._executor.shutdown(cancel_futures=True)
+            super().close()
+
+
+def _decompressor(codec):
+    if codec == "gz":
+        return zlib.decompressobj(wbits=31)
+    if codec == "bz2":
+        return bz2.BZ2Decompressor()
+    return lzma.LZMADecompressor()
+
+
+class StreamDecompressor(io.RawIOBase):
+    """Readable file decompressing a stream of concatenated members"""
+
+    def __init__(self, file, codec):
+        self.file = file
+        self.codec = codec
+        self._decompressor = _decompressor(codec)
+        self._data = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._data:
+            if self._decompressor.eof:
+                unused = self._decompressor.unused_data
+                if not unused:
+                    unused = self.file.read1(COPY_SIZE)
+                    if not unused:
+                        return 0
+                # Next member of the stream
+                self._decompressor = _decompressor(self.codec)
+            else:
+                unused = self.file.read1(COPY_SIZE)
+                if not unused:
+                    raise ValueError("Truncated compressed stream")
+            self._data = self._decompressor.decompress(unused)
+        size = min(len(buffer), len(self._data))
+        buffer[:size] = self._data[:size]
+        self._data = self._data[size:]
+        return size
+
+
+def detect_codec(file):
+    """Codec of a compressed stream from its first bytes
+
+    Args:
+        file: Buffered binary file, not consumed
+
+    Returns:
+        str: One of CODECS
+    """
+    head = file.peek(6)[:6]
+    if head.startswith(b"\x1f\x8b"):
+        return "gz"
+    if head.startswith(b"BZh"):
+        return "bz2"
+    if head.startswith(b"\xfd7zXZ\x00"):
+        return "xz"
+    return "none"
+
+
+def write_tar(path_abs_dir, file, codec="gz", level=None, threads=None, job=None):
+    """Write a directory as a compressed tar archive into an unseekable file
+
+    Args:
+        path_abs_dir: Directory to archive
+        file: Binary file to write to, e.g. a stream.EncryptedWriter
+        codec: One of CODECS
+        level: Compression level, LEVELS[codec] if None
+        threads: Number of compression threads, the number of CPUs if None
+        job: jobs.Job advanced by the bytes and files read, checked for cancellation
+
+    Returns:
+        int: Number of files archived
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec {codec!r}, expected one of {CODECS}")
+    compressor = None
+    if codec != "none":
+        compressor = BlockCompressor(file, codec, level=level, threads=threads)
+        file = io.BufferedWriter(compressor, buffer_size=COPY_SIZE)
+    nb_files = 0
+    try:
+        with tarfile.open(fileobj=file, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+            for path_abs, arcname in iter_directory(path_abs_dir):
+                tarinfo = tar.gettarinfo(path_abs, arcname)
+                if not tarinfo.isreg():
+                    tar.addfile(tarinfo)
+                    continue
+                with open(path_abs, "rb") as f:
+                    tar.addfile(tarinfo, f if job is None else job.reader(f))
+                nb_files += 1
+                if job is not None:
+                    job.advance(files=1)
+    finally:
+        if compressor is not None:
+            file.close()
+    return nb_files
+
+
+def extract_tar(file, path_abs_dest, job=None):
+    """Extract a tar archive, compressed or not, from an unseekable file
+
+    Args:
+        file: Buffered binary file to read from, e.g. EncryptedReader.reader()
+        path_abs_dest: Directory to extract into
+        job: jobs.Job advanced by the files extracted, checked for cancellation
+
+    Returns:
+        int: Number of files extracted
+
+    Raises:
+        ValueError: If the archive is truncated, corrupted or unsafe
+    """
+    codec = detect_codec(file)
+    if codec != "none":
+        file = io.BufferedReader(StreamDecompressor(file, codec), buffer_size=COPY_SIZE)
+    nb_files = 0
+    os.makedirs(path_abs_dest, exist_ok=True)
+    try:
+        with tarfile.open(fileobj=file, mode="r|") as tar:
+            if hasattr(tarfile, "data_filter"):
+                tar.extraction_filter = tarfile.data_filter
+            for member in tar:
+                _safe_path(path_abs_dest, member.name)
+                if not (member.isfile() or member.isdir()):
+                    raise ValueError(f"Unsupported tar member type: {member.name}")
+                # Streamed archives are extracted member by member
+                tar.extract(member, path_abs_dest, set_attrs=member.isfile())
+                if member.isfile():
+                    nb_files += 1
+                    if job is not None:
+                        job.advance(files=1)
+    except tarfile.TarError as e:
+        raise ValueError(f"Invalid tar archive: {e}")
+    return nb_files
+
+
+def archive_suffix(format="zip", codec="gz"):
+    """Extension of an archive, before .bgpg"""
+    if format == "zip":
+        return ".zip"
+    return ".tar" if codec == "none" else f".tar.{codec}"
+
+
+def extract(file, path_abs_dest, job=None):
+    """Extract a zip or tar archive, detected from its first bytes
+
+    Args:
+        file: Buffered binary file to read from, e.g. EncryptedReader.reader()
+        path_abs_dest: Directory to extract into
+        job: jobs.Job advanced by the files extracted, checked for cancellation
+
+    Returns:
+        int: Number of files extracted
+    """
+    if file.peek(4)[:4] == LOCAL_SIGNATURE:
+        return extract_zip(file, path_abs_dest, job=job)
+    return extract_tar(file, path_abs_dest, job=job)
+
+
+def list_zip(file):
+    """Names of the files of a zip archive, from its central directory
+
+    Args:
+        file: Seekable binary file to read from, e.g. SeekableReader.reader()
+    """
+    with zipfile.ZipFile(file) as zip_file:
+        return [info.filename for info in zip_file.infolist() if not info.is_dir()]
+
+
+def extract_member(file, name, path_abs_dest):
+    """Extract one file of a zip archive, only its bytes are read
+
+    Args:
+        file: Seekable binary file to read from, e.g. SeekableReader.reader()
+        name: Name of the file in the archive
+        path_abs_dest: Path to the extracted file
+
+    Returns:
+        int: Size of the extracted file
+
+    Raises:
+        KeyError: If the archive has no such file
+    """
+    path_tmp = path_abs_dest + ".tmp"
+    size = 0
+    try:
+        with zipfile.ZipFile(file) as zip_file, zip_file.open(name) as source, open(path_tmp, "wb") as dest:
+            while True:
+                data = source.read(COPY_SIZE)
+                if not data:
+                    break
+                dest.write(data)
+                size += len(data)
+        os.replace(path_tmp, path_abs_dest)
+    finally:
+        if os.path.exists(path_tmp):
+            os.remove(path_tmp)
+    return size
+
+
+def strip_suffix(path_abs):
+    """Directory extracted from an archive path, without .bgpg and the archive extension"""
+    if path_abs.endswith(".bgpg"):
+        path_abs = path_abs[:-len(".bgpg")]
+    for suffix in [".zip", ".tar"] + [f".tar.{codec}" for codec in CODECS if codec != "none"]:
+        if path_abs.endswith(suffix):
+            return path_abs[:-len(suffix)]
+    return path_abs
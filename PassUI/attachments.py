@@ -0,0 +1,151 @@
+"""attachments.py - Binary files attached to entries
+
+An entry stays a small OpenPGP message holding its fields. Each attached
+file is encrypted on its own in a seekable stream container (see
+stream.py), as <entry>.attachments/<name>.bgpg, and linked from the entry
+by an "attachment/<name>" field holding its size. Showing an entry only
+decrypts the entry, an attachment is decrypted when asked for, chunk by
+chunk, to a file or to memory, or only in part, e.g. for a preview.
+"""
+
+import os
+import shutil
+from PassUI import stream
+
+SUFFIX = ".attachments"
+FIELD_PREFIX = "attachment/"
+
+# Bytes read from the attached file per write to the container
+COPY_SIZE = stream.CHUNK_SIZE
+
+
+def check_name(name):
+    """
+    Raises:
+        ValueError: If the name cannot be used as the file name of a blob
+    """
+    if not name or name.startswith(".") or any(c in name for c in "/\\:\n\r\0"):
+        raise ValueError(f"Invalid attachment name: {name!r}")
+
+
+def directory(path_abs_store, path_rel):
+    """Directory holding the blobs of an entry"""
+    return os.path.join(path_abs_store, path_rel + SUFFIX)
+
+
+def blob_files(path_abs_store, path_rel):
+    """File names of the blobs of an entry, to commit them along with the entry"""
+    path_abs_dir = directory(path_abs_store, path_rel)
+    return sorted(os.listdir(path_abs_dir)) if os.path.isdir(path_abs_dir) else []
+
+
+def blob_path(path_abs_store, path_rel, name):
+    check_name(name)
+    return os.path.join(directory(path_abs_store, path_rel), name + ".bgpg")
+
+
+def field(name):
+    """Field of the entry linking to an attachment"""
+    return FIELD_PREFIX + name
+
+
+def names(data_dict):
+    """Names of the attachments linked from the fields of an entry
+
+    Args:
+        data_dict: Fields of the entry, a dictionary or an entry.Entry
+    """
+    return [key[len(FIELD_PREFIX):] for key in data_dict.keys() if key.startswith(FIELD_PREFIX)]
+
+
+def write(file, path_abs_blob, recipients, job=None):
+    """Encrypt a file to a blob, chunk by chunk
+
+    Args:
+        file: Binary file to read the attachment from
+        path_abs_blob: Path to the blob, replaced once complete
+        recipients: Public keys able to read the blob
+        job: jobs.Job advanced as bytes are encrypted
+
+    Returns:
+        int: Size of the attachment in bytes
+    """
+    os.makedirs(os.path.dirname(path_abs_blob), exist_ok=True)
+    path_tmp = path_abs_blob + ".tmp"
+    size = 0
+    try:
+        with open(path_tmp, "wb") as f:
+            with stream.SeekableWriter(f, recipients) as writer:
+                while True:
+                    data = file.read(COPY_SIZE)
+                    if not data:
+                        break
+                    writer.write(data)
+                    size += len(data)
+                    if job is not None:
+                        job.advance(nbytes=len(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path_tmp, path_abs_blob)
+    finally:
+        if os.path.exists(path_tmp):
+            os.remove(path_tmp)
+    return size
+
+
+def copy(path_abs_blob, file, decryptor, job=None):
+    """Decrypt a blob to a file, chunk by chunk
+
+    Args:
+        path_abs_blob: Path to the blob
+        file: Binary file to write the attachment to
+        decryptor: gpg.Decryptor holding a key of a recipient
+        job: jobs.Job advanced as bytes are decrypted
+
+    Returns:
+        int: Size of the attachment in bytes
+
+    Raises:
+        ValueError: If the blob cannot be decrypted or is truncated
+    """
+    size = 0
+    with open(path_abs_blob, "rb") as f:
+        for chunk in stream.open_reader(f, decryptor):
+            file.write(chunk)
+            size += len(chunk)
+            if job is not None:
+                job.advance(nbytes=len(chunk))
+    return size
+
+
+def read_range(path_abs_blob, offset, length, decryptor):
+    """Decrypt part of a blob, e.g. the first bytes for a preview
+
+    Returns:
+        bytes: The plaintext from offset, shorter past the end of the attachment
+
+    Raises:
+        ValueError: If the blob is not seekable, cannot be decrypted or is truncated
+    """
+    with open(path_abs_blob, "rb") as f:
+        return stream.SeekableReader(f, decryptor).read(offset, length)
+
+
+def move(path_abs_store, path_rel_old, path_rel_new):
+    """Move the blobs of an entry along with the entry"""
+    path_abs_old = directory(path_abs_store, path_rel_old)
+    if os.path.isdir(path_abs_old):
+        os.makedirs(os.path.dirname(directory(path_abs_store, path_rel_new)), exist_ok=True)
+        os.rename(path_abs_old, directory(path_abs_store, path_rel_new))
+
+
+def copy_all(path_abs_store, path_rel, path_rel_new):
+    """Copy the blobs of an entry along with the entry, e.g. when it is duplicated"""
+    path_abs_dir = directory(path_abs_store, path_rel)
+    if os.path.isdir(path_abs_dir):
+        shutil.copytree(path_abs_dir, directory(path_abs_store, path_rel_new))
+
+
+def remove_all(path_abs_store, path_rel):
+    """Remove the blobs of an entry along with the entry"""
+    shutil.rmtree(directory(path_abs_store, path_rel), ignore_errors=True)
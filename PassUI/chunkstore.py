@@ -0,0 +1,322 @@
+"""chunkstore.py - Deduplicated storage of the versions of large files
+
+encrypt_file writes a whole .bgpg for each version of a file, even when
+consecutive versions, e.g. nightly database dumps, share most of their
+bytes. A chunk store cuts files into chunks at boundaries defined by their
+content, so that an insertion only changes the chunks around it, and keeps
+each chunk once, encrypted and named by a keyed hash of its content. A
+version is a manifest listing its chunks: storing a version close to an
+earlier one writes its few new chunks and its manifest.
+
+Boundaries are searched after newlines: a chunk ends after a newline when
+the keyed CRC-32 of the bytes before it has its low bits at zero. The
+search runs in C, with bytes.find and zlib.crc32, where a rolling hash
+updated byte by byte in Python would be an order of magnitude slower.
+Data without newlines gets chunks of the maximum size.
+
+Layout of a store:
+    config.json             Chunking parameters
+    key.bgpg                Keys of the store, an OpenPGP message for the recipients
+    chunks/<ab>/<id>        Chunks, a nonce then the AES-256-GCM ciphertext
+    versions/<name>.bgpg    Manifests, encrypted with the key of the store
+"""
+
+import os
+import hmac
+import json
+import time
+import zlib
+import hashlib
+from PassUI import gpg
+
+STORE_NAME = ".passui-chunks"
+VERSION = 1
+
+# Chunk sizes: past MIN_SIZE, a chunk ends after about 2 ** MASK_BITS lines,
+# e.g. 1 MB of 200 bytes lines
+MIN_SIZE = 256 << 10
+MAX_SIZE = 8 << 20
+MASK_BITS = 12
+
+# Bytes before a newline hashed to decide on a boundary
+WINDOW = 48
+
+# Bytes read from the file at once
+READ_SIZE = 16 << 20
+
+NONCE_SIZE = 12
+
+
+def iter_chunks(file, seed, min_size=MIN_SIZE, max_size=MAX_SIZE, mask_bits=MASK_BITS):
+    """Cut a file into chunks at boundaries defined by its content
+
+    Args:
+        file: Binary file to read from
+        seed: Key of the boundaries, the CRC-32 initial value
+        min_size: Bytes of a chunk before a boundary is looked for
+        max_size: Bytes of a chunk without boundary
+        mask_bits: Low bits of the CRC-32 at zero at a boundary
+
+    Yields:
+        bytes: The chunks, in order
+    """
+    mask = (1 << mask_bits) - 1
+    crc32 = zlib.crc32
+    data = b""
+    view = memoryview(data)
+    start = 0
+    eof = False
+    while True:
+        if not eof and len(data) - start < max_size:
+            block = file.read(READ_SIZE)
+            if block:
+                # The remainder is copied once per block read
+                data = data[start:] + block
+                view = memoryview(data)
+                start = 0
+                continue
+            eof = True
+        if start >= len(data):
+            return
+        limit = min(start + max_size, len(data))
+        cut = limit
+        find = data.find
+        index = find(b"\n", start + min_size - 1, limit)
+        while index != -1:
+            # One check per line, the window is hashed without a copy
+            if not crc32(view[max(index + 1 - WINDOW, start):index + 1], seed) & mask:
+                cut = index + 1
+                break
+            index = find(b"\n", index + 1, limit)
+        yield data[start:cut]
+        start = cut
+
+
+def check_name(name):
+    """
+    Raises:
+        ValueError: If the name cannot be used as the file name of a version
+    """
+    if not name or name.startswith(".") or any(c in name for c in "/\\:\n\r\0"):
+        raise ValueError(f"Invalid version name: {name!r}")
+
+
+def _write_atomic(path_abs, data):
+    path_tmp = f"{path_abs}.{os.getpid()}.tmp"
+    try:
+        with open(path_tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path_tmp, path_abs)
+    finally:
+        if os.path.exists(path_tmp):
+            os.remove(path_tmp)
+
+
+class ChunkStore:
+    """Encrypted, content-addressed chunks and the manifests of the versions"""
+
+    def __init__(self, path_abs_store, decryptor=None, recipients=None,
+                 min_size=MIN_SIZE, max_size=MAX_SIZE, mask_bits=MASK_BITS):
+        """Open a chunk store, created if recipients are given
+
+        Args:
+            path_abs_store: Directory of the store
+            decryptor: gpg.Decryptor holding a key of a recipient, needed
+                to read or add to an existing store
+            recipients: Public keys able to read a new store
+            min_size: Bytes of a chunk before a boundary is looked for, for a new store
+            max_size: Bytes of a chunk without boundary, for a new store
+            mask_bits: Lines between boundaries as a power of two, for a new store
+
+        Raises:
+            FileNotFoundError: If the store does not exist and no recipients are given
+        """
+        self.path = path_abs_store
+        self.decryptor = decryptor
+        self._aesgcm = None
+        self._id_key = None
+        path_config = os.path.join(self.path, "config.json")
+        if not os.path.exists(path_config):
+            if recipients is None:
+                raise FileNotFoundError(f"Chunk store not found: {self.path}")
+            self._create(recipients, {
+                "version": VERSION, "min_size": min_size, "max_size": max_size, "mask_bits": mask_bits})
+        with open(path_config, encoding="utf-8") as f:
+            self.config = json.load(f)
+        if self.config.get("version") != VERSION:
+            raise ValueError(f"Unsupported chunk store version {self.config.get('version')}")
+
+    def close(self):
+        """Forget the unwrapped keys of the store and its decryptor"""
+        self._aesgcm = None
+        self._id_key = None
+        self.decryptor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _create(self, recipients, config):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        os.makedirs(os.path.join(self.path, "chunks"), exist_ok=True)
+        os.makedirs(os.path.join(self.path, "versions"), exist_ok=True)
+        keys = AESGCM.generate_key(bit_length=256) + os.urandom(32)
+        _write_atomic(os.path.join(self.path, "key.bgpg"), gpg.encrypt_to(recipients, keys))
+        _write_atomic(os.path.join(self.path, "config.json"), json.dumps(config).encode("utf-8"))
+        self._load_keys(keys)
+
+    def _load_keys(self, keys):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        self._aesgcm = AESGCM(keys[:32])
+        self._id_key = keys[32:64]
+
+    def _keys(self):
+        """Key of the chunks and key of their ids, unwrapped on first use"""
+        if self._aesgcm is None:
+            if self.decryptor is None:
+                raise ValueError("A decryptor is needed to open the chunk store")
+            with open(os.path.join(self.path, "key.bgpg"), "rb") as f:
+                keys = self.decryptor.decrypt(f.read())
+            if isinstance(keys, str):
+                keys = keys.encode("latin-1")
+            self._load_keys(bytes(keys))
+        return self._aesgcm, self._id_key
+
+    def chunk_id(self, data):
+        return hmac.new(self._keys()[1], data, hashlib.sha256).hexdigest()
+
+    def chunk_path(self, chunk_id):
+        return os.path.join(self.path, "chunks", chunk_id[:2], chunk_id)
+
+    def version_path(self, name):
+        check_name(name)
+        return os.path.join(self.path, "versions", name + ".bgpg")
+
+    def seed(self):
+        """Key of the chunk boundaries, so that they do not reveal the content"""
+        return int.from_bytes(hmac.new(self._keys()[1], b"boundaries", hashlib.sha256).digest()[:4], "big")
+
+    def _encrypt(self, data, aad):
+        nonce = os.urandom(NONCE_SIZE)
+        return nonce + self._keys()[0].encrypt(nonce, data, aad)
+
+    def _decrypt(self, data, aad):
+        from cryptography.exceptions import InvalidTag
+        try:
+            return self._keys()[0].decrypt(data[:NONCE_SIZE], data[NONCE_SIZE:], aad)
+        except InvalidTag:
+            raise ValueError("Corrupted chunk store data")
+
+    def add(self, file, name, job=None):
+        """Store a version of a file, only its new chunks are written
+
+        Args:
+            file: Binary file to read the version from
+            name: Name of the version
+            job: jobs.Job advanced as bytes are chunked, checked between chunks
+
+        Returns:
+            dict: Number of chunks, of new chunks, size of the version and
+                bytes of new chunks written
+        """
+        path_abs_version = self.version_path(name)
+        report = {"chunks": 0, "new": 0, "size": 0, "written": 0}
+        chunks = []
+        sha256 = hashlib.sha256()
+        for data in iter_chunks(
+                file, self.seed(), self.config["min_size"], self.config["max_size"], self.config["mask_bits"]):
+            if job is not None:
+                job.check()
+            chunk_id = self.chunk_id(data)
+            path_abs_chunk = self.chunk_path(chunk_id)
+            if not os.path.exists(path_abs_chunk):
+                os.makedirs(os.path.dirname(path_abs_chunk), exist_ok=True)
+                _write_atomic(path_abs_chunk, self._encrypt(data, bytes.fromhex(chunk_id)))
+                report["new"] += 1
+                report["written"] += len(data)
+            chunks.append([chunk_id, len(data)])
+            sha256.update(data)
+            report["chunks"] += 1
+            report["size"] += len(data)
+            if job is not None:
+                job.advance(nbytes=len(data))
+        manifest = {
+            "version": VERSION,
+            "name": name,
+            "time": time.time(),
+            "size": report["size"],
+            "sha256": sha256.hexdigest(),
+            "chunks": chunks,
+        }
+        _write_atomic(path_abs_version, self._encrypt(json.dumps(manifest).encode("utf-8"), name.encode("utf-8")))
+        return report
+
+    def versions(self):
+        """Names of the stored versions, no key needed"""
+        return sorted(
+            name[:-len(".bgpg")] for name in os.listdir(os.path.join(self.path, "versions"))
+            if name.endswith(".bgpg"))
+
+    def manifest(self, name):
+        with open(self.version_path(name), "rb") as f:
+            return json.loads(self._decrypt(f.read(), name.encode("utf-8")))
+
+    def restore(self, name, file, job=None):
+        """Write a version back, each chunk checked against its id
+
+        Args:
+            name: Name of the version
+            file: Binary file to write the version to
+            job: jobs.Job advanced as bytes are written, checked between chunks
+
+        Returns:
+            int: Size of the version
+
+        Raises:
+            ValueError: If a chunk is corrupted or the version does not match its checksum
+        """
+        manifest = self.manifest(name)
+        sha256 = hashlib.sha256()
+        for chunk_id, size in manifest["chunks"]:
+            if job is not None:
+                job.check()
+            with open(self.chunk_path(chunk_id), "rb") as f:
+                data = self._decrypt(f.read(), bytes.fromhex(chunk_id))
+            if len(data) != size or not hmac.compare_digest(self.chunk_id(data), chunk_id):
+                raise ValueError(f"Corrupted chunk {chunk_id}")
+            file.write(data)
+            sha256.update(data)
+            if job is not None:
+                job.advance(nbytes=size)
+        if sha256.hexdigest() != manifest["sha256"]:
+            raise ValueError(f"Version {name} does not match its checksum")
+        return manifest["size"]
+
+    def remove(self, name):
+        """Remove a version and the chunks no other version uses
+
+        Returns:
+            int: Number of chunks removed
+        """
+        os.remove(self.version_path(name))
+        return self.collect_garbage()
+
+    def collect_garbage(self):
+        """Remove the chunks no version uses, e.g. left by an interrupted add
+
+        Returns:
+            int: Number of chunks removed
+        """
+        used = {chunk_id for name in self.versions() for chunk_id, size in self.manifest(name)["chunks"]}
+        removed = 0
+        path_abs_chunks = os.path.join(self.path, "chunks")
+        for prefix in os.listdir(path_abs_chunks):
+            for chunk_id in os.listdir(os.path.join(path_abs_chunks, prefix)):
+                if chunk_id not in used:
+                    os.remove(os.path.join(path_abs_chunks, prefix, chunk_id))
+                    removed += 1
+        return removed
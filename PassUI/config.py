@@ -0,0 +1,140 @@
+"""config.py - Cached, atomic and debounced access to the YAML config
+
+Parsed files are cached by mtime and size, so that reading the config again
+costs a stat. Writes go through a temporary file renamed over the config,
+are skipped when the content did not change, and a burst of changes is
+coalesced into a single write after DEBOUNCE_DELAY seconds.
+"""
+
+import os
+import copy
+import atexit
+import threading
+import yaml
+
+# The C implementations are much faster when PyYAML was built with libyaml
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# Seconds a scheduled write waits for further changes
+DEBOUNCE_DELAY = 0.5
+
+_cache = {}  # path -> (mtime_ns, size, text, data)
+_lock = threading.RLock()
+_pending = {}  # path -> config waiting to be written
+_timers = {}  # path -> threading.Timer
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _read_text(path):
+    """Text of a file, from the cache when it did not change on disk"""
+    path = str(path)
+    with _lock:
+        mtime_ns, size = _stat_key(path)
+        cached = _cache.get(path)
+        if cached is not None and cached[:2] == (mtime_ns, size):
+            return cached
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        cached = (mtime_ns, size, text, yaml.load(text, Loader=Loader) or {})
+        _cache[path] = cached
+        return cached
+
+
+def read_yaml(path):
+    """Parse a YAML file, only once as long as it does not change
+
+    Args:
+        path: Path to the YAML file
+
+    Returns:
+        dict: A copy of the parsed content, empty if the file does not exist
+    """
+    flush(path)
+    if not os.path.isfile(path):
+        return {}
+    return copy.deepcopy(_read_text(path)[3])
+
+
+def dumps(data):
+    return yaml.dump(data, Dumper=Dumper, default_flow_style=False)
+
+
+def write_yaml(path, data):
+    """Write a YAML file atomically, unless its content is already the same
+
+    Args:
+        path: Path to the YAML file
+        data: Content to write
+
+    Returns:
+        bool: True if the file was written
+    """
+    path = str(path)
+    text = dumps(data)
+    with _lock:
+        if os.path.isfile(path) and _read_text(path)[2] == text:
+            return False
+        path_tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(path_tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path_tmp, path)
+        finally:
+            if os.path.exists(path_tmp):
+                os.remove(path_tmp)
+        mtime_ns, size = _stat_key(path)
+        _cache[path] = (mtime_ns, size, text, copy.deepcopy(data))
+    print(f"Write config at {path}")
+    return True
+
+
+def schedule_write(path, data, delay=DEBOUNCE_DELAY):
+    """Write a YAML file after a delay, replacing a write already scheduled
+
+    Args:
+        path: Path to the YAML file
+        data: Content to write, copied now
+        delay: Seconds to wait for further changes
+    """
+    path = str(path)
+    with _lock:
+        _pending[path] = copy.deepcopy(data)
+        timer = _timers.pop(path, None)
+        if timer is not None:
+            timer.cancel()
+        timer = threading.Timer(delay, flush, args=(path,))
+        timer.daemon = True
+        _timers[path] = timer
+        timer.start()
+
+
+def flush(path=None):
+    """Write now the scheduled writes, of one file or of all files
+
+    Args:
+        path: Path to the YAML file, None for all files
+
+    Returns:
+        bool: True if a file was written
+    """
+    written = False
+    with _lock:
+        paths = list(_pending) if path is None else [str(path)]
+        for path_pending in paths:
+            timer = _timers.pop(path_pending, None)
+            if timer is not None:
+                timer.cancel()
+            data = _pending.pop(path_pending, None)
+            if data is not None:
+                written = write_yaml(path_pending, data) or written
+    return written
+
+
+atexit.register(flush)
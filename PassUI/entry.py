@@ -0,0 +1,241 @@
+"""entry.py - Decrypted content of a password entry
+
+The first line of an entry is the password, the next lines are "key: value"
+fields as written by pass. An Entry keeps the decrypted text as is and only
+finds the offsets of its fields when one is first accessed. Lines starting
+with a space or a tab continue the value of the field above, so values may
+span several lines, keys may repeat and lines that are not fields are kept.
+Serializing joins the slices of the original text with the lines that
+changed, in linear time whatever the size of the entry.
+"""
+
+import difflib
+
+SEPARATORS = (": ", ":")
+CONTINUATION = (" ", "\t")
+
+
+class Entry:
+    """Password and fields of an entry, parsed on first access"""
+
+    __slots__ = ("_raw", "_password", "_fields")
+
+    def __init__(self, raw=""):
+        """
+        Args:
+            raw: Decrypted text of the entry
+        """
+        self._raw = raw
+        self._password = None  # None while the first line of raw is used
+        # Parsed lines after the password, None until first access. Each
+        # line is [key, start, end, value_start, value]: start and end delimit
+        # the line (continuations and newline included) in raw, value is None
+        # while it is read from raw. A changed line has start None. key is
+        # None for a line that is not a field.
+        self._fields = None
+
+    @classmethod
+    def from_dict(cls, data_dict):
+        """Build an entry from a dictionary like the one of to_dict"""
+        entry = cls()
+        entry._fields = []
+        if "PASSWORD" in data_dict:
+            entry.password = data_dict["PASSWORD"]
+        for key, value in data_dict.items():
+            if key != "PASSWORD":
+                entry.add(key, value)
+        return entry
+
+    def _password_end(self):
+        end = self._raw.find("\n")
+        return len(self._raw) if end == -1 else end
+
+    def _parse(self):
+        if self._fields is not None:
+            return self._fields
+        raw = self._raw
+        fields = []
+        start = self._password_end() + 1
+        while start < len(raw):
+            end = raw.find("\n", start)
+            end = len(raw) if end == -1 else end + 1
+            line = raw[start:end].rstrip("\n")
+            if line.startswith(CONTINUATION) and fields and fields[-1][0] is not None:
+                # Continuation of the field above
+                fields[-1][2] = end
+            elif not line:
+                fields.append([None, start, end, end, None])
+            else:
+                for sep in SEPARATORS:
+                    index = line.find(sep)
+                    if index != -1:
+                        fields.append([line[:index], start, end, start + index + len(sep), None])
+                        break
+                else:
+                    fields.append([None, start, end, end, None])
+            start = end
+        self._fields = fields
+        return fields
+
+    def _value(self, field):
+        key, start, end, value_start, value = field
+        if value is not None or start is None:
+            return value
+        value = self._raw[value_start:end]
+        if value.endswith("\n"):
+            value = value[:-1]
+        if "\n" in value:
+            # Continuation lines lose their leading space or tab
+            value = "\n".join(
+                line[1:] if i and line.startswith(CONTINUATION) else line
+                for i, line in enumerate(value.split("\n")))
+        return value
+
+    @property
+    def password(self):
+        if self._password is None:
+            return self._raw[:self._password_end()]
+        return self._password
+
+    @password.setter
+    def password(self, value):
+        self._parse()
+        self._password = value
+
+    def items(self):
+        """Fields in order, duplicates included, as (key, value)"""
+        return [(field[0], self._value(field)) for field in self._parse() if field[0] is not None]
+
+    def keys(self):
+        return [field[0] for field in self._parse() if field[0] is not None]
+
+    def get(self, key, default=None):
+        """Value of the first field named key"""
+        for field in self._parse():
+            if field[0] == key:
+                return self._value(field)
+        return default
+
+    def get_all(self, key):
+        """Values of all the fields named key"""
+        return [self._value(field) for field in self._parse() if field[0] == key]
+
+    def __getitem__(self, key):
+        if key == "PASSWORD":
+            return self.password
+        for field in self._parse():
+            if field[0] == key:
+                return self._value(field)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key == "PASSWORD" or any(field[0] == key for field in self._parse())
+
+    def set(self, key, value):
+        """Set the first field named key, removing the others, or add it"""
+        if key == "PASSWORD":
+            self.password = value
+            return
+        fields = self._parse()
+        found = False
+        for field in list(fields):
+            if field[0] != key:
+                continue
+            if found:
+                fields.remove(field)
+            else:
+                field[1:] = [None, None, None, value]
+                found = True
+        if not found:
+            self.add(key, value)
+
+    __setitem__ = set
+
+    def add(self, key, value):
+        """Add a field, even if one with the same key exists"""
+        self._parse().append([key, None, None, None, value])
+
+    def remove(self, key):
+        """Remove all the fields named key"""
+        self._fields = [field for field in self._parse() if field[0] != key]
+
+    def update_items(self, items):
+        """Replace the password and fields by a list like the one of to_items
+
+        The fields are diffed against the list: those left as they were keep
+        their lines, added ones are inserted where they are in the list and
+        lines that are not fields stay in place.
+
+        Args:
+            items: Password and fields in order, duplicates included, as
+                (key, value), the first PASSWORD key being the password
+        """
+        items = list(items)
+        for i, (key, value) in enumerate(items):
+            if key == "PASSWORD":
+                del items[i]
+                if value != self.password:
+                    self.password = value
+                break
+        fields = [field for field in self._parse() if field[0] is not None]
+        removed = set()
+        inserted = {}  # Index of a field -> new lines inserted before it
+        matcher = difflib.SequenceMatcher(None, [(field[0], self._value(field)) for field in fields], items, False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                continue
+            # Replaced in place as far as possible, then removed or inserted
+            for field, (key, value) in zip(fields[i1:i2], items[j1:j2]):
+                field[:] = [key, None, None, None, value]
+            removed.update(id(field) for field in fields[i1 + j2 - j1:i2])
+            inserted.setdefault(i2, []).extend(
+                [key, None, None, None, value] for key, value in items[j1 + i2 - i1:j2])
+        if not removed and not inserted:
+            return
+        indexes = {id(field): i for i, field in enumerate(fields)}
+        lines = []
+        for line in self._fields:
+            if id(line) in indexes:
+                lines.extend(inserted.get(indexes[id(line)], ()))
+                if id(line) in removed:
+                    continue
+            lines.append(line)
+        lines.extend(inserted.get(len(fields), ()))
+        self._fields = lines
+
+    def to_items(self):
+        """Password and fields in order, duplicates included, as (key, value)"""
+        return [("PASSWORD", self.password)] + self.items()
+
+    def to_dict(self):
+        """Password and fields as a dictionary, the last of duplicate keys wins"""
+        data_dict = {"PASSWORD": self.password}
+        for key, value in self.items():
+            data_dict[key] = value
+        return data_dict
+
+    def serialize(self):
+        """Text of the entry, with only the changed lines rebuilt"""
+        if self._fields is None and self._password is None:
+            return self._raw
+        raw = self._raw
+        parts = []
+        if self._password is None:
+            end = self._password_end()
+            parts.append(raw[:end + 1] if end < len(raw) else raw + "\n")
+        else:
+            parts.append(self._password + "\n")
+        for key, start, end, value_start, value in self._parse():
+            if start is not None:
+                parts.append(raw[start:end])
+                if not raw.endswith("\n", start, end):
+                    parts.append("\n")
+            else:
+                # Following lines of a value are continuation lines
+                parts.append(f"{key}: {str(value).replace(chr(10), chr(10) + ' ')}\n")
+        return "".join(parts)
+
+    __str__ = serialize
+
+    def __repr__(self):
+        return f"Entry(keys={self.keys()!r})"
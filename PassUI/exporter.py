@@ -0,0 +1,175 @@
+"""exporter.py - Streaming encrypted export of the store
+
+This module decrypts the entries of the store, or of a subtree, in worker
+processes and streams them as JSON Lines or CSV into a stream.EncryptedWriter
+for the chosen recipients. Entries flow through a bounded window of batches,
+in store order, so the export is never built in memory.
+"""
+
+import io
+import os
+import csv
+import json
+from collections import deque
+from PassUI import gpg, stream, utils
+
+FORMATS = ("jsonl", "csv")
+
+# Columns of the CSV export, the other fields go as "name: value" lines in "fields"
+CSV_COLUMNS = ("path", "password", "user", "mail", "url", "notes", "totp", "fields")
+
+# Entries decrypted by a worker at once, to amortize the inter-process overhead
+BATCH_SIZE = 64
+
+# Batches in flight per worker, bounds the memory used by the export
+MAX_PENDING_PER_WORKER = 4
+
+_worker_decryptor = None
+
+
+def _init_worker(armored_private_keys, passphrase):
+    global _worker_decryptor
+    _worker_decryptor = gpg.Decryptor(
+        [gpg.key_from_armored(armored) for armored in armored_private_keys], passphrase)
+
+
+def decrypt_batch(batch, decryptor=None):
+    """Decrypt a batch of entries, in a worker process
+
+    Args:
+        batch: List of (path_rel, path_abs)
+        decryptor: gpg.Decryptor, the one of the worker if None
+
+    Returns:
+        list: (path_rel, data_dict, None) or (path_rel, None, error) per entry
+    """
+    decryptor = decryptor or _worker_decryptor
+    results = []
+    for path_rel, path_abs in batch:
+        try:
+            with open(path_abs, "rb") as f:
+                data_str = decryptor.decrypt(f.read())
+            if not isinstance(data_str, str):
+                data_str = bytes(data_str).decode("utf-8")
+            results.append((path_rel, utils.data_str_to_dict(data_str), None))
+        except Exception as e:
+            results.append((path_rel, None, str(e)))
+    return results
+
+
+def format_jsonl(path_rel, data_dict):
+    return json.dumps({"path": path_rel.replace(os.sep, "/"), **data_dict}, ensure_ascii=False) + "\n"
+
+
+def format_csv(path_rel, data_dict):
+    row = {"path": path_rel.replace(os.sep, "/"), "password": data_dict.get("PASSWORD", "")}
+    fields = []
+    for field, value in data_dict.items():
+        if field == "PASSWORD":
+            continue
+        if field in CSV_COLUMNS and field not in ("path", "password", "fields"):
+            row[field] = value
+        else:
+            fields.append(f"{field}: {value}")
+    row["fields"] = "\n".join(fields)
+    line = io.StringIO()
+    csv.DictWriter(line, CSV_COLUMNS).writerow(row)
+    return line.getvalue()
+
+
+def subtree_paths(rel_paths, subtree=None):
+    """Sorted entries under a subtree
+
+    Args:
+        rel_paths: Relative paths of the entries
+        subtree: Relative path of a folder or an entry, None for the store
+
+    Returns:
+        list: Sorted relative paths
+    """
+    if subtree:
+        subtree = os.path.normpath(subtree)
+        rel_paths = [
+            path_rel for path_rel in rel_paths
+            if path_rel == subtree or path_rel.startswith(subtree + os.sep)]
+    return sorted(rel_paths)
+
+
+def export_store(passstore_obj, path_abs_out, subtree=None, format="jsonl", recipients=None,
+                 passphrase=None, workers=None):
+    """Export decrypted entries into an encrypted stream
+
+    Args:
+        passstore_obj: PassStore holding the entries and the private keys
+        path_abs_out: Path to the encrypted export
+        subtree: Relative path of the exported folder, None for the store
+        format: One of FORMATS
+        recipients: Public keys able to read the export
+        passphrase: Passphrase of the private key
+        workers: Number of decryption processes, the number of CPUs if None
+
+    Returns:
+        dict: Number of entries exported and failed
+    """
+    # Only bulk operations need multiprocessing, it is not imported at startup
+    from concurrent.futures import ProcessPoolExecutor
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format {format!r}, expected one of {FORMATS}")
+    formatter = format_jsonl if format == "jsonl" else format_csv
+    workers = workers or os.cpu_count() or 1
+    rel_paths = subtree_paths(passstore_obj.index_rel_paths(), subtree)
+    report = {"exported": 0, "failed": 0}
+
+    # Also checks the passphrase before any worker starts
+    decryptor = passstore_obj.decryptor(passphrase)
+    executor = None
+    if workers > 1 and len(rel_paths) > BATCH_SIZE:
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=([str(key) for key in passstore_obj.private_keys()], passphrase),
+        )
+
+    path_tmp = path_abs_out + ".tmp"
+    pending = deque()
+
+    def write_results(writer, results):
+        for path_rel, data_dict, error in results:
+            if error is not None:
+                print(f"Error exporting {path_rel}: {error}")
+                report["failed"] += 1
+                continue
+            writer.write(formatter(path_rel, data_dict).encode("utf-8"))
+            report["exported"] += 1
+
+    try:
+        with open(path_tmp, "wb") as f:
+            if recipients is None:
+                recipients = passstore_obj.recipients(
+                    passstore_obj.config.get("settings", {}).get("disabled_keys", []))
+            writer = stream.EncryptedWriter(f, recipients)
+            if format == "csv":
+                header = io.StringIO()
+                csv.DictWriter(header, CSV_COLUMNS).writeheader()
+                writer.write(header.getvalue().encode("utf-8"))
+            for start in range(0, len(rel_paths), BATCH_SIZE):
+                batch = [
+                    (path_rel, utils.rel_to_abs(passstore_obj.path_store, path_rel))
+                    for path_rel in rel_paths[start:start + BATCH_SIZE]]
+                if executor is None:
+                    write_results(writer, decrypt_batch(batch, decryptor))
+                    continue
+                # Results are written in order while the next batches decrypt
+                if len(pending) >= workers * MAX_PENDING_PER_WORKER:
+                    write_results(writer, pending.popleft().result())
+                pending.append(executor.submit(decrypt_batch, batch))
+            while pending:
+                write_results(writer, pending.popleft().result())
+            writer.close()
+        os.replace(path_tmp, path_abs_out)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if os.path.exists(path_tmp):
+            os.remove(path_tmp)
+    return report
@@ -0,0 +1,200 @@
+"""gitstore.py - Batched git commits of the password store
+
+Stores managed by pass are git repositories. Changed entries are recorded
+here and committed together: the paths go to a temporary git index, read
+from HEAD, through a single `git update-index --stdin`, then one tree and
+one commit are written for the whole batch, whatever the number of
+entries. Changes the user staged in the index of the store stay out of the
+commit. Single edits are debounced so that a burst of them ends up in one
+commit.
+"""
+
+import os
+import atexit
+import weakref
+import tempfile
+import threading
+import subprocess
+
+# Seconds a scheduled commit waits for further changes
+DEBOUNCE_DELAY = 2.0
+
+# Identity of the commits when git has none configured
+FALLBACK_IDENTITY = {
+    "GIT_AUTHOR_NAME": "PassUI",
+    "GIT_AUTHOR_EMAIL": "passui@localhost",
+    "GIT_COMMITTER_NAME": "PassUI",
+    "GIT_COMMITTER_EMAIL": "passui@localhost",
+}
+
+_stores = weakref.WeakSet()
+
+
+class GitStore:
+    """Pending changes of a password store, committed in batches"""
+
+    def __init__(self, path_store, delay=DEBOUNCE_DELAY):
+        """
+        Args:
+            path_store: Absolute path to the password store
+            delay: Seconds a scheduled commit waits for further changes
+        """
+        self.path_store = os.path.abspath(path_store)
+        self.delay = delay
+        self.lock = threading.RLock()
+        self.pending = set()  # Relative paths of the changed files
+        self.messages = []  # Messages of the pending changes
+        self.timer = None
+        self._env = None
+        _stores.add(self)
+
+    def run(self, *args, input=None, env=None):
+        """Run a git command in the store
+
+        Args:
+            env: Variables added to the environment of the command
+
+        Returns:
+            str: Standard output of the command, stripped
+        """
+        result = subprocess.run(
+            ["git", "-C", self.path_store, *args],
+            input=input, capture_output=True, check=True, env=dict(self.env(), **(env or {})))
+        return result.stdout.decode("utf-8", errors="replace").strip()
+
+    def env(self):
+        if self._env is None:
+            env = dict(os.environ)
+            try:
+                subprocess.run(
+                    ["git", "-C", self.path_store, "var", "GIT_COMMITTER_IDENT"],
+                    capture_output=True, check=True)
+            except (OSError, subprocess.CalledProcessError):
+                for name, value in FALLBACK_IDENTITY.items():
+                    env.setdefault(name, value)
+            self._env = env
+        return self._env
+
+    def is_repo(self):
+        return os.path.exists(os.path.join(self.path_store, ".git"))
+
+    def init(self):
+        if not self.is_repo():
+            os.makedirs(self.path_store, exist_ok=True)
+            self.run("init", "--quiet")
+            self._env = None
+
+    def add(self, paths_rel, message):
+        """Record changed files, committed by the next commit
+
+        Args:
+            paths_rel: Paths of the files relative to the store, deleted files included
+            message: Summary of the change
+        """
+        with self.lock:
+            self.pending.update(paths_rel)
+            self.messages.append(message)
+
+    def schedule(self, paths_rel, message):
+        """Record changed files and commit them once no change came for a while
+
+        Args:
+            paths_rel: Paths of the files relative to the store, deleted files included
+            message: Summary of the change
+        """
+        with self.lock:
+            self.add(paths_rel, message)
+            if self.timer is not None:
+                self.timer.cancel()
+            self.timer = threading.Timer(self.delay, self.commit)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def commit(self, message=None):
+        """Commit the pending changes, and only them, with one index update
+
+        Args:
+            message: Message of the commit, built from the pending changes if None
+
+        Returns:
+            str: Hash of the new commit, None if there was nothing to commit
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            paths_rel, messages = sorted(self.pending), self.messages
+            self.pending, self.messages = set(), []
+            if not paths_rel:
+                return None
+            if message is None:
+                message = messages[0] if len(messages) == 1 else "\n".join(
+                    [f"Update {len(paths_rel)} files", ""] + messages)
+            try:
+                self.init()
+                paths = "".join(path_rel.replace(os.sep, "/") + "\0" for path_rel in paths_rel).encode("utf-8")
+                parent = self.head()
+                with tempfile.TemporaryDirectory() as path_tmp:
+                    env = {"GIT_INDEX_FILE": os.path.join(path_tmp, "index")}
+                    if parent is not None:
+                        self.run("read-tree", parent, env=env)
+                    self.run("update-index", "--add", "--remove", "-z", "--stdin", input=paths, env=env)
+                    tree = self.run("write-tree", env=env)
+                # The index of the store follows the commit for these paths only
+                self.run("update-index", "--add", "--remove", "-z", "--stdin", input=paths)
+                args = ["commit-tree", tree, "-m", message]
+                if parent is not None:
+                    if self.run("rev-parse", f"{parent}^{{tree}}") == tree:
+                        return None
+                    args += ["-p", parent]
+                commit = self.run(*args)
+                self.run("update-ref", "-m", f"commit: {message.splitlines()[0]}", "HEAD", commit)
+                return commit
+            except (OSError, subprocess.CalledProcessError) as e:
+                stderr = getattr(e, "stderr", None) or b""
+                print(f"Error committing to git: {e} {stderr.decode('utf-8', errors='replace')}")
+                return None
+
+    def head(self):
+        try:
+            return self.run("rev-parse", "--quiet", "--verify", "HEAD")
+        except subprocess.CalledProcessError:
+            return None
+
+    def history(self, path_rel, limit=None):
+        """Commits that changed a file, newest first
+
+        Args:
+            path_rel: Path of the file relative to the store
+            limit: Maximum number of commits
+
+        Returns:
+            list: Dictionaries with commit, author, date and message
+        """
+        self.commit()
+        if not self.is_repo() or self.head() is None:
+            return []
+        args = ["log", "--format=%H%x00%an <%ae>%x00%aI%x00%B%x00", "--follow"]
+        if limit:
+            args.append(f"-n{limit}")
+        output = self.run(*args, "--", path_rel.replace(os.sep, "/"))
+        fields = output.split("\0")
+        history = []
+        for i in range(0, len(fields) - 3, 4):
+            commit, author, date, message = fields[i:i + 4]
+            history.append({
+                "commit": commit.strip(),
+                "author": author,
+                "date": date,
+                "message": message.strip(),
+            })
+        return history
+
+
+def flush():
+    """Commit the pending changes of every store, e.g. before exiting"""
+    for git_store in list(_stores):
+        git_store.commit()
+
+
+atexit.register(flush)
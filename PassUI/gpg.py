@@ -4,21 +4,207 @@ This module provides GPG encryption and decryption functionality for the
 PassUI password manager application using the PGPy library.
 """
 
+from __future__ import annotations
+
 import os
-import tempfile
 import logging
+import warnings
+import contextlib
 from typing import List, Dict, Optional
 
-# Import PGPy for OpenPGP standard compatibility
-from pgpy import PGPKey, PGPUID, PGPMessage
-from pgpy.constants import PubKeyAlgorithm, KeyFlags, HashAlgorithm, SymmetricKeyAlgorithm
-from pgpy.constants import CompressionAlgorithm
+# PGPy (OpenPGP standard compatibility) takes a while to import, it is
+# imported by load_pgpy on the first crypto call instead of at startup
+PGPKey = PGPUID = PGPMessage = None
+PubKeyAlgorithm = KeyFlags = HashAlgorithm = SymmetricKeyAlgorithm = CompressionAlgorithm = None
+rsa = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('PyGPG')
 
 
+def load_pgpy():
+    """Import PGPy and cryptography into this module, once"""
+    global PGPKey, PGPUID, PGPMessage, rsa
+    global PubKeyAlgorithm, KeyFlags, HashAlgorithm, SymmetricKeyAlgorithm, CompressionAlgorithm
+    if PGPKey is not None:
+        return
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from pgpy import PGPUID, PGPMessage
+    from pgpy.constants import PubKeyAlgorithm, KeyFlags, HashAlgorithm, SymmetricKeyAlgorithm
+    from pgpy.constants import CompressionAlgorithm
+    # Bound last, it marks the whole import as done
+    from pgpy import PGPKey
+
+
+def key_from_armored(armored: str) -> PGPKey:
+    """Parse an ASCII-armored key, e.g. sent to a worker process"""
+    load_pgpy()
+    return PGPKey.from_blob(armored)[0]
+
+
+def key_ids(key) -> List[str]:
+    """Key IDs of a key and its subkeys, any of them may be a message encrypter"""
+    return [key.fingerprint.keyid] + list(key.subkeys)
+
+
+def encrypt_to(recipients, plaintext: bytes) -> bytes:
+    """Encrypt data for public keys, all sharing one session key
+
+    Args:
+        recipients: Public keys to encrypt to
+        plaintext: Data to encrypt
+
+    Returns:
+        bytes: The binary OpenPGP message
+
+    Raises:
+        ValueError: If there are no recipients
+    """
+    if not recipients:
+        raise ValueError("No recipients found for encryption")
+    load_pgpy()
+    message = PGPMessage.new(plaintext, file=True)
+    cipher = SymmetricKeyAlgorithm.AES256
+    sessionkey = cipher.gen_key()
+    with warnings.catch_warnings():
+        # AES256 may be missing from the key preferences, every client reads it
+        warnings.simplefilter("ignore")
+        for recipient in recipients:
+            message = recipient.encrypt(message, cipher=cipher, sessionkey=sessionkey)
+    return bytes(message)
+
+
+# pgpy version the shortcut of Decryptor was tested with, it reads private
+# attributes of pgpy and falls back to the public API if they change
+PGPY_TESTED = "0.6.0"
+
+
+class _PreparedKey:
+    """Stands for the key material of a pgpy key whose RSA key is already built"""
+
+    def __init__(self, private_key):
+        self.keymaterial = self
+        self._private_key = private_key
+
+    def __privkey__(self):
+        return self._private_key
+
+
+def _rsa_private_keys(key):
+    """Build the RSA private keys of an unlocked pgpy key, by key ID
+
+    Raises:
+        AttributeError: If the key material is not where pgpy 0.6 keeps it
+    """
+    keys = {}
+    for subkey in [key] + list(key.subkeys.values()):
+        if subkey.key_algorithm != PubKeyAlgorithm.RSAEncryptOrSign:
+            continue
+        material = subkey._key.keymaterial
+        keys[subkey.fingerprint.keyid] = rsa.RSAPrivateNumbers(
+            material.p, material.q, material.d,
+            rsa.rsa_crt_dmp1(material.d, material.p),
+            rsa.rsa_crt_dmq1(material.d, material.q),
+            rsa.rsa_crt_iqmp(material.p, material.q),
+            rsa.RSAPublicNumbers(material.e, material.n),
+        ).private_key()
+    return keys
+
+
+class Decryptor:
+    """Private keys unlocked once to decrypt many messages
+
+    pgpy unlocks the key and rebuilds and validates the RSA private key for
+    every message, which costs far more than the decryption itself. This
+    does it once for all the messages of a bulk operation, through private
+    attributes of pgpy (see PGPY_TESTED). Keys that are not RSA, or all the
+    keys if those attributes changed, are decrypted through the public
+    PGPKey.decrypt instead, slower but correct.
+    """
+
+    def __init__(self, private_keys, passphrase: Optional[str] = None):
+        """Unlock the private keys
+
+        Args:
+            private_keys: pgpy private keys
+            passphrase: Passphrase of the protected keys
+
+        Raises:
+            ValueError: If no key could be unlocked
+        """
+        load_pgpy()
+        self._rsa_keys = {}  # key ID -> cryptography RSA private key
+        self._keys = []  # All the unlocked keys
+        self._other_keys = []  # Keys decrypted through the public API of pgpy
+        self.passphrase = passphrase
+        errors = []
+        for key in private_keys:
+            if key.is_protected and not passphrase:
+                errors.append(f"Key {key.fingerprint.keyid} is protected but no passphrase provided")
+                continue
+            try:
+                with key.unlock(passphrase) if key.is_protected else contextlib.nullcontext():
+                    try:
+                        rsa_keys = _rsa_private_keys(key)
+                    except AttributeError as e:
+                        logger.warning(f"pgpy internals changed (tested with {PGPY_TESTED}), slow decryption: {e}")
+                        rsa_keys = {}
+            except Exception as e:
+                errors.append(f"Failed to unlock key {key.fingerprint.keyid}: {e}")
+                continue
+            self._keys.append(key)
+            self._rsa_keys.update(rsa_keys)
+            if len(rsa_keys) < len(key_ids(key)):
+                # Some subkeys are not RSA, or could not be prepared
+                self._other_keys.append(key)
+        if not self._keys:
+            raise ValueError("No private key could be unlocked:\n" + "\n".join(errors))
+
+    def _decrypt_rsa(self, message):
+        """Decrypt with the prepared RSA keys, None if none is a recipient"""
+        for pkesk in message._sessionkeys:
+            private_key = self._rsa_keys.get(pkesk.encrypter)
+            if private_key is None or pkesk.pkalg != PubKeyAlgorithm.RSAEncryptOrSign:
+                continue
+            cipher, session_key = pkesk.decrypt_sk(_PreparedKey(private_key))
+            decrypted = PGPMessage()
+            decrypted.parse(message.message.decrypt(session_key, cipher))
+            return decrypted.message
+        return None
+
+    def decrypt(self, data: bytes):
+        """Decrypt an OpenPGP message
+
+        Args:
+            data: The encrypted message, binary, armored or already parsed
+
+        Returns:
+            str or bytes: The decrypted content
+
+        Raises:
+            ValueError: If none of the keys decrypts the message
+        """
+        message = data if isinstance(data, PGPMessage) else PGPMessage.from_blob(data)
+        if self._rsa_keys:
+            try:
+                decrypted = self._decrypt_rsa(message)
+            except (AttributeError, TypeError) as e:
+                logger.warning(f"pgpy internals changed (tested with {PGPY_TESTED}), slow decryption: {e}")
+                self._rsa_keys = {}
+                self._other_keys = list(self._keys)
+                decrypted = None
+            if decrypted is not None:
+                return decrypted
+        for key in self._other_keys:
+            try:
+                with key.unlock(self.passphrase) if key.is_protected else contextlib.nullcontext():
+                    return key.decrypt(message).message
+            except Exception:
+                continue
+        raise ValueError("Could not decrypt with any of the available keys")
+
+
 class GPG:
     """GPG class providing OpenPGP standard encryption and decryption capabilities."""
 
@@ -32,12 +218,14 @@ class GPG:
         # Initialize keyring storage
         self.ensure_keystore_exists()
 
-        # Key storage
-        self._private_keys = {}
-        self._public_keys = {}
+        # Keys are loaded on first use of _private_keys or _public_keys
 
-        # Load existing keys
-        self._load_keys()
+    def __getattr__(self, name):
+        # Only called for missing attributes, i.e. the keyring is not loaded yet
+        if name in ("_private_keys", "_public_keys") and "private_keyring_path" in self.__dict__:
+            self._load_keys()
+            return self.__dict__[name]
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
 
     def ensure_keystore_exists(self):
         """Create keystore directory if it doesn't exist"""
@@ -49,6 +237,7 @@ class GPG:
         """Load keys from the keyring files into memory"""
         # This implementation will maintain its own in-memory keyring
         # but will save/load to standard formats compatible with GPG
+        load_pgpy()
         self._private_keys = {}
         self._public_keys = {}
 
@@ -107,6 +296,7 @@ class GPG:
         Returns:
             List[Dict[str, str]]: List of dictionaries containing key information
         """
+        load_pgpy()
         results = []
 
         # Handle case when no keys are available
@@ -238,6 +428,7 @@ class GPG:
         Raises:
             ValueError: If there's an error importing the key
         """
+        load_pgpy()
         try:
             if not os.path.exists(path_abs_gpg):
                 raise FileNotFoundError(f"Key file not found: {path_abs_gpg}")
@@ -344,6 +535,7 @@ class GPG:
         Raises:
             ValueError: If there's an error creating the key
         """
+        load_pgpy()
         try:
             if not name or not mail:
                 raise ValueError("Name and email are required for key creation")
@@ -415,6 +607,77 @@ class GPG:
             logger.error(f"Error removing keys: {e}")
             return False
 
+    def recipients(self, disabled_keys=None) -> List[PGPKey]:
+        """Public keys a new message is encrypted to
+
+        Args:
+            disabled_keys: List of key IDs to exclude from encryption
+
+        Returns:
+            list: The recipient public keys
+        """
+        if disabled_keys is None:
+            disabled_keys = []
+        return [
+            pubkey for key_id, pubkey in self._public_keys.items()
+            if key_id not in disabled_keys
+        ]
+
+    def get_public_key(self, recipient: str) -> PGPKey:
+        """Find a public key by key ID, mail or user, or load it from a file
+
+        Args:
+            recipient: Key ID, mail or user of a key of the keyring, or path
+                to an exported public key
+
+        Returns:
+            PGPKey: The public key
+
+        Raises:
+            ValueError: If no key matches
+        """
+        load_pgpy()
+        if os.path.isfile(recipient):
+            key, _ = PGPKey.from_file(recipient)
+            return key.pubkey if not key.is_public else key
+        for key_id, pubkey in self._public_keys.items():
+            if recipient.upper() in (key_id, str(pubkey.fingerprint).replace(" ", "")):
+                return pubkey
+            for uid in pubkey.userids:
+                if recipient in (uid.email, uid.name):
+                    return pubkey
+        raise ValueError(f"No public key found for {recipient}")
+
+    def private_keys(self) -> List[PGPKey]:
+        """Private keys of the keyring, still protected by their passphrase"""
+        return list(self._private_keys.values())
+
+    def decryptor(self, passphrase: Optional[str] = None) -> Decryptor:
+        """Unlock the private keys once to decrypt many messages
+
+        Args:
+            passphrase: Passphrase of the protected keys
+
+        Returns:
+            Decryptor: The unlocked keys
+        """
+        return Decryptor(self.private_keys(), passphrase)
+
+    def encrypt_bytes(self, plaintext: bytes, disabled_keys=None) -> bytes:
+        """Encrypt data in memory for one or more recipients
+
+        Args:
+            plaintext: Data to encrypt
+            disabled_keys: List of key IDs to exclude from encryption
+
+        Returns:
+            bytes: The binary OpenPGP message
+
+        Raises:
+            ValueError: If there are no recipients
+        """
+        return encrypt_to(self.recipients(disabled_keys), plaintext)
+
     def encrypt(self, path_abs_gpg: str, path_abs_file: str, disabled_keys=None, binary_file=False) -> bool:
         """Encrypt a file for one or more recipients
 
@@ -445,28 +708,12 @@ class GPG:
             with open(path_abs_file, 'rb') as f:
                 plaintext = f.read()
 
-            # Create a new PGP message
-            message = PGPMessage.new(plaintext, file=True)
-
-            # Encrypt for each recipient
-            recipients = []
-            for key_id, pubkey in self._public_keys.items():
-                if key_id in disabled_keys:
-                    continue
-                recipients.append(pubkey)
-
-            if not recipients:
-                raise ValueError("No recipients found for encryption")
-
-            # Encrypt the message
-            encrypted_message = message
-            for recipient in recipients:
-                encrypted_message = recipient.encrypt(encrypted_message)
+            encrypted_data = self.encrypt_bytes(plaintext, disabled_keys)
 
             # Write the encrypted message to file
             with open(path_abs_gpg, 'wb') as f:
                 # Always write binary data for consistency
-                f.write(bytes(encrypted_message))
+                f.write(encrypted_data)
 
             logger.info(f"Encrypted file to {path_abs_gpg}")
             return True
@@ -495,26 +742,15 @@ class GPG:
             path_abs_dir = os.path.dirname(path_abs_gpg)
             os.makedirs(path_abs_dir, exist_ok=True)
 
-            # Create a temporary file for the data
-            with tempfile.NamedTemporaryFile(delete=False) as tmp:
-                path_data = tmp.name
-                tmp.write(data_str.encode('utf-8'))
-
-            # Encrypt the temporary file
-            result = self.encrypt(path_abs_gpg, path_data, disabled_keys)
-            return result
+            # Encrypt in memory, the plaintext never touches the disk
+            encrypted_data = self.encrypt_bytes(data_str.encode('utf-8'), disabled_keys)
+            with open(path_abs_gpg, 'wb') as f:
+                f.write(encrypted_data)
+            logger.info(f"Encrypted file to {path_abs_gpg}")
+            return True
         except Exception as e:
             logger.error(f"Error writing encrypted data: {e}")
             return False
-        finally:
-            # Securely delete the temporary file
-            if 'path_data' in locals():
-                try:
-                    with open(path_data, "wb") as f:
-                        f.write(b"\0" * len(data_str))
-                    os.remove(path_data)
-                except Exception as e:
-                    logger.error(f"Error cleaning up temporary file: {e}")
 
     def read(self, path_abs_gpg: str, passphrase: Optional[str] = None) -> str:
         """Decrypt and read a file to a string
@@ -529,6 +765,7 @@ class GPG:
         Raises:
             ValueError: If decryption fails
         """
+        load_pgpy()
         try:
             # Check if file exists
             if not os.path.exists(path_abs_gpg):
@@ -617,6 +854,7 @@ class GPG:
         Returns:
             bool: True if decryption was successful
         """
+        load_pgpy()
         try:
             # Check if source file exists
             if not os.path.exists(path_abs_source):
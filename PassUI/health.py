@@ -0,0 +1,231 @@
+"""health.py - Parallel health scan of the store
+
+This module checks every entry of the store in worker processes: that it is
+an OpenPGP message, that it is encrypted to the current recipients, that it
+decrypts and that it holds a password. Findings are streamed entry by entry
+and gathered in a summary report. The fast mode only reads the packet
+headers with packets.read_header, without the private keys.
+"""
+
+import os
+import json
+import time
+from collections import deque
+from PassUI import gpg, utils, packets
+
+PROBLEMS = ("corrupt", "undecryptable", "stale_recipients", "empty_password")
+
+# Entries checked by a worker at once, to amortize the inter-process overhead
+BATCH_SIZE = 64
+
+# Batches in flight per worker, bounds the memory used by the scan
+MAX_PENDING_PER_WORKER = 4
+
+_worker_checker = None
+
+
+class Checker:
+    """Checks of one entry, run in the main process or in a worker"""
+
+    def __init__(self, recipient_key_ids, private_key_ids, decryptor=None):
+        """
+        Args:
+            recipient_key_ids: Key IDs of each current recipient, primary key first
+            private_key_ids: Key IDs of the private keys of the keyring
+            decryptor: gpg.Decryptor, None to only check the packet headers
+        """
+        gpg.load_pgpy()
+        self.recipient_key_ids = [frozenset(ids) for ids in recipient_key_ids]
+        self.primary_key_ids = [ids[0] for ids in recipient_key_ids]
+        self.known_key_ids = frozenset().union(*self.recipient_key_ids)
+        self.private_key_ids = frozenset(private_key_ids)
+        self.decryptor = decryptor
+
+    def stale_recipients(self, encrypters):
+        missing = [
+            primary for primary, ids in zip(self.primary_key_ids, self.recipient_key_ids)
+            if not ids & encrypters]
+        extra = sorted(encrypters - self.known_key_ids)
+        details = []
+        if missing:
+            details.append("missing " + ", ".join(missing))
+        if extra:
+            details.append("extra " + ", ".join(extra))
+        return "; ".join(details)
+
+    def check(self, path_abs):
+        """Check one entry
+
+        Args:
+            path_abs: Path to the .gpg file
+
+        Returns:
+            list: (problem, detail) found, empty for a healthy entry
+        """
+        try:
+            if self.decryptor is None:
+                # Only the first kilobytes of the file are read
+                header = packets.read_header(path_abs)
+                if header["data"] is None:
+                    return [("corrupt", "No encrypted data after the session keys")]
+                encrypters = {recipient["key_id"] for recipient in header["recipients"]} - {None}
+            else:
+                with open(path_abs, "rb") as f:
+                    message = gpg.PGPMessage.from_blob(f.read())
+                encrypters = set(message.encrypters)
+        except Exception as e:
+            return [("corrupt", f"Not an OpenPGP message: {e}")]
+        if not encrypters:
+            return [("corrupt", "Not an encrypted message")]
+
+        findings = []
+        stale = self.stale_recipients(encrypters)
+        if stale:
+            findings.append(("stale_recipients", stale))
+        if not encrypters & self.private_key_ids:
+            findings.append(("undecryptable", "Not encrypted to a private key of the keyring"))
+            return findings
+        if self.decryptor is None:
+            return findings
+
+        try:
+            data_str = self.decryptor.decrypt(message)
+        except Exception as e:
+            findings.append(("undecryptable", str(e)))
+            return findings
+        try:
+            if not isinstance(data_str, str):
+                data_str = bytes(data_str).decode("utf-8")
+            data_dict = utils.data_str_to_dict(data_str)
+        except Exception as e:
+            findings.append(("corrupt", f"Unreadable content: {e}"))
+            return findings
+        if not data_dict.get("PASSWORD"):
+            findings.append(("empty_password", "The first line is empty"))
+        return findings
+
+
+def _init_worker(recipient_key_ids, private_key_ids, armored_private_keys, passphrase):
+    global _worker_checker
+    decryptor = None
+    if armored_private_keys is not None:
+        decryptor = gpg.Decryptor(
+            [gpg.key_from_armored(armored) for armored in armored_private_keys], passphrase)
+    _worker_checker = Checker(recipient_key_ids, private_key_ids, decryptor)
+
+
+def check_batch(batch, checker=None):
+    """Check a batch of entries, in a worker process
+
+    Args:
+        batch: List of (path_rel, path_abs)
+        checker: Checker, the one of the worker if None
+
+    Returns:
+        list: (path_rel, findings) per entry
+    """
+    checker = checker or _worker_checker
+    return [(path_rel, checker.check(path_abs)) for path_rel, path_abs in batch]
+
+
+def scan(passstore_obj, passphrase=None, fast=False, workers=None):
+    """Check the entries of the store, yielding them in store order
+
+    Args:
+        passstore_obj: PassStore holding the entries and the keys
+        passphrase: Passphrase of the private key, unused in fast mode
+        fast: Only check the packet headers, nothing is decrypted
+        workers: Number of processes, the number of CPUs if None
+
+    Yields:
+        tuple: (path_rel, findings) per entry, findings as in Checker.check
+    """
+    # Only bulk operations need multiprocessing, it is not imported at startup
+    from concurrent.futures import ProcessPoolExecutor
+    workers = workers or os.cpu_count() or 1
+    rel_paths = sorted(passstore_obj.index_rel_paths())
+    disabled_keys = passstore_obj.config.get("settings", {}).get("disabled_keys", [])
+    recipient_key_ids = [gpg.key_ids(key) for key in passstore_obj.recipients(disabled_keys)]
+    private_keys = passstore_obj.private_keys()
+    private_key_ids = [key_id for key in private_keys for key_id in gpg.key_ids(key)]
+
+    # Also checks the passphrase before any worker starts
+    decryptor = None if fast else passstore_obj.decryptor(passphrase)
+    checker = Checker(recipient_key_ids, private_key_ids, decryptor)
+    executor = None
+    if workers > 1 and len(rel_paths) > BATCH_SIZE:
+        armored_private_keys = None if fast else [str(key) for key in private_keys]
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(recipient_key_ids, private_key_ids, armored_private_keys, passphrase),
+        )
+
+    pending = deque()
+    try:
+        for start in range(0, len(rel_paths), BATCH_SIZE):
+            batch = [
+                (path_rel, utils.rel_to_abs(passstore_obj.path_store, path_rel))
+                for path_rel in rel_paths[start:start + BATCH_SIZE]]
+            if executor is None:
+                yield from check_batch(batch, checker)
+                continue
+            # Results are yielded in order while the next batches are checked
+            if len(pending) >= workers * MAX_PENDING_PER_WORKER:
+                yield from pending.popleft().result()
+            pending.append(executor.submit(check_batch, batch))
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def write_report(path_abs_report, report):
+    path_tmp = f"{path_abs_report}.tmp"
+    try:
+        with open(path_tmp, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        os.replace(path_tmp, path_abs_report)
+    finally:
+        if os.path.exists(path_tmp):
+            os.remove(path_tmp)
+
+
+def verify_store(passstore_obj, passphrase=None, fast=False, workers=None, callback=None,
+                 path_abs_report=None):
+    """Check the entries of the store and write a summary report
+
+    Args:
+        passstore_obj: PassStore holding the entries and the keys
+        passphrase: Passphrase of the private key, unused in fast mode
+        fast: Only check the packet headers, nothing is decrypted
+        workers: Number of processes, the number of CPUs if None
+        callback: Called with (path_rel, problem, detail) for each finding
+        path_abs_report: Path to the JSON report, none is written if None
+
+    Returns:
+        dict: Number of entries checked and healthy, count per problem and findings
+    """
+    start = time.monotonic()
+    report = {
+        "store": passstore_obj.path_store,
+        "mode": "fast" if fast else "full",
+        "checked": 0,
+        "healthy": 0,
+        "problems": dict.fromkeys(PROBLEMS, 0),
+        "findings": [],
+    }
+    for path_rel, findings in scan(passstore_obj, passphrase=passphrase, fast=fast, workers=workers):
+        report["checked"] += 1
+        if not findings:
+            report["healthy"] += 1
+        for problem, detail in findings:
+            report["problems"][problem] += 1
+            report["findings"].append({"path": path_rel, "problem": problem, "detail": detail})
+            if callback is not None:
+                callback(path_rel, problem, detail)
+    report["duration"] = round(time.monotonic() - start, 3)
+    if path_abs_report is not None:
+        write_report(path_abs_report, report)
+    return report
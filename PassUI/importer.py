@@ -0,0 +1,460 @@
+"""importer.py - Bulk import of password manager exports
+
+This module streams the rows of CSV and JSON exports (generic columns,
+Bitwarden, KeePass/KeePassXC), maps them to the fields of data_dict_to_str
+and encrypts them in worker processes. Only a bounded number of batches is in
+flight at any time, so memory stays flat whatever the size of the export.
+"""
+
+import os
+import csv
+import json
+from PassUI import gpg, utils
+
+CONFLICTS = ("skip", "rename", "overwrite")
+LAYOUTS = ("generic", "bitwarden", "keepass")
+
+# Entries sent to a worker at once, to amortize the inter-process overhead
+BATCH_SIZE = 64
+
+# Batches in flight per worker, bounds the memory used by the import
+MAX_PENDING_PER_WORKER = 4
+
+# Bytes read at once from a JSON export
+JSON_CHUNK_SIZE = 1 << 16
+
+# Column aliases of the generic and KeePass layouts, lowercase
+PATH_COLUMNS = ("path",)
+NAME_COLUMNS = ("name", "title", "account")
+FOLDER_COLUMNS = ("folder", "group", "grouping")
+PASSWORD_COLUMNS = ("password", "pass")
+FIELD_COLUMNS = {
+    "username": "user", "login": "user", "login name": "user", "user name": "user",
+    "email": "mail", "e-mail": "mail",
+    "url": "url", "uri": "url", "web site": "url", "website": "url",
+    "notes": "notes", "note": "notes", "comments": "notes", "extra": "notes",
+    "totp": "totp", "otp": "totp",
+}
+
+# Export metadata that is not worth keeping in an entry
+IGNORED_COLUMNS = frozenset([
+    "icon", "last modified", "created", "favorite", "fav", "reprompt", "type", "id",
+])
+
+
+def clean_value(value):
+    """Field value, its following lines are written as continuation lines"""
+    if value is None:
+        return ""
+    value = str(value).strip()
+    return value.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def clean_password(value):
+    """One-line password, the first line of an entry"""
+    return clean_value(value).replace("\n", "\\n")
+
+
+def clean_field(field):
+    return str(field).replace(":", " ").replace("\n", " ").strip()
+
+
+def clean_part(part):
+    # Hidden names would be ignored by the store walk
+    return part.replace(os.sep, "-").replace("/", "-").strip().lstrip(".").strip()
+
+
+def make_path(folder, name):
+    """Relative path of an entry from its folder and name
+
+    Args:
+        folder: Folder of the entry, "/" separated, may be empty
+        name: Name of the entry
+
+    Returns:
+        str: Relative path, without .gpg
+    """
+    parts = [clean_part(part) for part in str(folder or "").replace("\\", "/").split("/")]
+    parts = [part for part in parts if part]
+    parts.append(clean_part(str(name or "")) or "untitled")
+    return os.path.join(*parts)
+
+
+def iter_json_values(file, chunk_size=JSON_CHUNK_SIZE):
+    """Stream the elements of the arrays of a JSON export
+
+    Top-level arrays are streamed element by element. For a top-level object
+    the values of its keys are decoded whole, except arrays which are
+    streamed too, so that an export with a huge "items" array never sits in
+    memory.
+
+    Args:
+        file: Text file opened on the export
+        chunk_size: Characters read at once
+
+    Yields:
+        tuple: (key of the array or None for a top-level array, element)
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        data = file.read(chunk_size)
+        buffer = buffer[pos:] + data
+        pos = 0
+        eof = not data
+
+    def peek():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or eof:
+                return buffer[pos] if pos < len(buffer) else ""
+            fill()
+
+    def expect(char):
+        nonlocal pos
+        if peek() != char:
+            raise ValueError(f"Invalid JSON export: expected {char!r} got {peek()!r}")
+        pos += 1
+
+    def decode():
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # A value ending the buffer may be cut, e.g. a number
+            if end == len(buffer) and not eof:
+                fill()
+                continue
+            pos = end
+            return value
+
+    def stream_array(key):
+        nonlocal pos
+        expect("[")
+        if peek() == "]":
+            pos += 1
+            return
+        while True:
+            yield key, decode()
+            if peek() == ",":
+                pos += 1
+                continue
+            expect("]")
+            return
+
+    fill()
+    if peek() == "[":
+        yield from stream_array(None)
+        return
+    expect("{")
+    if peek() == "}":
+        return
+    while True:
+        key = decode()
+        expect(":")
+        if peek() == "[":
+            yield from stream_array(key)
+        else:
+            yield key, decode()
+        if peek() == ",":
+            pos += 1
+            continue
+        expect("}")
+        return
+
+
+def detect_layout(columns):
+    """Layout of an export from its column names or item keys
+
+    Args:
+        columns: Column names of a CSV, or keys of a JSON item
+
+    Returns:
+        str: One of LAYOUTS
+    """
+    columns = {str(column).lower() for column in columns}
+    if "login_password" in columns or ("login" in columns and "folderid" in columns):
+        return "bitwarden"
+    if {"group", "title"} <= columns or "login name" in columns:
+        return "keepass"
+    return "generic"
+
+
+def flatten_bitwarden_item(item, folders):
+    """Bitwarden JSON item as a row of the Bitwarden CSV layout"""
+    login = item.get("login") or {}
+    uris = [uri.get("uri") for uri in login.get("uris") or [] if uri.get("uri")]
+    return {
+        "folder": folders.get(item.get("folderId"), ""),
+        "name": item.get("name"),
+        "notes": item.get("notes"),
+        "fields": [(field.get("name"), field.get("value")) for field in item.get("fields") or []],
+        "login_uri": " ".join(uris),
+        "login_username": login.get("username"),
+        "login_password": login.get("password"),
+        "login_totp": login.get("totp"),
+    }
+
+
+def add_fields(data_dict, fields):
+    """Add custom fields to an entry, without replacing its fields
+
+    Args:
+        data_dict: Fields of the entry
+        fields: List of (name, value), or "name: value" lines as in CSV exports
+    """
+    fields = fields or []
+    if isinstance(fields, str):
+        fields = [line.split(": ", 1) for line in fields.splitlines() if ": " in line]
+    for field, value in fields:
+        field, value = clean_field(field or ""), clean_value(value)
+        if field and field != "PASSWORD" and value:
+            data_dict.setdefault(field, value)
+
+
+def map_bitwarden(row):
+    data_dict = {"PASSWORD": clean_password(row.get("login_password"))}
+    for column, field in (
+            ("login_username", "user"), ("login_uri", "url"),
+            ("login_totp", "totp"), ("notes", "notes")):
+        value = clean_value(row.get(column))
+        if value:
+            data_dict[field] = value
+    add_fields(data_dict, row.get("fields"))
+    return make_path(row.get("folder"), row.get("name")), data_dict
+
+
+def map_columns(row, strip_root=False):
+    """Map a generic or KeePass row, unknown columns become fields"""
+    path = name = folder = None
+    data_dict = {"PASSWORD": ""}
+    for column, value in row.items():
+        if column is None:
+            continue
+        key = str(column).strip().lower()
+        if key in PATH_COLUMNS:
+            path = value
+        elif key in NAME_COLUMNS and name is None:
+            name = value
+        elif key in FOLDER_COLUMNS:
+            folder = value
+        elif key in PASSWORD_COLUMNS:
+            data_dict["PASSWORD"] = clean_password(value)
+        elif key == "fields":
+            add_fields(data_dict, value)
+        elif key not in IGNORED_COLUMNS:
+            value = clean_value(value)
+            field = FIELD_COLUMNS.get(key, clean_field(column))
+            if value and field and field != "PASSWORD":
+                data_dict.setdefault(field, value)
+    if path:
+        folder, _, name = str(path).replace("\\", "/").rpartition("/")
+        return make_path(folder, name), data_dict
+    if strip_root and folder:
+        # KeePass groups start with the name of the database root group
+        folder = str(folder).replace("\\", "/").split("/", 1)[1] if "/" in str(folder) else ""
+    return make_path(folder, name), data_dict
+
+
+def map_row(layout, row):
+    """Map a row of an export to an entry
+
+    Args:
+        layout: One of LAYOUTS
+        row: Dict of the columns of the row
+
+    Returns:
+        tuple: (path_rel, data_dict)
+    """
+    if layout == "bitwarden":
+        return map_bitwarden(row)
+    return map_columns(row, strip_root=layout == "keepass")
+
+
+def iter_entries(path_abs, layout=None):
+    """Stream the entries of an export
+
+    Args:
+        path_abs: Path to a .csv or .json export
+        layout: One of LAYOUTS, detected from the columns if None
+
+    Yields:
+        tuple: (path_rel, data_dict), or (None, error message) for bad rows
+    """
+    if path_abs.lower().endswith(".json"):
+        folders = {}
+        with open(path_abs, encoding="utf-8-sig") as file:
+            for key, value in iter_json_values(file):
+                if key == "folders":
+                    folders[value.get("id")] = value.get("name") or ""
+                    continue
+                if key not in (None, "items", "entries") or not isinstance(value, dict):
+                    continue
+                item_layout = layout or detect_layout(value)
+                try:
+                    if item_layout == "bitwarden":
+                        # Bitwarden lists its folders before its items
+                        value = flatten_bitwarden_item(value, folders)
+                    yield map_row(item_layout, value)
+                except Exception as e:
+                    yield None, f"Invalid item {value.get('name')!r}: {e}"
+        return
+
+    with open(path_abs, newline="", encoding="utf-8-sig") as file:
+        reader = csv.DictReader(file)
+        layout = layout or detect_layout(reader.fieldnames or [])
+        for row in reader:
+            try:
+                yield map_row(layout, row)
+            except Exception as e:
+                yield None, f"Invalid row {reader.line_num}: {e}"
+
+
+_worker_recipients = None
+
+
+def _init_worker(armored_recipients):
+    global _worker_recipients
+    _worker_recipients = [gpg.key_from_armored(armored) for armored in armored_recipients]
+
+
+def encrypt_batch(batch, recipients=None):
+    """Encrypt and write a batch of entries, in a worker process
+
+    Args:
+        batch: List of (path_abs, data_str)
+        recipients: Public keys, those of the worker if None
+
+    Returns:
+        list: Error message of each entry, None if it was written
+    """
+    recipients = recipients or _worker_recipients
+    errors = []
+    for path_abs, data_str in batch:
+        try:
+            data = gpg.encrypt_to(recipients, data_str.encode("utf-8"))
+            os.makedirs(os.path.dirname(path_abs), exist_ok=True)
+            # Entries are replaced at once, never left half written
+            path_tmp = f"{path_abs}.{os.getpid()}.tmp"
+            with open(path_tmp, "wb") as f:
+                f.write(data)
+            os.replace(path_tmp, path_abs)
+            errors.append(None)
+        except Exception as e:
+            errors.append(str(e))
+    return errors
+
+
+def import_file(passstore_obj, path_abs, layout=None, conflict="skip", workers=None):
+    """Import a password manager export into the store
+
+    Args:
+        passstore_obj: PassStore receiving the entries
+        path_abs: Path to a .csv or .json export
+        layout: One of LAYOUTS, detected if None
+        conflict: What to do with existing entries, one of CONFLICTS
+        workers: Number of encryption processes, the number of CPUs if None
+
+    Returns:
+        dict: Number of entries imported (renamed and overwritten included),
+            renamed, overwritten, skipped and failed
+    """
+    # Only bulk operations need multiprocessing, it is not imported at startup
+    from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+    if conflict not in CONFLICTS:
+        raise ValueError(f"Unknown conflict policy {conflict!r}, expected one of {CONFLICTS}")
+    if layout is not None and layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout!r}, expected one of {LAYOUTS}")
+    workers = workers or os.cpu_count() or 1
+    disabled_keys = passstore_obj.config.get("settings", {}).get("disabled_keys", [])
+    recipients = passstore_obj.recipients(disabled_keys)
+    if not recipients:
+        raise ValueError("No recipients found for encryption")
+
+    report = {"imported": 0, "renamed": 0, "overwritten": 0, "skipped": 0, "failed": 0}
+    taken = set()  # Entries written by this import
+    track_changes = bool(passstore_obj.enabled_encrypted_indexes())
+    pending = {}  # future -> list of (path_rel, data_dict or None, conflict counter or None)
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=([str(recipient) for recipient in recipients],),
+        )
+
+    def collect(entries, errors):
+        changes, written = [], []
+        for (path_rel, data_dict, counter), error in zip(entries, errors):
+            if error is None:
+                written.append(path_rel)
+                if data_dict is not None:
+                    changes.append((path_rel, data_dict))
+            else:
+                print(f"Error importing {path_rel}: {error}")
+                report["failed"] += 1
+                report["imported"] -= 1
+                if counter is not None:
+                    report[counter] -= 1
+        if changes:
+            passstore_obj.update_encrypted_indexes_batch(changes)
+        passstore_obj.git_add(written, f"Import {len(written)} entries")
+
+    def submit(batch, entries):
+        if executor is None:
+            collect(entries, encrypt_batch(batch, recipients))
+            return
+        while len(pending) >= workers * MAX_PENDING_PER_WORKER:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                collect(pending.pop(future), future.result())
+        pending[executor.submit(encrypt_batch, batch)] = entries
+
+    try:
+        batch, entries = [], []
+        for path_rel, data_dict in iter_entries(path_abs, layout):
+            if path_rel is None:
+                print(f"Error importing {path_abs}: {data_dict}")
+                report["failed"] += 1
+                continue
+            path_abs_entry = utils.rel_to_abs(passstore_obj.path_store, path_rel)
+            counter = None
+            if path_abs_entry in taken or os.path.exists(path_abs_entry):
+                if conflict == "skip":
+                    report["skipped"] += 1
+                    continue
+                if conflict == "rename":
+                    path_abs_entry, name = utils.new_incr(
+                        os.path.dirname(path_abs_entry), os.path.basename(path_rel), ".gpg", taken=taken)
+                    path_rel = os.path.join(os.path.dirname(path_rel), name)
+                    counter = "renamed"
+                else:
+                    counter = "overwritten"
+                report[counter] += 1
+            taken.add(path_abs_entry)
+            report["imported"] += 1
+            batch.append((path_abs_entry, utils.data_dict_to_str(data_dict)))
+            entries.append((path_rel, data_dict if track_changes else None, counter))
+            if len(batch) >= BATCH_SIZE:
+                submit(batch, entries)
+                batch, entries = [], []
+        if batch:
+            submit(batch, entries)
+        for future in list(pending):
+            collect(pending.pop(future), future.result())
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return report
@@ -0,0 +1,269 @@
+"""index.py - Persistent index of the password store
+
+This module keeps a SQLite snapshot of the password store tree next to the
+user config, so that startup only has to stat the known directories and
+rescan the ones whose mtime changed instead of walking the whole store.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from PassUI import utils
+
+# Directories modified less than this many seconds before a scan are stored
+# with an invalid mtime so that they are rescanned on the next reconcile
+# (same "racy timestamp" problem as git's index).
+RACY_DELAY = 2
+
+
+class StoreIndex:
+    """SQLite snapshot of the .gpg entries of one password store"""
+
+    def __init__(self, path_store, ignored_directories=None, path_db=None):
+        """Open (or create) the snapshot of a password store
+
+        Args:
+            path_store: Absolute path to the password store
+            ignored_directories: Relative directories never scanned
+            path_db: Path to the SQLite file, defaults to utils.get_index_path()
+        """
+        self.path_store = os.path.abspath(path_store)
+        self.ignored_directories = sorted(set(ignored_directories or []))
+        self.path_db = str(path_db or utils.get_index_path())
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(self.path_db, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+        self.store_id = self._get_store_id()
+
+    def _create_tables(self):
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS stores ("
+                "id INTEGER PRIMARY KEY, path TEXT UNIQUE, ignored TEXT)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS dirs ("
+                "store INTEGER, path TEXT, mtime INTEGER, inode INTEGER, "
+                "PRIMARY KEY (store, path))")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "store INTEGER, path TEXT, dir TEXT, mtime INTEGER, inode INTEGER, size INTEGER, "
+                "PRIMARY KEY (store, path))")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS entries_dir ON entries (store, dir)")
+
+    def _get_store_id(self):
+        ignored = "\n".join(self.ignored_directories)
+        row = self.conn.execute(
+            "SELECT id, ignored FROM stores WHERE path = ?", (self.path_store,)).fetchone()
+        if row is None:
+            with self.conn:
+                cursor = self.conn.execute(
+                    "INSERT INTO stores (path, ignored) VALUES (?, ?)", (self.path_store, ignored))
+            return cursor.lastrowid
+        store_id, ignored_db = row
+        if ignored_db != ignored:
+            # Un-ignored directories were never scanned, start from scratch
+            with self.conn:
+                self.conn.execute("DELETE FROM dirs WHERE store = ?", (store_id,))
+                self.conn.execute("DELETE FROM entries WHERE store = ?", (store_id,))
+                self.conn.execute("UPDATE stores SET ignored = ? WHERE id = ?", (ignored, store_id))
+        return store_id
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def is_ignored_dir(self, path_rel_dir):
+        for path_rel_ignored in self.ignored_directories:
+            if path_rel_dir.startswith(path_rel_ignored):
+                return True
+        return False
+
+    def _abs(self, path_rel):
+        return os.path.join(self.path_store, path_rel) if path_rel else self.path_store
+
+    def _scan_dir(self, path_rel_dir, now):
+        """Rescan one directory level and recurse into new subdirectories
+
+        Args:
+            path_rel_dir: Relative path of the directory ("" for the store root)
+            now: Time of the scan, used for the racy mtime check
+
+        Returns:
+            int: Number of directories scanned
+        """
+        path_abs_dir = self._abs(path_rel_dir)
+        try:
+            st = os.stat(path_abs_dir)
+            scandir = list(os.scandir(path_abs_dir))
+        except OSError:
+            self._remove_dir(path_rel_dir)
+            return 0
+
+        subdirs = set()
+        entries = []
+        for dir_entry in scandir:
+            path_rel = os.path.join(path_rel_dir, dir_entry.name) if path_rel_dir else dir_entry.name
+            try:
+                if dir_entry.is_dir(follow_symlinks=False):
+                    if not self.is_ignored_dir(path_rel):
+                        subdirs.add(path_rel)
+                elif dir_entry.name.endswith(".gpg") and dir_entry.is_file():
+                    st_entry = dir_entry.stat()
+                    entries.append((
+                        self.store_id, path_rel[:-len(".gpg")], path_rel_dir,
+                        st_entry.st_mtime_ns, st_entry.st_ino, st_entry.st_size))
+            except OSError:
+                continue
+
+        mtime = st.st_mtime_ns if now - st.st_mtime > RACY_DELAY else -1
+        known_subdirs = {row[0] for row in self.conn.execute(
+            "SELECT path FROM dirs WHERE store = ? AND path LIKE ? ESCAPE '\\'",
+            (self.store_id, self._like_children(path_rel_dir)))
+            if row[0] and row[0] != path_rel_dir and os.path.dirname(row[0]) == path_rel_dir}
+
+        self.conn.execute("DELETE FROM entries WHERE store = ? AND dir = ?", (self.store_id, path_rel_dir))
+        self.conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", entries)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)",
+            (self.store_id, path_rel_dir, mtime, st.st_ino))
+
+        for path_rel_removed in known_subdirs - subdirs:
+            self._remove_dir(path_rel_removed)
+
+        nb_scanned = 1
+        for path_rel_new in sorted(subdirs - known_subdirs):
+            nb_scanned += self._scan_dir(path_rel_new, now)
+        return nb_scanned
+
+    @staticmethod
+    def _like_children(path_rel_dir):
+        if not path_rel_dir:
+            return "%"
+        escaped = path_rel_dir.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return escaped + os.sep + "%"
+
+    def _remove_dir(self, path_rel_dir):
+        """Forget a directory and everything below it"""
+        like = self._like_children(path_rel_dir)
+        for table in ("dirs", "entries"):
+            column = "path" if table == "dirs" else "dir"
+            self.conn.execute(f"DELETE FROM {table} WHERE store = ? AND {column} = ?", (self.store_id, path_rel_dir))
+            if path_rel_dir:
+                self.conn.execute(
+                    f"DELETE FROM {table} WHERE store = ? AND {column} LIKE ? ESCAPE '\\'",
+                    (self.store_id, like))
+
+    def reconcile(self):
+        """Bring the snapshot up to date with the store on disk
+
+        Only the directories whose mtime or inode changed since the last
+        reconcile are listed again, the others only cost one stat.
+
+        Returns:
+            int: Number of directories rescanned
+        """
+        with self.lock, self.conn:
+            now = time.time()
+            known = self.conn.execute(
+                "SELECT path, mtime, inode FROM dirs WHERE store = ?", (self.store_id,)).fetchall()
+            if not known:
+                return self._scan_dir("", now)
+
+            changed = []
+            for path_rel_dir, mtime, inode in known:
+                try:
+                    st = os.stat(self._abs(path_rel_dir))
+                except OSError:
+                    changed.append(path_rel_dir)
+                    continue
+                if st.st_mtime_ns != mtime or st.st_ino != inode:
+                    changed.append(path_rel_dir)
+
+            nb_scanned = 0
+            # Parents first so that removed subtrees are dropped before being visited
+            for path_rel_dir in sorted(changed, key=lambda path: path.count(os.sep) + bool(path)):
+                if self.conn.execute(
+                        "SELECT 1 FROM dirs WHERE store = ? AND path = ?",
+                        (self.store_id, path_rel_dir)).fetchone() is None:
+                    continue
+                nb_scanned += self._scan_dir(path_rel_dir, now)
+            return nb_scanned
+
+    def update_entry(self, path_rel):
+        """Record a single entry after it has been written
+
+        Args:
+            path_rel: Relative path of the entry, without .gpg
+        """
+        self.update_entries([path_rel])
+
+    def update_entries(self, paths_rel):
+        """Record entries after they have been written, in one transaction
+
+        Args:
+            paths_rel: Relative paths of the entries, without .gpg
+        """
+        rows, removed, dirs = [], [], set()
+        for path_rel in paths_rel:
+            try:
+                st = os.stat(utils.rel_to_abs(self.path_store, path_rel))
+            except OSError:
+                removed.append((self.store_id, path_rel))
+                continue
+            path_rel_dir = os.path.dirname(path_rel)
+            rows.append((self.store_id, path_rel, path_rel_dir, st.st_mtime_ns, st.st_ino, st.st_size))
+            dirs.add(path_rel_dir)
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.conn.executemany("DELETE FROM entries WHERE store = ? AND path = ?", removed)
+            # Make sure the next reconcile looks at the directories again
+            self.conn.executemany(
+                "UPDATE dirs SET mtime = -1 WHERE store = ? AND path = ?",
+                [(self.store_id, path_rel_dir) for path_rel_dir in dirs])
+
+    def remove_entry(self, path_rel):
+        """Forget a single entry
+
+        Args:
+            path_rel: Relative path of the entry, without .gpg
+        """
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM entries WHERE store = ? AND path = ?", (self.store_id, path_rel))
+
+    def entries(self):
+        """List the indexed entries with their stat information
+
+        Returns:
+            list: Tuples of (path_rel, mtime_ns, inode, size) sorted by path
+        """
+        with self.lock:
+            return self.conn.execute(
+                "SELECT path, mtime, inode, size FROM entries WHERE store = ? ORDER BY path",
+                (self.store_id,)).fetchall()
+
+    def rel_paths(self, ignored_directories=None, ignored_files=None):
+        """List the relative paths of the entries, without .gpg
+
+        Args:
+            ignored_directories: Relative directories to leave out
+            ignored_files: Relative .gpg files to leave out
+
+        Returns:
+            list: Sorted relative paths
+        """
+        ignored_directories = list(ignored_directories or [])
+        ignored_files = set(ignored_files or [])
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path, dir FROM entries WHERE store = ? ORDER BY path", (self.store_id,)).fetchall()
+        res = []
+        for path_rel, path_rel_dir in rows:
+            if path_rel + ".gpg" in ignored_files:
+                continue
+            if path_rel_dir and any(path_rel_dir.startswith(ignored) for ignored in ignored_directories):
+                continue
+            res.append(path_rel)
+        return res
@@ -0,0 +1,153 @@
+"""jobs.py - Progress and cancellation of long crypto jobs
+
+A Job is passed to the long operations of PassStore (encrypt_directory,
+decrypt_directory, encrypt_file, decrypt_file). They report the files and
+bytes they processed, and check between files and between chunks whether
+the job was cancelled, in which case they raise Cancelled and clean up.
+OpenPGP messages are encrypted and decrypted whole by pgpy, so a single file
+in that format is only checked before and after it, while archives and stream
+containers are checked between chunks.
+"""
+
+import time
+import threading
+
+# Seconds between two progress callbacks, the last one is always sent
+REPORT_INTERVAL = 0.2
+
+
+class Cancelled(Exception):
+    """The job was cancelled"""
+
+
+class Job:
+    """Progress of a long operation, cancellable from another thread"""
+
+    def __init__(self, callback=None, interval=REPORT_INTERVAL):
+        """
+        Args:
+            callback: Called with the Job.progress() dict as the job advances
+            interval: Minimum seconds between two callbacks
+        """
+        self.callback = callback
+        self.interval = interval
+        self.files_total = 0
+        self.bytes_total = 0
+        self.files_done = 0
+        self.bytes_done = 0
+        self.start = time.monotonic()
+        self._reported = 0
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check(self):
+        """Raise Cancelled if the job was cancelled"""
+        if self._cancel.is_set():
+            raise Cancelled("Operation cancelled")
+
+    def add_total(self, files=0, nbytes=0):
+        """Add to the work to do, as it is discovered"""
+        with self._lock:
+            self.files_total += files
+            self.bytes_total += nbytes
+
+    def advance(self, files=0, nbytes=0):
+        """Record work done, report it and check for cancellation
+
+        Raises:
+            Cancelled: If the job was cancelled
+        """
+        with self._lock:
+            self.files_done += files
+            self.bytes_done += nbytes
+            now = time.monotonic()
+            report = now - self._reported >= self.interval
+            if report:
+                self._reported = now
+        if report:
+            self.report()
+        self.check()
+
+    def report(self):
+        if self.callback is not None:
+            self.callback(self.progress())
+
+    def progress(self):
+        """Progress of the job
+
+        Returns:
+            dict: files_done, files_total, bytes_done, bytes_total, elapsed
+                seconds, rate in bytes per second and eta in seconds (None
+                while unknown)
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self.start
+            rate = self.bytes_done / elapsed if elapsed > 0 else 0.0
+            eta = None
+            if rate and self.bytes_total >= self.bytes_done:
+                eta = (self.bytes_total - self.bytes_done) / rate
+            return {
+                "files_done": self.files_done,
+                "files_total": self.files_total,
+                "bytes_done": self.bytes_done,
+                "bytes_total": self.bytes_total,
+                "elapsed": elapsed,
+                "rate": rate,
+                "eta": eta,
+            }
+
+    def summary(self, success, message=""):
+        """Results of the finished job, also sent to the callback
+
+        Args:
+            success: Whether the operation succeeded
+            message: Outcome of the operation
+
+        Returns:
+            dict: Job.progress() with success, cancelled and message
+        """
+        summary = {**self.progress(), "success": success, "cancelled": self.cancelled, "message": message}
+        if self.callback is not None:
+            self.callback(summary)
+        return summary
+
+    def reader(self, file):
+        """Binary file reporting the bytes read from it to the job"""
+        return _ProgressReader(file, self)
+
+
+class _ProgressReader:
+    """Binary file reporting the bytes read to a job"""
+
+    def __init__(self, file, job):
+        self.file = file
+        self.job = job
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        self.job.advance(nbytes=len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+def format_progress(progress):
+    """One line describing a Job.progress() dict, e.g. for a progress dialog"""
+    text = f"{progress['files_done']}"
+    if progress["files_total"]:
+        text += f"/{progress['files_total']}"
+    text += f" files, {progress['bytes_done'] / (1 << 20):.1f}"
+    if progress["bytes_total"]:
+        text += f"/{progress['bytes_total'] / (1 << 20):.1f}"
+    text += f" MB, {progress['rate'] / (1 << 20):.1f} MB/s"
+    if progress["eta"] is not None:
+        text += f", {int(progress['eta']) // 60}:{int(progress['eta']) % 60:02d} left"
+    return text
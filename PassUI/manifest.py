@@ -0,0 +1,224 @@
+"""manifest.py - Incremental and resumable encryption of a directory
+
+encrypt_directory(incremental=True) keeps a manifest in the directory: for
+each file, its size, mtime and keyed hash and the size and mtime of its
+.bgpg. A file whose stat did not change since its .bgpg was written is
+skipped without being read, a file whose stat changed but not its content
+only gets its manifest entry updated, so a run costs the bytes that
+changed. The manifest is saved as files are encrypted, so an interrupted
+run resumes where it stopped.
+
+The manifest lies in the clear next to the .bgpg files, a plain hash of a
+file would let anyone holding them confirm a guess of its content. The
+hashes are HMAC-SHA-256 under a random key kept in the home directory,
+on another machine the touched files are simply encrypted again.
+"""
+
+import os
+import hmac
+import json
+import time
+import hashlib
+from PassUI import utils
+
+MANIFEST_NAME = ".passui-manifest.json"
+# Version 1 held plain SHA-256 hashes
+VERSION = 2
+
+HASH_KEY_SIZE = 32
+# Bytes read at a time to hash a file
+HASH_CHUNK_SIZE = 1 << 20
+
+# Seconds between two saves of the manifest during a run
+SAVE_INTERVAL = 2.0
+
+
+class Manifest:
+    """Files of a directory and the .bgpg they were encrypted to"""
+
+    def __init__(self, path_abs_dir):
+        self.path_abs_dir = path_abs_dir
+        self.path = os.path.join(path_abs_dir, MANIFEST_NAME)
+        self.recipients = []
+        self.entries = {}  # path_rel -> dict
+        self._saved = time.monotonic()
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Error reading manifest {self.path}, starting over: {e}")
+            return
+        if data.get("version") == VERSION:
+            self.recipients = data.get("recipients", [])
+            self.entries = data.get("entries", {})
+
+    def save(self):
+        path_tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(path_tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": VERSION, "recipients": self.recipients, "entries": self.entries}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path_tmp, self.path)
+        finally:
+            if os.path.exists(path_tmp):
+                os.remove(path_tmp)
+        self._saved = time.monotonic()
+        self._dirty = False
+
+    def save_later(self):
+        """Save the manifest if the last save is old enough"""
+        self._dirty = True
+        if time.monotonic() - self._saved >= SAVE_INTERVAL:
+            self.save()
+
+    def output_valid(self, entry):
+        """Whether the .bgpg of an entry is still the one it was written as"""
+        try:
+            st = os.stat(os.path.join(self.path_abs_dir, entry["output"]))
+        except OSError:
+            return False
+        return [st.st_size, st.st_mtime_ns] == entry["output_stat"]
+
+
+def hash_key():
+    """Key of the file hashes, created on first use"""
+    path = utils.get_manifest_key_path()
+    try:
+        with open(path, "rb") as f:
+            key = f.read()
+        if len(key) == HASH_KEY_SIZE:
+            return key
+    except FileNotFoundError:
+        pass
+    key = os.urandom(HASH_KEY_SIZE)
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+        f.write(key)
+    return key
+
+
+def file_hash(path_abs, key):
+    """HMAC-SHA-256 of a file, read in chunks"""
+    digest = hmac.new(key, digestmod=hashlib.sha256)
+    with open(path_abs, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_own_file(name):
+    """Whether a file was written by encrypt_directory: an output, the manifest or their temporary files"""
+    return (
+        name.endswith((".bgpg", ".bgpg.tmp")) or name == MANIFEST_NAME
+        or (name.startswith(MANIFEST_NAME + ".") and name.endswith(".tmp")))
+
+
+def iter_files(path_abs_dir):
+    """Relative paths of the files to encrypt, the outputs and the manifest left out"""
+    for root, dirs, files in os.walk(path_abs_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if is_own_file(name):
+                continue
+            yield os.path.relpath(os.path.join(root, name), path_abs_dir)
+
+
+def encrypt_directory(passstore_obj, path_abs_dir, replace=False, job=None):
+    """Encrypt the files of a directory that changed since the last run
+
+    Args:
+        passstore_obj: PassStore encrypting to its recipients
+        path_abs_dir: Directory to encrypt, each file next to itself as .bgpg
+        replace: Remove the files once encrypted
+        job: jobs.Job receiving the progress, checked between files
+
+    Returns:
+        dict: Number of files encrypted, unchanged and failed
+    """
+    disabled_keys = passstore_obj.config.get("settings", {}).get("disabled_keys", [])
+    recipients = passstore_obj.recipients(disabled_keys)
+    recipient_ids = sorted(key.fingerprint.keyid for key in recipients)
+    manifest = Manifest(path_abs_dir)
+    key = hash_key()
+    if manifest.recipients != recipient_ids:
+        # Everything has to be encrypted again for the new recipients
+        manifest.recipients = recipient_ids
+        manifest.entries = {}
+    report = {"encrypted": 0, "unchanged": 0, "failed": 0}
+
+    paths_rel = list(iter_files(path_abs_dir))
+    if job is not None:
+        job.add_total(len(paths_rel), sum(
+            os.path.getsize(os.path.join(path_abs_dir, path_rel)) for path_rel in paths_rel))
+    try:
+        for path_rel in paths_rel:
+            if job is not None:
+                job.check()
+            path_abs = os.path.join(path_abs_dir, path_rel)
+            entry = manifest.entries.get(path_rel)
+            size = 0
+            try:
+                st = os.stat(path_abs)
+                size = st.st_size
+                stat = [st.st_size, st.st_mtime_ns]
+                if entry is not None and entry["stat"] == stat and manifest.output_valid(entry):
+                    # Unchanged, not even read
+                    data = None
+                else:
+                    digest = file_hash(path_abs, key)
+                    if entry is not None and hmac.compare_digest(entry["hash"], digest) and manifest.output_valid(entry):
+                        # Touched but not modified
+                        entry["stat"] = stat
+                        manifest.save_later()
+                        data = None
+                    else:
+                        with open(path_abs, "rb") as f:
+                            data = f.read()
+
+                if data is None:
+                    report["unchanged"] += 1
+                else:
+                    path_abs_output = path_abs + ".bgpg"
+                    path_tmp = path_abs_output + ".tmp"
+                    try:
+                        with open(path_tmp, "wb") as f:
+                            f.write(passstore_obj.encrypt_bytes(data, disabled_keys))
+                            f.flush()
+                            os.fsync(f.fileno())
+                        os.replace(path_tmp, path_abs_output)
+                    finally:
+                        if os.path.exists(path_tmp):
+                            os.remove(path_tmp)
+                    st_output = os.stat(path_abs_output)
+                    manifest.entries[path_rel] = {
+                        "stat": stat,
+                        "hash": digest,
+                        "output": path_rel + ".bgpg",
+                        "output_stat": [st_output.st_size, st_output.st_mtime_ns],
+                    }
+                    manifest.save_later()
+                    report["encrypted"] += 1
+
+                if replace:
+                    os.remove(path_abs)
+            except (OSError, ValueError) as e:
+                print(f"Error encrypting file {path_abs}: {e}")
+                report["failed"] += 1
+            if job is not None:
+                job.advance(files=1, nbytes=size)
+
+        # Files gone together with their .bgpg are forgotten
+        for path_rel, entry in list(manifest.entries.items()):
+            if not manifest.output_valid(entry) and not os.path.exists(os.path.join(path_abs_dir, path_rel)):
+                del manifest.entries[path_rel]
+                manifest._dirty = True
+    finally:
+        if manifest._dirty:
+            manifest.save()
+    return report
@@ -0,0 +1,296 @@
+"""metaindex.py - Encrypted index over the decrypted fields of the entries
+
+This module keeps an in-memory inverted index of the field names and values
+of every entry (never the password itself), so that questions like "which
+entry has user=jdoe" do not need to decrypt the whole store.
+
+On disk the index is one file encrypted to the store recipients, plus small
+delta files also encrypted to the recipients. Writing a delta only needs the
+public keys, so write_key can keep the index up to date without asking for a
+passphrase; the deltas are merged back into the main file the next time the
+index is loaded.
+"""
+
+import os
+import abc
+import json
+import time
+import uuid
+
+
+def normalize(text):
+    return str(text).strip().lower()
+
+
+class EncryptedIndex(abc.ABC):
+    """Base of the indexes stored encrypted in the store with delta files
+
+    Subclasses implement update, remove, rename, copy, dumps and loads.
+    """
+
+    INDEX_NAME = None
+    DELTAS_NAME = None
+
+    def __init__(self, path_store):
+        """Create an empty index
+
+        Args:
+            path_store: Absolute path to the password store
+        """
+        self.path_store = path_store
+        self.path_index = os.path.join(path_store, self.INDEX_NAME)
+        self.path_deltas = os.path.join(path_store, self.DELTAS_NAME)
+
+    @abc.abstractmethod
+    def update(self, path_rel, data_dict):
+        """Index the fields of an entry, replacing the previous ones"""
+
+    @abc.abstractmethod
+    def remove(self, path_rel):
+        """Forget an entry"""
+
+    @abc.abstractmethod
+    def rename(self, path_rel_old, path_rel_new):
+        """Index the fields of an entry under its new path"""
+
+    @abc.abstractmethod
+    def copy(self, path_rel, path_rel_new):
+        """Index the fields of an entry under the path of its copy too"""
+
+    @abc.abstractmethod
+    def dumps(self):
+        """Serialize the index to the string that is encrypted"""
+
+    @abc.abstractmethod
+    def loads(self, data_str):
+        """Replace the content of the index with a string of dumps"""
+
+    def delta_payload(self, data_dict):
+        """What a delta keeps of the fields of an entry, never the password"""
+        return {field: value for field, value in data_dict.items() if field != "PASSWORD"}
+
+    def list_deltas(self):
+        if not os.path.isdir(self.path_deltas):
+            return []
+        return sorted(
+            os.path.join(self.path_deltas, name) for name in os.listdir(self.path_deltas)
+            if name.endswith(".bgpg"))
+
+    def apply_delta(self, data_str):
+        delta = json.loads(data_str)
+        # A delta holds one change, or a list of them when written in batch
+        for change in delta.get("changes", [delta]):
+            if "rename" in change:
+                self.rename(change["path"], change["rename"])
+            elif "copy" in change:
+                self.copy(change["path"], change["copy"])
+            elif change.get("fields") is None:
+                self.remove(change["path"])
+            else:
+                self.update(change["path"], change["fields"])
+
+    def write_delta(self, gpg_obj, path_rel, data_dict, disabled_keys=None):
+        """Record the change of one entry without decrypting the index
+
+        Args:
+            gpg_obj: GPG object used to encrypt to the store recipients
+            path_rel: Relative path of the entry, without .gpg
+            data_dict: New fields of the entry, None if it was removed
+            disabled_keys: Key IDs excluded from the recipients
+
+        Returns:
+            bool: True if the delta was written
+        """
+        return self.write_deltas(gpg_obj, [(path_rel, data_dict)], disabled_keys=disabled_keys)
+
+    def write_deltas(self, gpg_obj, changes, disabled_keys=None):
+        """Record the changes of several entries in a single delta
+
+        Args:
+            gpg_obj: GPG object used to encrypt to the store recipients
+            changes: List of (path_rel, data_dict), data_dict None if removed
+            disabled_keys: Key IDs excluded from the recipients
+
+        Returns:
+            bool: True if the delta was written
+        """
+        return self._write_changes(gpg_obj, [
+            {"path": path_rel, "fields": None if data_dict is None else self.delta_payload(data_dict)}
+            for path_rel, data_dict in changes], disabled_keys=disabled_keys)
+
+    def write_moves(self, gpg_obj, moves, copy=False, disabled_keys=None):
+        """Record entries moved or copied in a single delta, their fields follow them
+
+        Args:
+            gpg_obj: GPG object used to encrypt to the store recipients
+            moves: Dictionary of the old relative paths to the new ones
+            copy: True if the entries were copied, the old ones staying
+            disabled_keys: Key IDs excluded from the recipients
+
+        Returns:
+            bool: True if the delta was written
+        """
+        kind = "copy" if copy else "rename"
+        return self._write_changes(gpg_obj, [
+            {"path": path_rel, kind: path_rel_new} for path_rel, path_rel_new in moves.items()],
+            disabled_keys=disabled_keys)
+
+    def _write_changes(self, gpg_obj, changes, disabled_keys=None):
+        os.makedirs(self.path_deltas, exist_ok=True)
+        delta = changes[0] if len(changes) == 1 else {"changes": changes}
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex}.bgpg"
+        return gpg_obj.write(
+            os.path.join(self.path_deltas, name),
+            json.dumps(delta),
+            disabled_keys=disabled_keys,
+        )
+
+    def load(self, gpg_obj, passphrase=None, disabled_keys=None, compact=True):
+        """Decrypt the index and its deltas, compacting them if needed
+
+        Args:
+            gpg_obj: GPG object holding the private keys
+            passphrase: Passphrase of the private key
+            disabled_keys: Key IDs excluded from the recipients on compaction
+            compact: Merge the deltas into the index file, False to leave the disk as is
+
+        Returns:
+            bool: True if the index was loaded
+        """
+        if os.path.isfile(self.path_index):
+            self.loads(gpg_obj.read(self.path_index, passphrase=passphrase))
+        deltas = self.list_deltas()
+        for path_delta in deltas:
+            self.apply_delta(gpg_obj.read(path_delta, passphrase=passphrase))
+        if deltas and compact:
+            if self.save(gpg_obj, disabled_keys=disabled_keys):
+                for path_delta in deltas:
+                    os.remove(path_delta)
+        return True
+
+    def save(self, gpg_obj, disabled_keys=None):
+        """Encrypt the whole index to the store recipients
+
+        Args:
+            gpg_obj: GPG object used to encrypt to the store recipients
+            disabled_keys: Key IDs excluded from the recipients
+
+        Returns:
+            bool: True if the index was written
+        """
+        return gpg_obj.write(self.path_index, self.dumps(), disabled_keys=disabled_keys)
+
+
+class MetadataIndex(EncryptedIndex):
+    """Inverted index of field names and values per entry"""
+
+    INDEX_NAME = ".passui-metadata.bgpg"
+    DELTAS_NAME = ".passui-metadata.d"
+
+    def __init__(self, path_store):
+        """Create an empty index
+
+        Args:
+            path_store: Absolute path to the password store
+        """
+        super().__init__(path_store)
+        self.entries = {}  # path_rel -> {field: value}
+        self.by_field = {}  # field -> set of path_rel
+        self.by_value = {}  # value -> set of path_rel
+        self.by_pair = {}  # (field, value) -> set of path_rel
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, path_rel):
+        return path_rel in self.entries
+
+    def update(self, path_rel, data_dict):
+        """Index the fields of one entry, replacing its previous fields
+
+        Args:
+            path_rel: Relative path of the entry, without .gpg
+            data_dict: Decrypted fields, as returned by utils.data_str_to_dict
+        """
+        self.remove(path_rel)
+        fields = {
+            str(field): str(value) for field, value in data_dict.items()
+            if field != "PASSWORD"}
+        self.entries[path_rel] = fields
+        for field, value in fields.items():
+            field, value = normalize(field), normalize(value)
+            self.by_field.setdefault(field, set()).add(path_rel)
+            self.by_value.setdefault(value, set()).add(path_rel)
+            self.by_pair.setdefault((field, value), set()).add(path_rel)
+
+    def remove(self, path_rel):
+        fields = self.entries.pop(path_rel, None)
+        if fields is None:
+            return
+        for field, value in fields.items():
+            field, value = normalize(field), normalize(value)
+            for mapping, key in (
+                    (self.by_field, field), (self.by_value, value), (self.by_pair, (field, value))):
+                paths = mapping.get(key)
+                if paths is None:
+                    continue
+                paths.discard(path_rel)
+                if not paths:
+                    del mapping[key]
+
+    def rename(self, path_rel_old, path_rel_new):
+        fields = self.entries.get(path_rel_old)
+        if fields is None:
+            return
+        self.remove(path_rel_old)
+        self.update(path_rel_new, fields)
+
+    def copy(self, path_rel, path_rel_new):
+        fields = self.entries.get(path_rel)
+        if fields is not None:
+            self.update(path_rel_new, fields)
+
+    def search(self, field=None, value=None, contains=False):
+        """Find the entries having a field and/or a value
+
+        Args:
+            field: Field name, case-insensitive, None for any field
+            value: Field value, case-insensitive, None for any value
+            contains: Match values containing `value` instead of equal to it
+
+        Returns:
+            list: Sorted relative paths of the matching entries
+        """
+        field = normalize(field) if field is not None else None
+        value = normalize(value) if value is not None else None
+
+        if value is None:
+            if field is None:
+                return sorted(self.entries)
+            return sorted(self.by_field.get(field, ()))
+
+        if not contains:
+            if field is None:
+                return sorted(self.by_value.get(value, ()))
+            return sorted(self.by_pair.get((field, value), ()))
+
+        # Substring search still never leaves memory
+        res = set()
+        if field is None:
+            for value_indexed, paths in self.by_value.items():
+                if value in value_indexed:
+                    res.update(paths)
+        else:
+            for path_rel in self.by_field.get(field, ()):
+                for field_indexed, value_indexed in self.entries[path_rel].items():
+                    if normalize(field_indexed) == field and value in normalize(value_indexed):
+                        res.add(path_rel)
+                        break
+        return sorted(res)
+
+    def dumps(self):
+        return json.dumps(self.entries, separators=(",", ":"))
+
+    def loads(self, data_str):
+        for path_rel, fields in json.loads(data_str).items():
+            self.update(path_rel, fields)
@@ -0,0 +1,263 @@
+"""packets.py - Recipients of OpenPGP messages from their packet headers
+
+An encrypted OpenPGP message starts with one Public-Key Encrypted Session
+Key packet per recipient, before the encrypted data. Reading these packets
+tells who can decrypt a file without any passphrase, and only costs the
+first kilobytes of the file. Results are cached by inode, mtime and size.
+"""
+
+import os
+import base64
+import binascii
+import threading
+from PassUI import gpg, stream
+
+# Bytes read first, enough for the session keys of about fifteen RSA recipients
+HEAD_SIZE = 4096
+
+TAG_PKESK = 1
+TAG_SED = 9
+TAG_MARKER = 10
+TAG_SEIPD = 18
+TAG_AEAD = 20
+DATA_TAGS = {TAG_SED: "SED", TAG_SEIPD: "SEIPD", TAG_AEAD: "AEAD"}
+
+ALGORITHMS = {
+    1: "RSA", 2: "RSA", 3: "RSA", 16: "ELGAMAL", 18: "ECDH", 25: "X25519", 26: "X448",
+}
+
+ARMOR_BEGIN = b"-----BEGIN PGP MESSAGE-----"
+
+_cache = {}  # path_abs -> ((inode, mtime_ns, size), header)
+_lock = threading.Lock()
+
+
+class Truncated(Exception):
+    """More bytes of the file are needed to parse the packet"""
+
+
+def _packet_header(buffer, offset):
+    """Parse the header of the packet at offset
+
+    Returns:
+        tuple: (tag, offset of the body, length of the body or None if unknown)
+    """
+    if offset >= len(buffer):
+        raise Truncated()
+    first = buffer[offset]
+    if not first & 0x80:
+        raise ValueError(f"Invalid packet header at byte {offset}")
+    if first & 0x40:
+        # New format
+        tag = first & 0x3f
+        if offset + 1 >= len(buffer):
+            raise Truncated()
+        octet = buffer[offset + 1]
+        if octet < 192:
+            return tag, offset + 2, octet
+        if octet < 224:
+            if offset + 2 >= len(buffer):
+                raise Truncated()
+            return tag, offset + 3, ((octet - 192) << 8) + buffer[offset + 2] + 192
+        if octet == 255:
+            if offset + 6 > len(buffer):
+                raise Truncated()
+            return tag, offset + 6, int.from_bytes(buffer[offset + 2:offset + 6], "big")
+        # Partial body length, only used by data packets
+        return tag, offset + 2, None
+    # Old format
+    tag = (first >> 2) & 0x0f
+    length_size = {0: 1, 1: 2, 2: 4, 3: 0}[first & 0x03]
+    if not length_size:
+        return tag, offset + 1, None
+    if offset + 1 + length_size > len(buffer):
+        raise Truncated()
+    return tag, offset + 1 + length_size, int.from_bytes(buffer[offset + 1:offset + 1 + length_size], "big")
+
+
+def parse_pkesk(body):
+    """Recipient of a Public-Key Encrypted Session Key packet
+
+    Args:
+        body: Body of the packet
+
+    Returns:
+        dict: key_id (hexadecimal, None for a hidden recipient), algorithm and
+            bits, the bit length of the encrypted session key
+    """
+    version = body[0]
+    if version != 3 or len(body) < 12:
+        return {"key_id": None, "algorithm": f"v{version}", "bits": None}
+    key_id = body[1:9].hex().upper()
+    algorithm = body[9]
+    bits = None
+    if algorithm in (1, 2, 3, 16, 18):
+        # First MPI: the encrypted session key, or the ephemeral point for ECDH
+        bits = int.from_bytes(body[10:12], "big")
+    elif algorithm in (25, 26):
+        bits = (len(body) - 10) * 8
+    return {
+        "key_id": None if key_id == "0" * 16 else key_id,
+        "algorithm": ALGORITHMS.get(algorithm, str(algorithm)),
+        "bits": bits,
+    }
+
+
+def _dearmor(data):
+    """Binary start of an armored message, from the first lines only"""
+    lines = data.split(b"\n")
+    body = []
+    started = False
+    for line in lines[1:-1]:  # The last line may be cut
+        line = line.strip()
+        if not started:
+            # Armor headers end with an empty line
+            started = not line
+            continue
+        if line.startswith(b"=") or line.startswith(b"-----"):
+            break
+        body.append(line)
+    encoded = b"".join(body)
+    encoded = encoded[:len(encoded) // 4 * 4]
+    try:
+        return base64.b64decode(encoded)
+    except binascii.Error as e:
+        raise ValueError(f"Invalid armor: {e}")
+
+
+def parse_header(f):
+    """Read the session key packets at the start of a message
+
+    Args:
+        f: Binary file positioned at the start of the message
+
+    Returns:
+        dict: recipients (list of parse_pkesk dicts) and data, the kind of
+            encrypted data packet that follows them (None if there is none)
+
+    Raises:
+        ValueError: If the file is not an OpenPGP message
+    """
+    buffer = f.read(HEAD_SIZE)
+    armored = buffer.lstrip().startswith(ARMOR_BEGIN)
+    recipients = []
+    offset = 0
+    while True:
+        data = _dearmor(buffer) if armored else buffer
+        try:
+            while True:
+                tag, start, length = _packet_header(data, offset)
+                if tag in DATA_TAGS:
+                    return {"recipients": recipients, "data": DATA_TAGS[tag]}
+                if length is None:
+                    raise ValueError(f"Unexpected packet of tag {tag} before the encrypted data")
+                if start + length > len(data):
+                    raise Truncated()
+                if tag == TAG_PKESK:
+                    recipients.append(parse_pkesk(data[start:start + length]))
+                elif tag != TAG_MARKER:
+                    return {"recipients": recipients, "data": None}
+                offset = start + length
+        except Truncated:
+            more = f.read(len(buffer))
+            if not more:
+                if not data:
+                    raise ValueError("Empty file")
+                if not recipients:
+                    raise ValueError("Truncated OpenPGP message")
+                return {"recipients": recipients, "data": None}
+            buffer += more
+
+
+def read_header(path_abs):
+    """Recipients of an encrypted file, cached until the file changes
+
+    Args:
+        path_abs: Path to a .gpg or .bgpg file, or to a stream container
+
+    Returns:
+        dict: As parse_header
+
+    Raises:
+        ValueError: If the file is not an OpenPGP message
+    """
+    st = os.stat(path_abs)
+    key = (st.st_ino, st.st_mtime_ns, st.st_size)
+    with _lock:
+        cached = _cache.get(path_abs)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with open(path_abs, "rb") as f:
+        if f.read(len(stream.MAGIC)) in (stream.MAGIC, stream.SEEKABLE_MAGIC):
+            # Stream container, e.g. an attachment: its file key is wrapped
+            # in an OpenPGP message for the recipients
+            f.seek(len(stream.MAGIC) + stream.LENGTH.size)
+        else:
+            f.seek(0)
+        header = parse_header(f)
+    with _lock:
+        _cache[path_abs] = (key, header)
+    return header
+
+
+def recipient_ids(path_abs):
+    """Key IDs a file is encrypted to, hidden recipients left out"""
+    return {recipient["key_id"] for recipient in read_header(path_abs)["recipients"] if recipient["key_id"]}
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+
+def store_files(path_abs_store, rel_paths):
+    """Relative paths of the .gpg entries and of the .bgpg files of the store"""
+    files = [path_rel + ".gpg" for path_rel in rel_paths]
+    for root, dirs, names in os.walk(path_abs_store):
+        for name in names:
+            if name.endswith(".bgpg"):
+                files.append(os.path.relpath(os.path.join(root, name), path_abs_store))
+    return sorted(files)
+
+
+def audit_store(passstore_obj):
+    """Who can decrypt what, from the packet headers only
+
+    Args:
+        passstore_obj: PassStore holding the files and the keyring
+
+    Returns:
+        dict: keys, the keys of list_keys() with whether they are disabled
+            and the number of files they can decrypt; files, the primary key
+            IDs (or unknown key IDs) of the readers of each file; unknown,
+            the number of files per key ID missing from the keyring; stale,
+            the files not encrypted to exactly the enabled keys; errors, the
+            files whose headers could not be read
+    """
+    disabled_keys = passstore_obj.config.get("settings", {}).get("disabled_keys", []) or []
+    owners = {}  # Key ID of a key or subkey -> key ID of the primary key
+    for key in passstore_obj.recipients() + passstore_obj.private_keys():
+        for key_id in gpg.key_ids(key):
+            owners[key_id] = key.fingerprint.keyid
+    keys = {
+        key_info["key"]: {**key_info, "disabled": key_info["key"] in disabled_keys, "files": 0}
+        for key_info in passstore_obj.list_keys()}
+    enabled = {key_id for key_id in keys if key_id not in disabled_keys}
+    report = {"keys": keys, "files": {}, "unknown": {}, "stale": [], "errors": {}}
+
+    for path_rel in store_files(passstore_obj.path_store, passstore_obj.index_rel_paths()):
+        try:
+            key_ids = recipient_ids(os.path.join(passstore_obj.path_store, path_rel))
+        except (OSError, ValueError) as e:
+            report["errors"][path_rel] = str(e)
+            continue
+        readers = sorted({owners.get(key_id, key_id) for key_id in key_ids})
+        report["files"][path_rel] = readers
+        for reader in readers:
+            if reader in keys:
+                keys[reader]["files"] += 1
+            else:
+                report["unknown"][reader] = report["unknown"].get(reader, 0) + 1
+        if set(readers) != enabled:
+            report["stale"].append(path_rel)
+    return report
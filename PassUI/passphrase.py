@@ -0,0 +1,171 @@
+"""passphrase.py - Passphrase providers of the PassStore backend
+
+The backend never asks for a passphrase itself, it asks the provider given
+at construction. This keeps Qt out of the backend, so that PassStore runs in
+scripts, servers and worker processes without a display.
+"""
+
+import os
+import abc
+import threading
+import time
+
+PROMPT = "Enter the passphrase for this key:"
+
+
+class PassphraseProvider(abc.ABC):
+    """Base of the passphrase providers
+
+    Subclasses implement get_passphrase.
+    """
+
+    @abc.abstractmethod
+    def get_passphrase(self, prompt=PROMPT):
+        """Get the passphrase of the private key
+
+        Args:
+            prompt: Message shown to the user, if any
+
+        Returns:
+            str: The passphrase
+
+        Raises:
+            ValueError: If no passphrase is available
+        """
+
+    def forget(self):
+        """Drop any remembered passphrase, e.g. after a failed decryption"""
+
+    def __call__(self, prompt=PROMPT):
+        return self.get_passphrase(prompt)
+
+
+class QtDialogProvider(PassphraseProvider):
+    """Ask the passphrase in a Qt dialog, from the GUI thread only"""
+
+    def __init__(self, parent=None):
+        """
+        Args:
+            parent: Parent widget of the dialog, None for a standalone dialog
+        """
+        self.parent = parent
+
+    def get_passphrase(self, prompt=PROMPT):
+        from PyQt5.QtWidgets import QInputDialog, QLineEdit
+        passphrase, ok = QInputDialog.getText(
+            self.parent,
+            "Passphrase Required",  # Dialog title
+            prompt,  # Dialog message
+            QLineEdit.Password,  # Use password field that masks input
+            ""  # Default text
+        )
+        if not ok:
+            # User canceled the dialog
+            raise ValueError("Passphrase entry canceled by user")
+        return passphrase
+
+
+class EnvProvider(PassphraseProvider):
+    """Read the passphrase from an environment variable or a file descriptor
+
+    The file descriptor is read once, up to the first newline, like
+    `gpg --passphrase-fd`.
+    """
+
+    def __init__(self, variable="PASSUI_PASSPHRASE", fd=None):
+        """
+        Args:
+            variable: Environment variable holding the passphrase
+            fd: File descriptor to read the passphrase from, defaults to the
+                one named by the `<variable>_FD` environment variable
+        """
+        self.variable = variable
+        if fd is None and os.environ.get(variable + "_FD"):
+            fd = int(os.environ[variable + "_FD"])
+        self.fd = fd
+        self._passphrase = None
+        self._lock = threading.Lock()
+
+    def _read_fd(self):
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = os.read(self.fd, 1024)
+            if not chunk:
+                break
+            data += chunk
+        return data.split(b"\n", 1)[0].decode()
+
+    def get_passphrase(self, prompt=PROMPT):
+        passphrase = os.environ.get(self.variable)
+        if passphrase is not None:
+            return passphrase
+        if self.fd is None:
+            raise ValueError(f"No passphrase in ${self.variable}")
+        with self._lock:
+            if self._passphrase is None:
+                self._passphrase = self._read_fd()
+            return self._passphrase
+
+
+class CallbackProvider(PassphraseProvider):
+    """Ask the passphrase to a function, e.g. getpass.getpass"""
+
+    def __init__(self, callback):
+        """
+        Args:
+            callback: Function of the prompt returning the passphrase, or
+                None to cancel
+        """
+        self.callback = callback
+
+    def get_passphrase(self, prompt=PROMPT):
+        passphrase = self.callback(prompt)
+        if passphrase is None:
+            raise ValueError("Passphrase entry canceled")
+        return passphrase
+
+
+class CachedProvider(PassphraseProvider):
+    """Remember the passphrase of another provider for a while, like gpg-agent"""
+
+    def __init__(self, provider, ttl=300):
+        """
+        Args:
+            provider: Provider asked when nothing is remembered
+            ttl: Seconds the passphrase is remembered after it was asked
+        """
+        self.provider = provider
+        self.ttl = ttl
+        self._passphrase = None
+        self._expires = 0
+        self._lock = threading.Lock()
+
+    def _cached(self):
+        if self._passphrase is None or time.monotonic() >= self._expires:
+            return None
+        return self._passphrase
+
+    def get_passphrase(self, prompt=PROMPT):
+        with self._lock:
+            passphrase = self._cached()
+        if passphrase is not None:
+            return passphrase
+        # Asked without the lock, a dialog left open must not block the
+        # other threads, e.g. one forgetting the passphrase
+        passphrase = self.provider.get_passphrase(prompt)
+        with self._lock:
+            if self._cached() is None:
+                self._passphrase = passphrase
+                self._expires = time.monotonic() + self.ttl
+        return passphrase
+
+    def forget(self):
+        with self._lock:
+            self._passphrase = None
+            self._expires = 0
+        self.provider.forget()
+
+
+def default_provider():
+    """Provider used when PassStore is given none, never needs a display"""
+    return EnvProvider()
@@ -1,34 +1,91 @@
 """passstore.py"""
 
+import io
 import os
+import time
 import shutil
+import contextlib
 from pathlib import Path
-from PassUI import utils, gpg
+from PassUI.entry import Entry
+from PassUI import utils, gpg, index, search, metaindex, urlindex, passphrase, importer, exporter, stream, transaction, health, packets, gitstore, archive, jobs, manifest, attachments, chunkstore
 
 
 class PassStore(gpg.GPG):
-    def __init__(self):
+    def __init__(self, passphrase_provider=None, read_only=False):
+        """
+        Args:
+            passphrase_provider: passphrase.PassphraseProvider asked for the
+                passphrase of the private key, defaults to $PASSUI_PASSPHRASE
+            read_only: Never write the config, .gpg-id, the keystore or the
+                store index, and refuse to write entries
+        """
+        if passphrase_provider is None:
+            passphrase_provider = passphrase.default_provider()
+        self.passphrase_provider = passphrase_provider
+        self.read_only = read_only
+        self._config_checked = False
+
         # Initialize attributes with default values before loading config
         self.gpg_exe = None
         self.path_store = str(Path.home())  # Default to home directory
         self.ignored_files = []  # Initialize as empty list
         self.ignored_directories = []  # Initialize as empty list
         self.config_path = {}
+        self.metadata_index = False  # Opt-in encrypted index of the fields
+        self.url_index = False  # Opt-in encrypted index of the url hosts
+        self.git_commit = False  # Opt-in git commit of the changed entries
+        self._index = None
+        self._search = None
+        self._git_store = None
+        self._encrypted_indexes = {}  # Loaded encrypted indexes by class
+        self._transaction = None  # Transaction of the running batch
 
         # Load config after initializing attributes
         self.config = self.load_config()
 
+        # Initialize parent class (GPG)
+        super().__init__()
+
+        if read_only:
+            # Checked on first listing of the store, reading a key needs none of it
+            return
+
         # Check paths and configurations
+        self.check_config()
+
+        # Update config, the gpg IDs are written once the keyring is loaded
+        self.overwrite_config()
+
+    @classmethod
+    def open(cls, passphrase_provider=None):
+        """Open the store read-only, e.g. for a script reading one password
+
+        Nothing is written to disk: neither the config nor .gpg-id nor the
+        store index. The keyring is loaded on the first decryption and the
+        config is checked on the first listing of the store.
+
+        Args:
+            passphrase_provider: passphrase.PassphraseProvider asked for the
+                passphrase of the private key, defaults to $PASSUI_PASSPHRASE
+
+        Returns:
+            PassStore: The read-only store
+        """
+        return cls(passphrase_provider=passphrase_provider, read_only=True)
+
+    def check_writable(self):
+        if self.read_only:
+            raise PermissionError("Password store opened read-only")
+
+    def check_config(self):
         self.check_path_store()
         self.check_ignored_files()
         self.check_ignored_folders()
+        self._config_checked = True
 
-        # Initialize parent class (GPG)
-        super().__init__()
-
-        # Update config and write gpg IDs
-        self.overwrite_config()
-        self.write_gpg_ids()
+    def ensure_keystore_exists(self):
+        if not self.read_only:
+            super().ensure_keystore_exists()
 
     def check_ignored_files(self):
         # Ensure ignored_files is a list before using list methods
@@ -72,8 +129,15 @@ class PassStore(gpg.GPG):
         self.write_gpg_ids()
         return True
 
+    def _load_keys(self):
+        super()._load_keys()
+        # The keyring is loaded on first use, .gpg-id follows it
+        if not self.read_only:
+            self.write_gpg_ids()
+
     def write_gpg_ids(self):
         try:
+            self.check_writable()
             path = os.path.join(self.path_store, ".gpg-id")
             # Ensure the directory exists
             os.makedirs(os.path.dirname(path), exist_ok=True)
@@ -90,6 +154,7 @@ class PassStore(gpg.GPG):
 
     def overwrite_config(self):
         try:
+            self.check_writable()
             # Ensure config dictionary is properly initialized
             if not isinstance(self.config, dict):
                 self.config = {}
@@ -133,6 +198,8 @@ class PassStore(gpg.GPG):
             not os.path.isdir(self.path_store)
         ):
             self.path_store = str(Path.home())
+            if self.read_only:
+                return
             # Try to create the directory if it doesn't exist
             try:
                 os.makedirs(self.path_store, exist_ok=True)
@@ -140,63 +207,854 @@ class PassStore(gpg.GPG):
                 print(f"Error creating path_store directory: {e}")
 
     @property
-    def rel_paths_gpg(self):
-        return utils.rel_paths_gpg(
-            self.path_store,
+    def index(self):
+        """SQLite snapshot of the store, reopened when path_store changes"""
+        if self._index is None or self._index.path_store != os.path.abspath(self.path_store):
+            if self._index is not None:
+                self._index.close()
+            self._index = index.StoreIndex(self.path_store, ignored_directories=self.ignored_directories)
+            self._search = None
+        return self._index
+
+    def close(self):
+        """Close the store index, which checkpoints it to disk"""
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+            self._search = None
+
+    @property
+    def git_store(self):
+        """Pending git commits of the store, reopened when path_store changes"""
+        if self._git_store is None or self._git_store.path_store != os.path.abspath(self.path_store):
+            if self._git_store is not None:
+                self._git_store.commit()
+            self._git_store = gitstore.GitStore(self.path_store)
+        return self._git_store
+
+    def git_add(self, paths_rel, message):
+        """Record changed entries for the next git commit, if enabled
+
+        Args:
+            paths_rel: Relative paths of the entries, without .gpg
+            message: Summary of the change
+        """
+        if self.git_commit:
+            self.git_store.add([path_rel + ".gpg" for path_rel in paths_rel], message)
+
+    def history(self, path_rel, limit=None):
+        """Git commits that changed an entry, newest first
+
+        Args:
+            path_rel: Relative path of the entry, without .gpg
+            limit: Maximum number of commits
+
+        Returns:
+            list: Dictionaries with commit, author, date and message
+        """
+        return self.git_store.history(path_rel + ".gpg", limit=limit)
+
+    def index_rel_paths(self):
+        """Reconcile the store index and list the visible entries
+
+        Returns:
+            list: Relative paths of the entries, without .gpg
+        """
+        if not self._config_checked:
+            self.check_config()
+        if self.read_only:
+            # The index would have to be written, walk the store instead
+            return utils.list_rel_paths_gpg(
+                self.path_store, self.ignored_directories or [], self.ignored_files or [])
+        self.index.reconcile()
+        return self.index.rel_paths(
             self.ignored_directories or [],  # Ensure we pass a list
             self.ignored_files or []  # Ensure we pass a list
         )
 
-    def read_key(self, path_rel):
-        from PyQt5.QtWidgets import QInputDialog, QLineEdit
+    @property
+    def search_index(self):
+        """Fuzzy search index over the entry paths, built on first use"""
+        if not self.read_only:
+            self.index  # Drops the search index when path_store changed
+        if self._search is None:
+            self._search = search.PathSearch(self.index_rel_paths())
+        return self._search
+
+    def sync_search(self):
+        """Catch the search index up with entries changed outside PassStore"""
+        if self._search is None:
+            return self.search_index
+        self._search.sync(self.index_rel_paths())
+        return self._search
+
+    def find(self, query, limit=20):
+        """Fuzzy find entries by relative path, like `pass find`
+
+        Args:
+            query: Characters to look for, in order
+            limit: Maximum number of results
+
+        Returns:
+            list: Relative paths of the best matches, best first
+        """
+        search_index = self.search_index
+        results = []
+        for score, path_rel in search_index.query(query, limit=limit):
+            # Entries removed behind our back are dropped lazily
+            if not os.path.isfile(utils.rel_to_abs(self.path_store, path_rel)):
+                search_index.remove(path_rel)
+                continue
+            results.append(path_rel)
+        return results
+
+    @property
+    def rel_paths_gpg(self):
         try:
-            # Ensure the path exists
-            abs_path = utils.rel_to_abs(self.path_store, path_rel)
-            if not os.path.exists(abs_path):
-                raise FileNotFoundError(f"Key file not found: {abs_path}")
-
-            passphrase, ok = QInputDialog.getText(
-                None,  # Parent widget (None for a standalone dialog)
-                "Passphrase Required",  # Dialog title
-                "Enter the passphrase for this key:",  # Dialog message
-                QLineEdit.Password,  # Use password field that masks input
-                ""  # Default text
+            rel_paths = self.index_rel_paths()
+            if self._search is not None:
+                self._search.sync(rel_paths)
+            return utils.nest_rel_paths(rel_paths)
+        except Exception as e:
+            print(f"Error reading store index, walking the store: {e}")
+            return utils.rel_paths_gpg(
+                self.path_store,
+                self.ignored_directories or [],  # Ensure we pass a list
+                self.ignored_files or []  # Ensure we pass a list
             )
 
-            if ok:
-                decrypted_data = self.read(abs_path, passphrase=passphrase)
-                if decrypted_data:
-                    return utils.data_str_to_dict(decrypted_data)
-                else:
-                    raise ValueError("Failed to decrypt the key")
-            else:
-                # User canceled the dialog
-                raise ValueError("Passphrase entry canceled by user")
+    def ask_passphrase(self):
+        return self.passphrase_provider.get_passphrase()
+
+    def read_entry(self, path_rel, decryptor=None):
+        """Decrypt an entry, its fields parsed on first access
+
+        Args:
+            path_rel: Path of the entry relative to the store, without .gpg
+            decryptor: gpg.Decryptor unlocked once for many entries, e.g.
+                by a background thread, the passphrase is asked if None
+
+        Returns:
+            entry.Entry: The decrypted entry
+
+        Raises:
+            FileNotFoundError: If the entry does not exist
+            ValueError: If the entry cannot be decrypted
+        """
+        # Ensure the path exists
+        abs_path = utils.rel_to_abs(self.path_store, path_rel)
+        if not os.path.exists(abs_path):
+            raise FileNotFoundError(f"Key file not found: {abs_path}")
+
+        if decryptor is not None:
+            with open(abs_path, "rb") as f:
+                decrypted_data = decryptor.decrypt(f.read())
+            if not isinstance(decrypted_data, str):
+                decrypted_data = bytes(decrypted_data).decode("utf-8")
+            return Entry(decrypted_data)
+
+        passphrase = self.ask_passphrase()
+        try:
+            decrypted_data = self.read(abs_path, passphrase=passphrase)
+        except ValueError:
+            # A wrong passphrase must not stay cached
+            self.passphrase_provider.forget()
+            raise
+        if not decrypted_data:
+            raise ValueError("Failed to decrypt the key")
+        return Entry(decrypted_data)
+
+    def read_key(self, path_rel):
+        try:
+            return self.read_entry(path_rel).to_dict()
         except Exception as e:
             print(f"Error reading key {path_rel}: {e}")
             # Return a minimal dictionary as fallback
             return {"PASSWORD": "", "error": str(e)}
 
+    @contextlib.contextmanager
+    def batch(self):
+        """Group writes, applied atomically when the block exits
+
+        Entries written by write_key inside the block are staged as temporary
+        files and renamed into place together at the end, with one fsync per
+        directory. Nothing is applied if the block raises. Nested batches
+        join the outer one.
+
+        Yields:
+            transaction.Transaction: The staged writes
+        """
+        if self._transaction is not None:
+            yield self._transaction
+            return
+        self.check_writable()
+        self._transaction = transaction.Transaction()
+        try:
+            yield self._transaction
+            changes = self._transaction.commit()
+        except BaseException:
+            self._transaction.rollback()
+            raise
+        finally:
+            self._transaction = None
+        if changes:
+            self.index.update_entries([path_rel for path_rel, data_dict in changes])
+            if self._search is not None:
+                for path_rel, data_dict in changes:
+                    self._search.add(path_rel)
+            self.update_encrypted_indexes_batch(changes)
+            if self.git_commit:
+                paths_rel = [path_rel for path_rel, data_dict in changes]
+                if len(paths_rel) == 1:
+                    # Single edits are grouped by the debounce window
+                    self.git_store.schedule([paths_rel[0] + ".gpg"], f"Edit {paths_rel[0]}")
+                else:
+                    self.git_add(paths_rel, f"Update {len(paths_rel)} entries")
+                    self.git_store.commit()
+
     def write_key(self, path_rel, data_dict):
         try:
-            data_str = utils.data_dict_to_str(data_dict)
-            # Ensure the directory exists
+            # Refused before spending time on the encryption
+            self.check_writable()
+            if isinstance(data_dict, Entry):
+                # Unchanged lines are written back as they were read
+                data_str = data_dict.serialize()
+                data_dict = data_dict.to_dict()
+            else:
+                data_str = utils.data_dict_to_str(data_dict)
             full_path = os.path.join(self.path_store, path_rel + ".gpg")
-            os.makedirs(os.path.dirname(full_path), exist_ok=True)
 
             # Get disabled keys with proper default
             disabled_keys = self.config.get("settings", {}).get("disabled_keys", [])
 
-            return self.write(
-                full_path,
-                data_str,
-                disabled_keys=disabled_keys
-            )
+            data = self.encrypt_bytes(data_str.encode("utf-8"), disabled_keys)
+            # Outside a batch, this is a batch of one entry
+            with self.batch() as staged:
+                staged.stage(full_path, data, path_rel=path_rel, data_dict=data_dict)
+            return True
         except Exception as e:
             print(f"Error writing key {path_rel}: {e}")
             return False
 
+    def move_entry(self, path_rel, path_rel_new):
+        """Move or rename an entry, with its attachments
+
+        Args:
+            path_rel: Relative path of the entry, without .gpg
+            path_rel_new: New relative path of the entry, without .gpg
+
+        Raises:
+            FileExistsError: If an entry already exists at the new path
+            OSError: If the entry cannot be moved
+        """
+        self.check_writable()
+        path_abs_new = utils.rel_to_abs(self.path_store, path_rel_new)
+        if os.path.exists(path_abs_new):
+            raise FileExistsError(f"Entry {path_rel_new} already exists")
+        blobs = self.blob_files([path_rel])
+        os.makedirs(os.path.dirname(path_abs_new), exist_ok=True)
+        os.rename(utils.rel_to_abs(self.path_store, path_rel), path_abs_new)
+        attachments.move(self.path_store, path_rel, path_rel_new)
+        self.entries_moved({path_rel: path_rel_new}, f"Move {path_rel} to {path_rel_new}", blobs)
+
+    def copy_entry(self, path_rel, path_rel_new):
+        """Copy an entry, with its attachments
+
+        Args:
+            path_rel: Relative path of the entry, without .gpg
+            path_rel_new: Relative path of the copy, without .gpg
+
+        Raises:
+            FileExistsError: If an entry already exists at the new path
+            OSError: If the entry cannot be copied
+        """
+        self.check_writable()
+        path_abs_new = utils.rel_to_abs(self.path_store, path_rel_new)
+        if os.path.exists(path_abs_new):
+            raise FileExistsError(f"Entry {path_rel_new} already exists")
+        os.makedirs(os.path.dirname(path_abs_new), exist_ok=True)
+        shutil.copy2(utils.rel_to_abs(self.path_store, path_rel), path_abs_new)
+        attachments.copy_all(self.path_store, path_rel, path_rel_new)
+        self.index.update_entries([path_rel_new])
+        if self._search is not None:
+            self._search.add(path_rel_new)
+        self.move_encrypted_indexes({path_rel: path_rel_new}, copy=True)
+        if self.git_commit:
+            blobs = self.blob_files([path_rel])
+            self.git_store.schedule(
+                self.entry_files(path_rel, blobs[path_rel]) + self.entry_files(path_rel_new, blobs[path_rel]),
+                f"Copy {path_rel} to {path_rel_new}")
+
+    def move_folder(self, path_rel_dir, path_rel_dir_new):
+        """Move or rename a folder and the entries below it
+
+        Args:
+            path_rel_dir: Relative path of the folder
+            path_rel_dir_new: New relative path of the folder
+
+        Raises:
+            FileExistsError: If something already exists at the new path
+            OSError: If the folder cannot be moved
+        """
+        self.check_writable()
+        path_abs_new = os.path.join(self.path_store, path_rel_dir_new)
+        if os.path.exists(path_abs_new):
+            raise FileExistsError(f"Folder {path_rel_dir_new} already exists")
+        paths_rel = self.entries_below(path_rel_dir)
+        blobs = self.blob_files(paths_rel)
+        os.makedirs(os.path.dirname(path_abs_new), exist_ok=True)
+        os.rename(os.path.join(self.path_store, path_rel_dir), path_abs_new)
+        self.entries_moved(
+            {path_rel: os.path.join(path_rel_dir_new, os.path.relpath(path_rel, path_rel_dir))
+             for path_rel in paths_rel},
+            f"Move {path_rel_dir} to {path_rel_dir_new}", blobs)
+
+    def remove_entry(self, path_rel):
+        """Remove an entry and its attachments
+
+        Args:
+            path_rel: Relative path of the entry, without .gpg
+
+        Raises:
+            OSError: If the entry cannot be removed
+        """
+        self.check_writable()
+        blobs = self.blob_files([path_rel])
+        os.remove(utils.rel_to_abs(self.path_store, path_rel))
+        attachments.remove_all(self.path_store, path_rel)
+        self.entries_moved({path_rel: None}, f"Remove {path_rel}", blobs)
+
+    def remove_folder(self, path_rel_dir):
+        """Remove a folder and the entries below it
+
+        Args:
+            path_rel_dir: Relative path of the folder
+
+        Raises:
+            OSError: If the folder cannot be removed
+        """
+        self.check_writable()
+        paths_rel = self.entries_below(path_rel_dir)
+        blobs = self.blob_files(paths_rel)
+        shutil.rmtree(os.path.join(self.path_store, path_rel_dir))
+        self.entries_moved(dict.fromkeys(paths_rel), f"Remove {path_rel_dir}", blobs)
+
+    def entries_below(self, path_rel_dir):
+        """Relative paths of the entries below a folder, without .gpg"""
+        paths_rel = []
+        for root, _, files in os.walk(os.path.join(self.path_store, path_rel_dir)):
+            for file in files:
+                if file.endswith(".gpg"):
+                    paths_rel.append(utils.abs_to_rel(self.path_store, os.path.join(root, file)))
+        return paths_rel
+
+    def blob_files(self, paths_rel):
+        """File names of the attachment blobs of entries, listed before they move on disk
+
+        Args:
+            paths_rel: Relative paths of the entries, without .gpg
+
+        Returns:
+            dict: File names of the blobs by relative path
+        """
+        return {path_rel: attachments.blob_files(self.path_store, path_rel) for path_rel in paths_rel}
+
+    @staticmethod
+    def entry_files(path_rel, blob_files):
+        """Files of an entry relative to the store: its .gpg and its attachment blobs"""
+        return [path_rel + ".gpg"] + [os.path.join(path_rel + attachments.SUFFIX, name) for name in blob_files]
+
+    def entries_moved(self, moves, message, blobs):
+        """Catch the indexes and git up with entries moved or removed on disk
+
+        Args:
+            moves: Dictionary of the old relative paths to the new ones, None if removed
+            message: Summary of the change
+            blobs: File names of the attachment blobs by old relative path,
+                from blob_files before the change on disk
+        """
+        paths_rel = list(moves) + [path_rel_new for path_rel_new in moves.values() if path_rel_new is not None]
+        self.index.update_entries(paths_rel)
+        if self._search is not None:
+            for path_rel, path_rel_new in moves.items():
+                self._search.remove(path_rel)
+                if path_rel_new is not None:
+                    self._search.add(path_rel_new)
+        removed = [(path_rel, None) for path_rel, path_rel_new in moves.items() if path_rel_new is None]
+        if removed:
+            self.update_encrypted_indexes_batch(removed)
+        renamed = {path_rel: path_rel_new for path_rel, path_rel_new in moves.items() if path_rel_new is not None}
+        if renamed:
+            self.move_encrypted_indexes(renamed)
+        if self.git_commit and paths_rel:
+            files = []
+            for path_rel, path_rel_new in moves.items():
+                files += self.entry_files(path_rel, blobs[path_rel])
+                if path_rel_new is not None:
+                    files += self.entry_files(path_rel_new, blobs[path_rel])
+            self.git_store.schedule(files, message)
+
+    def attach(self, path_rel, path_abs_file, name=None, passphrase=None, job=None):
+        """Attach a file to an entry, encrypted apart from the entry
+
+        Args:
+            path_rel: Path of the entry relative to the store, without .gpg
+            path_abs_file: File to attach
+            name: Name of the attachment, the file name if None
+            passphrase: Passphrase of the private key, to read the entry,
+                asked if None, which a worker thread cannot do with a dialog
+            job: jobs.Job advanced as bytes are encrypted
+
+        Returns:
+            bool: True if the file was attached
+
+        Raises:
+            jobs.Cancelled: If the job was cancelled
+        """
+        try:
+            self.check_writable()
+            name = name or os.path.basename(path_abs_file)
+            path_abs_blob = attachments.blob_path(self.path_store, path_rel, name)
+            entry = self.read_entry(path_rel, decryptor=None if passphrase is None else self.decryptor(passphrase))
+            if job is not None:
+                job.add_total(1, os.path.getsize(path_abs_file))
+            disabled_keys = self.config.get("settings", {}).get("disabled_keys", [])
+            with open(path_abs_file, "rb") as f:
+                size = attachments.write(f, path_abs_blob, self.recipients(disabled_keys), job=job)
+            entry.set(attachments.field(name), str(size))
+            if not self.write_key(path_rel, entry):
+                return False
+            if self.git_commit:
+                self.git_store.schedule(
+                    [os.path.relpath(path_abs_blob, self.path_store)], f"Attach {name} to {path_rel}")
+            if job is not None:
+                job.advance(files=1)
+            return True
+        except jobs.Cancelled:
+            raise
+        except Exception as e:
+            print(f"Error attaching {path_abs_file} to {path_rel}: {e}")
+            return False
+
+    def attachments(self, path_rel):
+        """Names of the attachments of an entry, only the entry is decrypted"""
+        return attachments.names(self.read_entry(path_rel))
+
+    def save_attachment(self, path_rel, name, path_abs_dest, passphrase=None, job=None):
+        """Decrypt an attachment to a file, chunk by chunk
+
+        Args:
+            path_rel: Path of the entry relative to the store, without .gpg
+            name: Name of the attachment
+            path_abs_dest: Path to the decrypted file
+            passphrase: Passphrase of the private key, asked if None, which
+                a worker thread cannot do with a dialog
+            job: jobs.Job advanced as bytes are decrypted
+
+        Returns:
+            bool: True if the attachment was decrypted
+
+        Raises:
+            jobs.Cancelled: If the job was cancelled
+        """
+        path_tmp = path_abs_dest + ".tmp"
+        try:
+            path_abs_blob = attachments.blob_path(self.path_store, path_rel, name)
+            if passphrase is None:
+                passphrase = self.ask_passphrase()
+            if job is not None:
+                job.add_total(1, os.path.getsize(path_abs_blob))
+            with open(path_tmp, "wb") as f:
+                attachments.copy(path_abs_blob, f, self.decryptor(passphrase), job=job)
+            os.replace(path_tmp, path_abs_dest)
+            if job is not None:
+                job.advance(files=1)
+            return True
+        except jobs.Cancelled:
+            raise
+        except Exception as e:
+            print(f"Error saving attachment {name} of {path_rel}: {e}")
+            return False
+        finally:
+            if os.path.exists(path_tmp):
+                os.remove(path_tmp)
+
+    def read_attachment(self, path_rel, name, passphrase=None):
+        """Decrypt an attachment to memory, e.g. for the clipboard
+
+        Args:
+            path_rel: Path of the entry relative to the store, without .gpg
+            name: Name of the attachment
+            passphrase: Passphrase of the private key, asked if None
+
+        Returns:
+            bytes: Content of the attachment
+
+        Raises:
+            FileNotFoundError: If the attachment does not exist
+            ValueError: If the attachment cannot be decrypted
+        """
+        if passphrase is None:
+            passphrase = self.ask_passphrase()
+        data = io.BytesIO()
+        attachments.copy(
+            attachments.blob_path(self.path_store, path_rel, name), data, self.decryptor(passphrase))
+        return data.getvalue()
+
+    def detach(self, path_rel, name):
+        """Remove an attachment and its field from an entry
+
+        Returns:
+            bool: True if the attachment was removed
+        """
+        try:
+            self.check_writable()
+            path_abs_blob = attachments.blob_path(self.path_store, path_rel, name)
+            entry = self.read_entry(path_rel)
+            entry.remove(attachments.field(name))
+            if not self.write_key(path_rel, entry):
+                return False
+            if os.path.exists(path_abs_blob):
+                os.remove(path_abs_blob)
+            try:
+                os.rmdir(attachments.directory(self.path_store, path_rel))
+            except OSError:
+                pass  # Other attachments left
+            if self.git_commit:
+                self.git_store.schedule(
+                    [os.path.relpath(path_abs_blob, self.path_store)], f"Detach {name} from {path_rel}")
+            return True
+        except Exception as e:
+            print(f"Error removing attachment {name} of {path_rel}: {e}")
+            return False
+
+    def import_file(self, path_abs, layout=None, conflict="skip", workers=None):
+        """Import a CSV or JSON export of another password manager
+
+        Args:
+            path_abs: Path to a .csv or .json export
+            layout: "generic", "bitwarden" or "keepass", detected if None
+            conflict: "skip", "rename" or "overwrite" existing entries
+            workers: Number of encryption processes, the number of CPUs if None
+
+        Returns:
+            dict: Number of entries imported, renamed, overwritten, skipped and failed
+        """
+        try:
+            return importer.import_file(self, path_abs, layout=layout, conflict=conflict, workers=workers)
+        finally:
+            if self.git_commit:
+                self.git_store.commit(f"Import {os.path.basename(path_abs)}")
+            # New entries are found by one reconcile instead of one update per entry
+            rel_paths = self.index_rel_paths()
+            if self._search is not None:
+                self._search.sync(rel_paths)
+
+    def export(self, path_abs_out, subtree=None, format="jsonl", recipient=None, passphrase=None, workers=None):
+        """Export decrypted entries into a file encrypted for a recipient
+
+        Args:
+            path_abs_out: Path to the encrypted export
+            subtree: Relative path of the exported folder, None for the store
+            format: "jsonl" or "csv"
+            recipient: Key ID, mail or public key file able to read the
+                export, the store recipients if None
+            passphrase: Passphrase of the private key, asked if None
+            workers: Number of decryption processes, the number of CPUs if None
+
+        Returns:
+            dict: Number of entries exported and failed
+        """
+        recipients = None
+        if recipient is not None:
+            recipients = [self.get_public_key(recipient)]
+        if passphrase is None:
+            passphrase = self.ask_passphrase()
+        return exporter.export_store(
+            self, path_abs_out, subtree=subtree, format=format, recipients=recipients,
+            passphrase=passphrase, workers=workers)
+
+    def decrypt_export(self, path_abs_source, path_abs_dest, passphrase=None):
+        """Decrypt an export made by PassStore.export
+
+        Args:
+            path_abs_source: Path to the encrypted export
+            path_abs_dest: Path to the decrypted JSON Lines or CSV
+            passphrase: Passphrase of the private key, asked if None
+
+        Returns:
+            bool: True if the export was decrypted
+        """
+        if passphrase is None:
+            passphrase = self.ask_passphrase()
+        return stream.decrypt_file(path_abs_source, path_abs_dest, self.decryptor(passphrase))
+
+    def read_range(self, path_abs, offset, length, passphrase=None):
+        """Decrypt part of a seekable container, only the chunks holding it
+
+        Args:
+            path_abs: Path to a file written with seekable=True
+            offset: Offset of the range in the plaintext
+            length: Length of the range
+            passphrase: Passphrase of the private key, asked if None
+
+        Returns:
+            bytes: The plaintext of the range, shorter past its end
+
+        Raises:
+            ValueError: If the file is not a seekable container or cannot be decrypted
+        """
+        if passphrase is None:
+            passphrase = self.ask_passphrase()
+        with open(path_abs, "rb") as f:
+            return stream.SeekableReader(f, self.decryptor(passphrase)).read(offset, length)
+
+    def list_members(self, path_abs, passphrase=None):
+        """Files of a zip archive in a seekable container, from its central directory"""
+        if passphrase is None:
+            passphrase = self.ask_passphrase()
+        with open(path_abs, "rb") as f:
+            return archive.list_zip(stream.SeekableReader(f, self.decryptor(passphrase)).reader())
+
+    def extract_member(self, path_abs, name, path_abs_dest, passphrase=None):
+        """Extract one file of a zip archive in a seekable container
+
+        Only the central directory and the chunks of the file are decrypted.
+
+        Args:
+            path_abs: Archive written by encrypt_directory(zip=True, seekable=True)
+            name: Name of the file in the archive
+            path_abs_dest: Path to the extracted file
+            passphrase: Passphrase of the private key, asked if None
+
+        Returns:
+            bool: True if the file was extracted
+        """
+        try:
+            if passphrase is None:
+                passphrase = self.ask_passphrase()
+            with open(path_abs, "rb") as f:
+                archive.extract_member(
+                    stream.SeekableReader(f, self.decryptor(passphrase)).reader(), name, path_abs_dest)
+            return True
+        except Exception as e:
+            print(f"Error extracting {name} from {path_abs}: {e}")
+            return False
+
+    def verify(self, fast=False, passphrase=None, workers=None, callback=None, path_abs_report=None):
+        """Check that every entry decrypts, holds a password and uses the current recipients
+
+        Args:
+            fast: Only check the packet headers, nothing is decrypted
+            passphrase: Passphrase of the private key, asked if None
+            workers: Number of processes, the number of CPUs if None
+            callback: Called with (path_rel, problem, detail) for each finding
+            path_abs_report: Path to the JSON report, defaults to
+                utils.get_report_path(), not written by a read-only store
+
+        Returns:
+            dict: Number of entries checked and healthy, count per problem and findings
+        """
+        if passphrase is None and not fast:
+            passphrase = self.ask_passphrase()
+        if path_abs_report is None and not self.read_only:
+            path_abs_report = str(utils.get_report_path())
+        return health.verify_store(
+            self, passphrase=passphrase, fast=fast, workers=workers, callback=callback,
+            path_abs_report=path_abs_report)
+
+    def audit_recipients(self):
+        """Who can decrypt each file of the store, without any passphrase
+
+        Returns:
+            dict: The matrix of packets.audit_store
+        """
+        return packets.audit_store(self)
+
+    def enabled_encrypted_indexes(self):
+        enabled = []
+        if self.metadata_index:
+            enabled.append(metaindex.MetadataIndex)
+        if self.url_index:
+            enabled.append(urlindex.UrlIndex)
+        return enabled
+
+    def get_encrypted_index(self, index_class, passphrase=None):
+        """Decrypt an encrypted index of the store, once per session
+
+        Args:
+            index_class: metaindex.MetadataIndex or urlindex.UrlIndex
+            passphrase: Passphrase of the private key, asked if None
+
+        Returns:
+            metaindex.EncryptedIndex: The loaded index
+        """
+        if index_class not in self.enabled_encrypted_indexes():
+            raise ValueError(f"{index_class.__name__} is disabled in the settings")
+        encrypted_index = self._encrypted_indexes.get(index_class)
+        if encrypted_index is None or encrypted_index.path_store != self.path_store:
+            if passphrase is None:
+                passphrase = self.ask_passphrase()
+            encrypted_index = index_class(self.path_store)
+            encrypted_index.load(
+                self,
+                passphrase=passphrase,
+                disabled_keys=self.config.get("settings", {}).get("disabled_keys", []),
+                compact=not self.read_only,
+            )
+            self._encrypted_indexes[index_class] = encrypted_index
+        return encrypted_index
+
+    def get_metadata_index(self, passphrase=None):
+        return self.get_encrypted_index(metaindex.MetadataIndex, passphrase=passphrase)
+
+    def get_url_index(self, passphrase=None):
+        return self.get_encrypted_index(urlindex.UrlIndex, passphrase=passphrase)
+
+    def update_encrypted_indexes(self, path_rel, data_dict):
+        """Record the new fields of an entry in the enabled encrypted indexes
+
+        Args:
+            path_rel: Relative path of the entry, without .gpg
+            data_dict: New fields of the entry, None if it was removed
+
+        Returns:
+            bool: True if the change was recorded everywhere
+        """
+        return self.update_encrypted_indexes_batch([(path_rel, data_dict)])
+
+    def update_encrypted_indexes_batch(self, changes):
+        """Record the new fields of several entries, one delta per index
+
+        Args:
+            changes: List of (path_rel, data_dict), data_dict None if removed
+
+        Returns:
+            bool: True if the changes were recorded everywhere
+        """
+        def apply(encrypted_index):
+            for path_rel, data_dict in changes:
+                if data_dict is None:
+                    encrypted_index.remove(path_rel)
+                else:
+                    encrypted_index.update(path_rel, data_dict)
+
+        return self._record_encrypted_indexes(
+            apply, lambda encrypted_index, disabled_keys: encrypted_index.write_deltas(
+                self, changes, disabled_keys=disabled_keys))
+
+    def move_encrypted_indexes(self, moves, copy=False):
+        """Record entries moved or copied, one delta per index, without decrypting them
+
+        Args:
+            moves: Dictionary of the old relative paths to the new ones
+            copy: True if the entries were copied, the old ones staying
+
+        Returns:
+            bool: True if the moves were recorded everywhere
+        """
+        def apply(encrypted_index):
+            for path_rel, path_rel_new in moves.items():
+                if copy:
+                    encrypted_index.copy(path_rel, path_rel_new)
+                else:
+                    encrypted_index.rename(path_rel, path_rel_new)
+
+        return self._record_encrypted_indexes(
+            apply, lambda encrypted_index, disabled_keys: encrypted_index.write_moves(
+                self, moves, copy=copy, disabled_keys=disabled_keys))
+
+    def _record_encrypted_indexes(self, apply, write):
+        """Apply a change to the loaded encrypted indexes and write its delta for the others"""
+        success = True
+        for index_class in self.enabled_encrypted_indexes():
+            try:
+                encrypted_index = self._encrypted_indexes.get(index_class)
+                if encrypted_index is None or encrypted_index.path_store != self.path_store:
+                    encrypted_index = index_class(self.path_store)
+                else:
+                    apply(encrypted_index)
+                # Deltas only need the public keys, no passphrase is asked here
+                if not write(encrypted_index, self.config.get("settings", {}).get("disabled_keys", [])):
+                    success = False
+            except Exception as e:
+                print(f"Error updating {index_class.__name__}: {e}")
+                success = False
+        return success
+
+    def rebuild_encrypted_indexes(self, passphrase=None):
+        """Decrypt every entry once to build the enabled encrypted indexes
+
+        Args:
+            passphrase: Passphrase of the private key, asked if None
+
+        Returns:
+            list: The rebuilt indexes
+        """
+        if passphrase is None:
+            passphrase = self.ask_passphrase()
+        encrypted_indexes = [index_class(self.path_store) for index_class in self.enabled_encrypted_indexes()]
+        deltas = [encrypted_index.list_deltas() for encrypted_index in encrypted_indexes]
+        for path_rel in self.index_rel_paths():
+            try:
+                data_str = self.read(utils.rel_to_abs(self.path_store, path_rel), passphrase=passphrase)
+                data_dict = utils.data_str_to_dict(data_str)
+            except Exception as e:
+                print(f"Error indexing {path_rel}: {e}")
+                continue
+            for encrypted_index in encrypted_indexes:
+                encrypted_index.update(path_rel, data_dict)
+        for encrypted_index, paths_delta in zip(encrypted_indexes, deltas):
+            if encrypted_index.save(self, disabled_keys=self.config.get("settings", {}).get("disabled_keys", [])):
+                for path_delta in paths_delta:
+                    os.remove(path_delta)
+            self._encrypted_indexes[type(encrypted_index)] = encrypted_index
+        return encrypted_indexes
+
+    def lookup_url(self, url, passphrase=None):
+        """Find the entries whose url fields match the host of a URL
+
+        Args:
+            url: URL or hostname
+            passphrase: Passphrase used if the index is not loaded yet
+
+        Returns:
+            list: Sorted relative paths of the matching entries
+        """
+        url_index = self.get_url_index(passphrase=passphrase)
+        results = []
+        for path_rel in url_index.lookup(url):
+            # Entries removed behind our back are dropped lazily
+            if not os.path.isfile(utils.rel_to_abs(self.path_store, path_rel)):
+                url_index.remove(path_rel)
+                continue
+            results.append(path_rel)
+        return results
+
+    def search_fields(self, field=None, value=None, contains=False, passphrase=None):
+        """Find entries by decrypted field name and/or value
+
+        Args:
+            field: Field name, case-insensitive, None for any field
+            value: Field value, case-insensitive, None for any value
+            contains: Match values containing `value` instead of equal to it
+            passphrase: Passphrase used if the index is not loaded yet
+
+        Returns:
+            list: Sorted relative paths of the matching entries
+        """
+        metadata = self.get_metadata_index(passphrase=passphrase)
+        results = []
+        for path_rel in metadata.search(field=field, value=value, contains=contains):
+            # Entries removed behind our back are dropped lazily
+            if not os.path.isfile(utils.rel_to_abs(self.path_store, path_rel)):
+                metadata.remove(path_rel)
+                continue
+            results.append(path_rel)
+        return results
+
     def change_config(self, key, value):
+        self.check_writable()
         if key not in self.config_path:
             return False
         key1 = self.config_path[key]
@@ -212,8 +1070,27 @@ class PassStore(gpg.GPG):
         utils.write_config(self.config)
         return True
 
-    def encrypt_file(self, path_abs, replace=False):
+    def encrypt_file(self, path_abs, replace=False, job=None, seekable=False):
+        """Encrypt a file next to it, as .bgpg
+
+        Args:
+            path_abs: File to encrypt
+            replace: Remove the file once encrypted
+            job: jobs.Job advanced chunk by chunk for a seekable container.
+                An OpenPGP message is encrypted whole by pgpy, the job is
+                only advanced and checked once it is written
+            seekable: Write a seekable stream container, read in part by
+                read_range, instead of an OpenPGP message
+
+        Returns:
+            bool: True if the file was encrypted
+
+        Raises:
+            jobs.Cancelled: If the job was cancelled
+        """
         try:
+            if job is not None:
+                job.check()
             if not path_abs or not os.path.exists(path_abs):
                 print(f"File not found for encryption: {path_abs}")
                 return False
@@ -224,12 +1101,31 @@ class PassStore(gpg.GPG):
             # Get disabled keys with proper default
             disabled_keys = self.config.get("settings", {}).get("disabled_keys", [])
 
-            result = self.encrypt(
-                output_path,
-                path_abs,
-                disabled_keys=disabled_keys,
-                binary_file=True,
-            )
+            size = os.path.getsize(path_abs)
+            if seekable:
+                # Streamed, the file is never loaded whole
+                path_tmp = output_path + ".tmp"
+                try:
+                    with open(path_abs, "rb") as source, open(path_tmp, "wb") as f:
+                        if job is not None:
+                            # Cancelled between chunks, the partial container is dropped
+                            source = job.reader(source)
+                        with stream.SeekableWriter(f, self.recipients(disabled_keys)) as writer:
+                            shutil.copyfileobj(source, writer, stream.CHUNK_SIZE)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(path_tmp, output_path)
+                    result = True
+                finally:
+                    if os.path.exists(path_tmp):
+                        os.remove(path_tmp)
+            else:
+                result = self.encrypt(
+                    output_path,
+                    path_abs,
+                    disabled_keys=disabled_keys,
+                    binary_file=True,
+                )
 
             if result and replace:
                 try:
@@ -237,13 +1133,37 @@ class PassStore(gpg.GPG):
                 except Exception as e:
                     print(f"Error removing original file after encryption: {e}")
 
+            if job is not None:
+                # The bytes of a container were advanced chunk by chunk
+                job.advance(files=1, nbytes=0 if seekable else size)
             return result
+        except jobs.Cancelled:
+            raise
         except Exception as e:
             print(f"Error encrypting file {path_abs}: {e}")
             return False
 
-    def decrypt_file(self, path_abs, replace=False):
+    def decrypt_file(self, path_abs, replace=False, passphrase=None, job=None):
+        """Decrypt a .bgpg file next to it
+
+        Args:
+            path_abs: File to decrypt
+            replace: Remove the encrypted file once decrypted
+            passphrase: Passphrase of the private key, asked if None, which
+                a worker thread cannot do with a dialog
+            job: jobs.Job advanced chunk by chunk for a stream container.
+                An OpenPGP message is decrypted whole by pgpy, the job is
+                only advanced and checked once it is written
+
+        Returns:
+            bool: True if the file was decrypted
+
+        Raises:
+            jobs.Cancelled: If the job was cancelled
+        """
         try:
+            if job is not None:
+                job.check()
             if not path_abs or not os.path.exists(path_abs):
                 print(f"File not found for decryption: {path_abs}")
                 return False
@@ -251,10 +1171,18 @@ class PassStore(gpg.GPG):
             # Remove .bgpg extension for output file
             output_path = path_abs[:-len(".bgpg")] if path_abs.endswith(".bgpg") else path_abs + ".decrypted"
 
-            result = self.decrypt(
-                path_abs,
-                output_path
-            )
+            size = os.path.getsize(path_abs)
+            streamed = stream.is_stream(path_abs)
+            if streamed:
+                if passphrase is None:
+                    passphrase = self.ask_passphrase()
+                result = stream.decrypt_file(path_abs, output_path, self.decryptor(passphrase), job=job)
+            else:
+                result = self.decrypt(
+                    path_abs,
+                    output_path,
+                    passphrase=passphrase
+                )
 
             if result and replace:
                 try:
@@ -262,55 +1190,216 @@ class PassStore(gpg.GPG):
                 except Exception as e:
                     print(f"Error removing encrypted file after decryption: {e}")
 
+            if job is not None:
+                # The bytes of a container were advanced chunk by chunk
+                job.advance(files=1, nbytes=0 if streamed else size)
             return result
+        except jobs.Cancelled:
+            raise
         except Exception as e:
             print(f"Error decrypting file {path_abs}: {e}")
             return False
 
-    def encrypt_directory(self, path_abs, replace=False, zip=False):
+    def store_version(self, path_abs, path_abs_store=None, name=None, replace=False, passphrase=None, job=None):
+        """Store a version of a file in a deduplicated chunk store
+
+        Only the chunks not stored by earlier versions are written, e.g. the
+        changed parts of a nightly database dump.
+
+        Args:
+            path_abs: File to store
+            path_abs_store: Chunk store, created if needed, next to the file if None
+            name: Name of the version, the file name and the time if None
+            replace: Remove the file once stored
+            passphrase: Passphrase of the private key, asked if None
+            job: jobs.Job advanced as bytes are stored
+
+        Returns:
+            dict: As ChunkStore.add, with the name of the version, None on failure
+
+        Raises:
+            jobs.Cancelled: If the job was cancelled
+        """
+        try:
+            if path_abs_store is None:
+                path_abs_store = os.path.join(os.path.dirname(path_abs), chunkstore.STORE_NAME)
+            if passphrase is None:
+                passphrase = self.ask_passphrase()
+            disabled_keys = self.config.get("settings", {}).get("disabled_keys", [])
+            with chunkstore.ChunkStore(
+                    path_abs_store, self.decryptor(passphrase), recipients=self.recipients(disabled_keys)) as store:
+                if name is None:
+                    name = f"{os.path.basename(path_abs)}.{time.strftime('%Y%m%d-%H%M%S')}"
+                    name = utils.new_incr(os.path.join(path_abs_store, "versions"), name, ".bgpg")[1]
+                if job is not None:
+                    job.add_total(1, os.path.getsize(path_abs))
+                with open(path_abs, "rb") as f:
+                    report = store.add(f, name, job=job)
+            if replace:
+                os.remove(path_abs)
+            if job is not None:
+                job.advance(files=1)
+            return {**report, "name": name}
+        except jobs.Cancelled:
+            raise
+        except Exception as e:
+            print(f"Error storing a version of {path_abs}: {e}")
+            return None
+
+    def restore_version(self, path_abs_store, name, path_abs_dest, passphrase=None, job=None):
+        """Write a version of a chunk store back to a file
+
+        Returns:
+            bool: True if the version was restored
+        """
+        path_tmp = path_abs_dest + ".tmp"
+        try:
+            if passphrase is None:
+                passphrase = self.ask_passphrase()
+            with chunkstore.ChunkStore(path_abs_store, self.decryptor(passphrase)) as store:
+                if job is not None:
+                    job.add_total(1, store.manifest(name)["size"])
+                with open(path_tmp, "wb") as f:
+                    store.restore(name, f, job=job)
+            os.replace(path_tmp, path_abs_dest)
+            if job is not None:
+                job.advance(files=1)
+            return True
+        except jobs.Cancelled:
+            raise
+        except Exception as e:
+            print(f"Error restoring version {name} of {path_abs_store}: {e}")
+            return False
+        finally:
+            if os.path.exists(path_tmp):
+                os.remove(path_tmp)
+
+    def remove_version(self, path_abs_store, name, passphrase=None):
+        """Remove a version of a chunk store and the chunks only it used
+
+        Returns:
+            bool: True if the version was removed
+        """
+        try:
+            if passphrase is None:
+                passphrase = self.ask_passphrase()
+            with chunkstore.ChunkStore(path_abs_store, self.decryptor(passphrase)) as store:
+                removed = store.remove(name)
+            print(f"Removed version {name} and {removed} chunks from {path_abs_store}")
+            return True
+        except Exception as e:
+            print(f"Error removing version {name} of {path_abs_store}: {e}")
+            return False
+
+    def encrypt_directory(self, path_abs, replace=False, zip=False, format="zip", codec="gz", level=None,
+                          threads=None, job=None, incremental=False, seekable=False):
+        """Encrypt a directory, file by file or as one archive
+
+        Args:
+            path_abs: Directory to encrypt
+            replace: Remove the directory once encrypted
+            zip: Encrypt one archive of the directory instead of each file
+            format: Archive format, "zip" or "tar"
+            codec: Compression of a tar archive, "none", "gz", "bz2" or "xz"
+            level: Compression level, the default of the codec if None
+            threads: Number of compression threads of a tar archive, the number of CPUs if None
+            job: jobs.Job receiving the progress, checked between files and chunks
+            incremental: Encrypt file by file only the files changed since the
+                last incremental run, as recorded in the manifest of the directory
+            seekable: Write seekable stream containers, so that a single file
+                of a zip archive can be read by extract_member
+
+        Returns:
+            bool: True if the directory was encrypted
+
+        Raises:
+            jobs.Cancelled: If the job was cancelled, nothing is removed then
+        """
         try:
             if not path_abs or not os.path.isdir(path_abs):
                 print(f"Directory not found for encryption: {path_abs}")
                 return False
+            if job is not None and (zip or not incremental):
+                job.add_total(*archive.directory_size(path_abs))
 
             if zip:
-                # Create a zip archive first
+                # Walked, zipped and encrypted in one pass, no plaintext zip on disk
                 try:
-                    zip_path = path_abs + ".zip"
-                    shutil.make_archive(path_abs, 'zip', path_abs)
-                    # Encrypt the zip file
-                    result = self.encrypt_file(zip_path, replace=replace)
+                    if format not in archive.FORMATS:
+                        raise ValueError(f"Unknown archive format {format!r}, expected one of {archive.FORMATS}")
+                    output_path = path_abs + archive.archive_suffix(format, codec) + ".bgpg"
+                    path_tmp = output_path + ".tmp"
+                    disabled_keys = self.config.get("settings", {}).get("disabled_keys", [])
+                    try:
+                        with open(path_tmp, "wb") as f:
+                            writer_class = stream.SeekableWriter if seekable else stream.EncryptedWriter
+                            writer = writer_class(f, self.recipients(disabled_keys))
+                            if format == "zip":
+                                archive.write_zip(
+                                    path_abs, writer, compresslevel=6 if level is None else level, job=job)
+                            else:
+                                archive.write_tar(
+                                    path_abs, writer, codec=codec, level=level, threads=threads, job=job)
+                            writer.close()
+                        os.replace(path_tmp, output_path)
+                    finally:
+                        if os.path.exists(path_tmp):
+                            os.remove(path_tmp)
 
                     # Remove the directory if requested and encryption succeeded
-                    if result and replace:
+                    if replace:
                         try:
                             shutil.rmtree(path_abs)
                         except Exception as e:
                             print(f"Error removing directory after encryption: {e}")
 
-                    # Remove the temporary zip file if not needed
-                    if not replace and os.path.exists(zip_path):
-                        os.remove(zip_path)
-
-                    return result
+                    return True
+                except jobs.Cancelled:
+                    raise
                 except Exception as e:
                     print(f"Error zipping directory for encryption: {e}")
                     return False
+            elif incremental:
+                report = manifest.encrypt_directory(self, path_abs, replace=replace, job=job)
+                print(f"Encrypted {report['encrypted']} files, {report['unchanged']} unchanged, "
+                      f"{report['failed']} failed in {path_abs}")
+                return not report["failed"]
             else:
                 # Encrypt each file individually
                 success = True
                 for root, subdirs, files in os.walk(path_abs):
                     for file in files:
+                        if file == manifest.MANIFEST_NAME:
+                            continue
                         path_abs_file = os.path.join(root, file)
-                        result = self.encrypt_file(path_abs_file, replace=replace)
+                        result = self.encrypt_file(path_abs_file, replace=replace, job=job, seekable=seekable)
                         if not result:
                             success = False
                 return success
+        except jobs.Cancelled:
+            raise
         except Exception as e:
             print(f"Error encrypting directory {path_abs}: {e}")
             return False
 
-    def decrypt_directory(self, path_abs, replace=False, zip=False):
+    def decrypt_directory(self, path_abs, replace=False, zip=False, passphrase=None, job=None):
+        """Decrypt the .bgpg files of a directory, or an encrypted archive
+
+        Args:
+            path_abs: Directory to decrypt, or archive if zip
+            replace: Remove the encrypted files once decrypted
+            zip: path_abs is an archive made by encrypt_directory(zip=True)
+            passphrase: Passphrase of the private key, asked if None, which
+                a worker thread cannot do with a dialog
+            job: jobs.Job receiving the progress, checked between files and chunks
+
+        Returns:
+            bool: True if the directory was decrypted
+
+        Raises:
+            jobs.Cancelled: If the job was cancelled, the files already
+                extracted are left in place
+        """
         try:
             if not path_abs:
                 print("No directory specified for decryption")
@@ -322,8 +1411,31 @@ class PassStore(gpg.GPG):
                     print(f"Expected .bgpg file for zip decryption: {path_abs}")
                     return False
 
-                # Decrypt the zip file first
-                result = self.decrypt_file(path_abs, replace=replace)
+                if stream.is_stream(path_abs):
+                    # Decrypted, unpacked and extracted in one pass
+                    extract_dir = archive.strip_suffix(path_abs)
+                    try:
+                        if passphrase is None:
+                            passphrase = self.ask_passphrase()
+                        decryptor = self.decryptor(passphrase)
+                        with open(path_abs, "rb") as f:
+                            if job is not None:
+                                job.add_total(nbytes=os.path.getsize(path_abs))
+                                f = job.reader(f)
+                            archive.extract(stream.open_reader(f, decryptor).reader(), extract_dir, job=job)
+                        if replace:
+                            os.remove(path_abs)
+                        return True
+                    except jobs.Cancelled:
+                        raise
+                    except Exception as e:
+                        print(f"Error extracting zip archive: {e}")
+                        return False
+
+                # Archives of older versions: an OpenPGP message of a whole zip
+                if job is not None:
+                    job.add_total(files=1, nbytes=os.path.getsize(path_abs))
+                result = self.decrypt_file(path_abs, replace=replace, passphrase=passphrase, job=job)
                 if result:
                     # Extract the zip archive
                     zip_path = path_abs[:-len(".bgpg")]
@@ -352,15 +1464,20 @@ class PassStore(gpg.GPG):
                     print(f"Directory not found for decryption: {path_abs}")
                     return False
 
+                paths_abs = [
+                    os.path.join(root, file)
+                    for root, subdirs, files in os.walk(path_abs)
+                    for file in files if file.endswith(".bgpg")]
+                if job is not None:
+                    job.add_total(len(paths_abs), sum(os.path.getsize(path) for path in paths_abs))
                 success = True
-                for root, subdirs, files in os.walk(path_abs):
-                    for file in files:
-                        if file.endswith(".bgpg"):
-                            path_abs_file = os.path.join(root, file)
-                            result = self.decrypt_file(path_abs_file, replace=replace)
-                            if not result:
-                                success = False
+                for path_abs_file in paths_abs:
+                    result = self.decrypt_file(path_abs_file, replace=replace, passphrase=passphrase, job=job)
+                    if not result:
+                        success = False
                 return success
+        except jobs.Cancelled:
+            raise
         except Exception as e:
             print(f"Error decrypting directory {path_abs}: {e}")
             return False
@@ -0,0 +1,282 @@
+"""search.py - Fuzzy search over the entry paths of the password store
+
+This module provides an in-memory trigram index over relative paths with an
+fzf-like ranking, used by PassStore.find and by the search box of the UI.
+"""
+
+import os
+import re
+import bisect
+import itertools
+
+# Scoring inspired by fzf v1
+SCORE_MATCH = 16
+SCORE_GAP_START = -3
+SCORE_GAP_EXTENSION = -1
+BONUS_BOUNDARY = 8
+BONUS_CONSECUTIVE = 4
+BONUS_FIRST_CHAR = 2
+BONUS_BASENAME = 12
+BOUNDARY_CHARS = frozenset("/\\_-. ")
+
+# Maximum number of candidates scored for one query, shortest paths first
+MAX_CANDIDATES = 500
+
+# The fuzzy scan stops after this many matching paths
+MAX_FUZZY_MATCHES = 4 * MAX_CANDIDATES
+
+# Previous fuzzy candidates are narrowed instead of rescanning below this size
+MAX_NARROWED = 4000
+
+# Postings are compacted once this share of their ids has been removed
+COMPACT_RATIO = 0.25
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class PathSearch:
+    """Trigram index over relative paths with ranked fuzzy matching
+
+    Postings are append-only lists of increasing ids; removed paths are
+    tombstoned and the postings compacted when tombstones pile up. Fuzzy
+    (subsequence) queries run a single regex over all the lowered paths
+    joined by newlines, which keeps the per-path work in C.
+    """
+
+    def __init__(self, paths=()):
+        """Build the index
+
+        Args:
+            paths: Relative paths of the entries, without .gpg
+        """
+        self.paths = []  # id -> path, None when removed
+        self.lowered = []  # id -> lowered path
+        self.ids = {}  # path -> id
+        self.postings = {}  # trigram -> list of ids
+        self.removed = 0
+        self._blob = None
+        self._blob_offsets = None
+        self._blob_ids = None
+        self._last_fuzzy = None
+        for path in paths:
+            self.add(path)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, path):
+        return path in self.ids
+
+    def add(self, path):
+        if path in self.ids:
+            return
+        path_id = len(self.paths)
+        lowered = path.lower()
+        self.paths.append(path)
+        self.lowered.append(lowered)
+        self.ids[path] = path_id
+        for gram in trigrams(lowered):
+            posting = self.postings.get(gram)
+            if posting is None:
+                self.postings[gram] = [path_id]
+            else:
+                posting.append(path_id)
+        self._blob = None
+
+    def remove(self, path):
+        path_id = self.ids.pop(path, None)
+        if path_id is None:
+            return
+        self.paths[path_id] = None
+        self.removed += 1
+        self._blob = None
+        if self.removed > COMPACT_RATIO * len(self.paths):
+            self.compact()
+
+    def rename(self, path_old, path_new):
+        self.remove(path_old)
+        self.add(path_new)
+
+    def compact(self):
+        """Drop the tombstones by rebuilding the index from the live paths"""
+        paths = [path for path in self.paths if path is not None]
+        self.__init__(paths)
+
+    def sync(self, paths):
+        """Incrementally update the index to match a set of paths
+
+        Args:
+            paths: Current relative paths of the entries
+
+        Returns:
+            tuple: (added, removed) counts
+        """
+        paths = set(paths)
+        current = set(self.ids)
+        removed = current - paths
+        added = paths - current
+        for path in removed:
+            self.remove(path)
+        for path in sorted(added):
+            self.add(path)
+        return len(added), len(removed)
+
+    def _candidates(self, query):
+        """Ids of the live paths containing every trigram of the query"""
+        postings = []
+        for gram in trigrams(query):
+            posting = self.postings.get(gram)
+            if not posting:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                break
+        return candidates
+
+    def _fuzzy_candidates(self, query):
+        """Ids of the live paths containing the query as a subsequence"""
+        if self._blob is None:
+            self._last_fuzzy = None
+            self._blob_ids = [path_id for path_id in self.ids.values()]
+            self._blob_ids.sort()
+            lines = [self.lowered[path_id] for path_id in self._blob_ids]
+            self._blob = "\n".join(lines)
+            self._blob_offsets = []
+            offset = 0
+            for line in lines:
+                self._blob_offsets.append(offset)
+                offset += len(line) + 1
+
+        # Typing ahead only narrows the previous complete result
+        if self._last_fuzzy is not None:
+            last_query, last_candidates = self._last_fuzzy
+            if query.startswith(last_query) and len(last_candidates) <= MAX_NARROWED:
+                candidates = {
+                    path_id for path_id in last_candidates
+                    if match_positions(self.lowered[path_id], query) is not None}
+                self._last_fuzzy = (query, candidates)
+                return candidates
+
+        # Negated classes make the scan linear: each step stops at the first
+        # occurrence of the next character, like the forward pass of fzf.
+        # Giving characters back on failure cannot find another match since
+        # none of them is the next character, so no possessive quantifier
+        # (Python 3.11+) is needed.
+        pattern = re.compile(re.escape(query[0]) + "".join(
+            f"[^{re.escape(char)}\\n]*{re.escape(char)}" for char in query[1:]))
+        candidates = set()
+        for match in itertools.islice(pattern.finditer(self._blob), MAX_FUZZY_MATCHES):
+            line = bisect.bisect_right(self._blob_offsets, match.start()) - 1
+            candidates.add(self._blob_ids[line])
+        complete = len(candidates) < MAX_FUZZY_MATCHES
+        self._last_fuzzy = (query, candidates) if complete else None
+        return candidates
+
+    def query(self, text, limit=20):
+        """Find the paths matching a query, best first
+
+        Contiguous matches are looked up through the trigram postings, the
+        fuzzy (subsequence) fallback only runs when they are not enough.
+
+        Args:
+            text: Query, matched case-insensitively as a subsequence
+            limit: Maximum number of results
+
+        Returns:
+            list: Tuples of (score, path) sorted by decreasing score
+        """
+        query = text.lower().replace(" ", "")
+        if not query:
+            return []
+
+        results = {}
+        if len(query) >= 3:
+            candidates = self._candidates(query)
+            for path_id in self._shortest(candidates):
+                lowered = self.lowered[path_id]
+                start = lowered.rfind(query)
+                if start >= 0:
+                    results[path_id] = score_positions(lowered, range(start, start + len(query)))
+
+        if len(results) < limit:
+            candidates = self._fuzzy_candidates(query) - results.keys()
+            for path_id in self._shortest(candidates):
+                lowered = self.lowered[path_id]
+                positions = match_positions(lowered, query)
+                if positions is not None:
+                    results[path_id] = score_positions(lowered, positions)
+
+        ranked = sorted(
+            results.items(),
+            key=lambda item: (-item[1], len(self.paths[item[0]]), self.paths[item[0]]))
+        return [(score, self.paths[path_id]) for path_id, score in ranked[:limit]]
+
+    def _shortest(self, candidates):
+        candidates = [path_id for path_id in candidates if self.paths[path_id] is not None]
+        if len(candidates) > MAX_CANDIDATES:
+            # Shorter paths are the most likely to rank well
+            candidates.sort(key=lambda path_id: len(self.lowered[path_id]))
+            del candidates[MAX_CANDIDATES:]
+        return candidates
+
+
+def match_positions(lowered, query):
+    """Forward then backward pass of fzf v1 to find a tight subsequence match
+
+    Args:
+        lowered: Lowered path
+        query: Lowered query
+
+    Returns:
+        list: Positions of the query characters in the path, None if no match
+    """
+    end = -1
+    for char in query:
+        end = lowered.find(char, end + 1)
+        if end < 0:
+            return None
+    positions = []
+    i = end
+    for char in reversed(query):
+        i = lowered.rfind(char, 0, i + 1)
+        positions.append(i)
+        i -= 1
+    positions.reverse()
+    return positions
+
+
+def score_positions(lowered, positions):
+    """Score a match from the positions of the matched characters
+
+    Args:
+        lowered: Lowered path
+        positions: Increasing positions of the query characters in the path
+
+    Returns:
+        int: Score, higher is better
+    """
+    basename_start = lowered.rfind(os.sep) + 1
+    score = 0
+    previous = None
+    for rank, position in enumerate(positions):
+        score += SCORE_MATCH
+        if position == 0 or lowered[position - 1] in BOUNDARY_CHARS:
+            score += BONUS_BOUNDARY * (2 if rank == 0 else 1)
+        if position >= basename_start:
+            score += BONUS_BASENAME // len(positions) + 1
+        if previous is not None:
+            gap = position - previous - 1
+            if gap == 0:
+                score += BONUS_CONSECUTIVE
+            else:
+                score += SCORE_GAP_START + SCORE_GAP_EXTENSION * (gap - 1)
+        elif position == 0:
+            score += BONUS_FIRST_CHAR
+        previous = position
+    return score
@@ -0,0 +1,539 @@
+"""stream.py - Chunked encrypted container for outputs too large for memory
+
+OpenPGP messages built with pgpy need their whole plaintext in memory, so
+exports are written in this container instead: a random file key wrapped in
+an OpenPGP message for the recipients, then the data in AES-256-GCM chunks.
+The nonce of each chunk holds its index and a final flag, like the STREAM
+construction, so that reordered, dropped or truncated chunks are detected.
+
+The seekable variant stores the chunks without length prefix and ends with
+an encrypted index of their offsets and sizes, the only chunk with the final
+flag, followed by its length. read(offset, length) then decrypts the index
+and the chunks holding the range, not the whole container.
+"""
+
+import io
+import os
+import array
+import bisect
+import struct
+import hashlib
+from collections import deque
+from PassUI import gpg
+
+MAGIC = b"PASSUIS1"
+SEEKABLE_MAGIC = b"PASSUIS2"
+
+# Plaintext bytes per chunk
+CHUNK_SIZE = 64 * 1024
+
+# Bytes of the GCM tag appended to each chunk
+TAG_SIZE = 16
+
+LENGTH = struct.Struct(">I")
+
+# Chunks encrypted or decrypted together by a thread
+RUN_CHUNKS = 16
+
+# Runs in flight per thread, bounds the memory used by the threads
+MAX_PENDING_PER_THREAD = 2
+
+# Index entry of a chunk of a seekable container: offset in the container, plaintext size
+INDEX_ENTRY = struct.Struct(">QI")
+
+# Length of the encrypted index, at the end of a seekable container
+FOOTER = struct.Struct(">Q")
+
+
+def chunk_nonce(index, final):
+    return index.to_bytes(11, "big") + (b"\x01" if final else b"\x00")
+
+
+class _Pool:
+    """Calls run in threads, their results taken back in submission order
+
+    AES-GCM releases the GIL, so runs of chunks are encrypted and decrypted
+    in parallel. A single thread, or a last call with nothing pending, runs
+    in the calling thread.
+    """
+
+    def __init__(self, threads=None):
+        self.threads = threads or os.cpu_count() or 1
+        self._executor = None
+        self._pending = deque()
+
+    def submit(self, function, *args, last=False):
+        """Queue a call
+
+        Returns:
+            list: Results of the earlier calls now due, in order
+        """
+        if self.threads == 1 or (last and not self._pending):
+            return [function(*args)]
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=self.threads)
+        done = []
+        if len(self._pending) >= self.threads * MAX_PENDING_PER_THREAD:
+            done.append(self._pending.popleft().result())
+        self._pending.append(self._executor.submit(function, *args))
+        return done
+
+    def drain(self):
+        """Results of the pending calls, in order"""
+        while self._pending:
+            yield self._pending.popleft().result()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        self._pending.clear()
+
+
+class EncryptedWriter:
+    """Write a container chunk by chunk
+
+    The container is only complete once closed: a writer left open by an
+    error produces a file that readers reject as truncated.
+    """
+
+    magic = MAGIC
+
+    def __init__(self, file, recipients, chunk_size=CHUNK_SIZE, threads=None):
+        """Write the header of the container
+
+        Args:
+            file: Binary file to write to
+            recipients: Public keys able to read the container
+            chunk_size: Plaintext bytes per chunk
+            threads: Number of encryption threads, the number of CPUs if None
+        """
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        self.file = file
+        self.chunk_size = chunk_size
+        key = AESGCM.generate_key(bit_length=256)
+        self._aesgcm = AESGCM(key)
+        wrapped_key = gpg.encrypt_to(recipients, key)
+        header = self.magic + LENGTH.pack(len(wrapped_key)) + wrapped_key
+        self._aad = hashlib.sha256(header).digest()
+        self._buffer = bytearray()
+        self._index = 0
+        self._position = len(header)
+        self._pool = _Pool(threads)
+        self.closed = False
+        file.write(header)
+
+    def _frame(self, index, data, final):
+        chunk = self._aesgcm.encrypt(chunk_nonce(index, final), data, self._aad)
+        return LENGTH.pack(len(chunk)) + chunk
+
+    def _account(self, size):
+        """Position of the next chunk, once a chunk of size plaintext bytes is written"""
+        self._position += LENGTH.size + size + TAG_SIZE
+
+    def _encrypt_run(self, index, data, final):
+        """Consecutive chunks encrypted, run in a thread"""
+        frames = []
+        for start in range(0, max(len(data), 1), self.chunk_size):
+            end = start + self.chunk_size
+            frames.append(self._frame(index, data[start:end], final and end >= len(data)))
+            index += 1
+        return b"".join(frames)
+
+    def _submit(self, data, final):
+        data = bytes(data)
+        index = self._index
+        for start in range(0, max(len(data), 1), self.chunk_size):
+            self._account(min(self.chunk_size, len(data) - start))
+            self._index += 1
+        for frames in self._pool.submit(self._encrypt_run, index, data, final, last=final):
+            self.file.write(frames)
+
+    def write(self, data):
+        self._buffer += data
+        run = self.chunk_size * RUN_CHUNKS
+        offset = 0
+        # The last full chunk is kept, it may turn out to be the final one
+        while len(self._buffer) - offset > run:
+            self._submit(self._buffer[offset:offset + run], final=False)
+            offset += run
+        del self._buffer[:offset]
+        return len(data)
+
+    def flush(self):
+        # Only the encrypted runs are written, the rest waits for close
+        self.file.flush()
+
+    def _finish(self):
+        self._submit(self._buffer, final=True)
+
+    def close(self):
+        if not self.closed:
+            try:
+                for frames in self._pool.drain():
+                    self.file.write(frames)
+                self._finish()
+            finally:
+                self._pool.shutdown()
+            self._buffer = bytearray()
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._pool.shutdown()
+
+
+class SeekableWriter(EncryptedWriter):
+    """Write a seekable container chunk by chunk
+
+    Like EncryptedWriter, the container is only complete once closed, when
+    the index is written.
+    """
+
+    magic = SEEKABLE_MAGIC
+
+    def __init__(self, file, recipients, chunk_size=CHUNK_SIZE, threads=None):
+        super().__init__(file, recipients, chunk_size=chunk_size, threads=threads)
+        self._entries = bytearray()
+
+    def _frame(self, index, data, final):
+        # The final flag is left to the index
+        return self._aesgcm.encrypt(chunk_nonce(index, final=False), data, self._aad)
+
+    def _account(self, size):
+        self._entries += INDEX_ENTRY.pack(self._position, size)
+        self._position += size + TAG_SIZE
+
+    def _finish(self):
+        if self._buffer:
+            self._submit(self._buffer, final=True)
+        index = self._aesgcm.encrypt(chunk_nonce(0, final=True), bytes(self._entries), self._aad)
+        self.file.write(index)
+        self.file.write(FOOTER.pack(len(index)))
+
+
+def _read_key(file, decryptor, magic):
+    """Unwrap the file key of a container
+
+    Returns:
+        tuple: AESGCM of the file key, associated data of the chunks
+    """
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    if file.read(len(magic)) != magic:
+        raise ValueError("Not a PassUI encrypted stream")
+    data = file.read(LENGTH.size)
+    if len(data) != LENGTH.size:
+        raise ValueError("Truncated stream header")
+    length = LENGTH.unpack(data)[0]
+    wrapped_key = file.read(length)
+    key = decryptor.decrypt(wrapped_key)
+    if isinstance(key, str):
+        key = key.encode("latin-1")
+    return AESGCM(bytes(key)), hashlib.sha256(magic + LENGTH.pack(length) + wrapped_key).digest()
+
+
+def _decrypt_run(aesgcm, aad, index, chunks, final):
+    """Consecutive chunks decrypted, run in a thread
+
+    Args:
+        final: Whether the last of the chunks is the final one of the container
+    """
+    from cryptography.exceptions import InvalidTag
+    plaintexts = []
+    for i, chunk in enumerate(chunks):
+        try:
+            plaintexts.append(aesgcm.decrypt(chunk_nonce(index + i, final and i == len(chunks) - 1), chunk, aad))
+        except InvalidTag:
+            raise ValueError(f"Corrupted or truncated stream at chunk {index + i}")
+    return plaintexts
+
+
+class EncryptedReader:
+    """Iterate over the plaintext chunks of a container"""
+
+    def __init__(self, file, decryptor, threads=None):
+        """Unwrap the file key of the container
+
+        Args:
+            file: Binary file to read from
+            decryptor: gpg.Decryptor holding a key of a recipient
+            threads: Number of decryption threads, the number of CPUs if None
+
+        Raises:
+            ValueError: If the file is not a container or cannot be decrypted
+        """
+        self.file = file
+        self.threads = threads
+        self._aesgcm, self._aad = _read_key(file, decryptor, MAGIC)
+
+    def _read_length(self):
+        data = self.file.read(LENGTH.size)
+        if not data:
+            return None
+        if len(data) != LENGTH.size:
+            raise ValueError("Truncated stream")
+        return LENGTH.unpack(data)[0]
+
+    def __iter__(self):
+        # Chunks are read in order, decrypted by runs in threads
+        pool = _Pool(self.threads)
+        try:
+            index = 0
+            run = []
+            length = self._read_length()
+            if length is None:
+                raise ValueError("Truncated stream: no final chunk")
+            while length is not None:
+                chunk = self.file.read(length)
+                if len(chunk) != length or length < TAG_SIZE:
+                    raise ValueError("Truncated stream")
+                length = self._read_length()
+                run.append(chunk)
+                if length is None or len(run) == RUN_CHUNKS:
+                    final = length is None
+                    for plaintexts in pool.submit(
+                            _decrypt_run, self._aesgcm, self._aad, index, run, final, last=final):
+                        yield from plaintexts
+                    index += len(run)
+                    run = []
+            for plaintexts in pool.drain():
+                yield from plaintexts
+        finally:
+            pool.shutdown()
+
+    def reader(self):
+        """Binary file object reading the plaintext, e.g. for zipfile or tarfile"""
+        return io.BufferedReader(_ChunkIO(iter(self)), buffer_size=CHUNK_SIZE)
+
+
+class SeekableReader:
+    """Random access to the plaintext of a seekable container"""
+
+    def __init__(self, file, decryptor, threads=None):
+        """Unwrap the file key and decrypt the index of the container
+
+        Args:
+            file: Seekable binary file to read from
+            decryptor: gpg.Decryptor holding a key of a recipient
+            threads: Number of decryption threads, the number of CPUs if None
+
+        Raises:
+            ValueError: If the file is not a seekable container, cannot be
+                decrypted or is truncated
+        """
+        from cryptography.exceptions import InvalidTag
+        self.file = file
+        self.threads = threads
+        self._aesgcm, self._aad = _read_key(file, decryptor, SEEKABLE_MAGIC)
+        end = file.seek(0, os.SEEK_END)
+        if end < FOOTER.size:
+            raise ValueError("Truncated stream: no index")
+        file.seek(end - FOOTER.size)
+        length = FOOTER.unpack(file.read(FOOTER.size))[0]
+        if length < TAG_SIZE or length > end - FOOTER.size:
+            raise ValueError("Truncated stream: no index")
+        self._end = end - FOOTER.size - length  # End of the chunks
+        file.seek(self._end)
+        try:
+            index = self._aesgcm.decrypt(chunk_nonce(0, final=True), file.read(length), self._aad)
+        except InvalidTag:
+            raise ValueError("Corrupted or truncated stream index")
+        self._offsets = array.array("Q")  # Offset of each chunk in the container
+        self._starts = array.array("Q")  # Offset of each chunk in the plaintext
+        self.size = 0
+        for offset, size in INDEX_ENTRY.iter_unpack(index):
+            self._offsets.append(offset)
+            self._starts.append(self.size)
+            self.size += size
+        self._cached = (None, b"")
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def _read_run(self, first, last):
+        """Encrypted chunks first to last excluded, read at once"""
+        end = self._offsets[last] if last < len(self._offsets) else self._end
+        self.file.seek(self._offsets[first])
+        data = self.file.read(end - self._offsets[first])
+        chunks = []
+        for index in range(first, last):
+            size = self._plaintext_size(index) + TAG_SIZE
+            start = self._offsets[index] - self._offsets[first]
+            chunks.append(data[start:start + size])
+        return chunks
+
+    def _plaintext_size(self, index):
+        end = self._starts[index + 1] if index + 1 < len(self._starts) else self.size
+        return end - self._starts[index]
+
+    def chunks(self, first=0, last=None):
+        """Plaintexts of the chunks first to last excluded, decrypted by runs in threads"""
+        last = len(self._offsets) if last is None else last
+        pool = _Pool(self.threads)
+        try:
+            for start in range(first, last, RUN_CHUNKS):
+                stop = min(start + RUN_CHUNKS, last)
+                for plaintexts in pool.submit(
+                        _decrypt_run, self._aesgcm, self._aad, start, self._read_run(start, stop), False,
+                        last=stop == last):
+                    yield from plaintexts
+            for plaintexts in pool.drain():
+                yield from plaintexts
+        finally:
+            pool.shutdown()
+
+    def chunk(self, index):
+        """Plaintext of one chunk, the last one read being cached"""
+        if self._cached[0] != index:
+            chunks = self._read_run(index, index + 1)
+            self._cached = (index, _decrypt_run(self._aesgcm, self._aad, index, chunks, False)[0])
+        return self._cached[1]
+
+    def read(self, offset, length):
+        """Decrypt a range of the plaintext, only the chunks holding it are read
+
+        Args:
+            offset: Offset of the range in the plaintext
+            length: Length of the range, shorter past the end of the plaintext
+
+        Returns:
+            bytes: The plaintext of the range
+        """
+        end = min(offset + length, self.size)
+        if offset >= end:
+            return b""
+        first = bisect.bisect_right(self._starts, offset) - 1
+        last = bisect.bisect_left(self._starts, end)
+        if last - first <= 2:
+            # Small reads, e.g. of a buffered file, go through the cache
+            chunks = (self.chunk(index) for index in range(first, last))
+        else:
+            chunks = self.chunks(first, last)
+        parts = []
+        position = self._starts[first]
+        for chunk in chunks:
+            parts.append(chunk[max(offset - position, 0):end - position])
+            position += len(chunk)
+        return b"".join(parts)
+
+    def __iter__(self):
+        return self.chunks()
+
+    def reader(self):
+        """Seekable binary file object reading the plaintext, e.g. for zipfile"""
+        return io.BufferedReader(_SeekableIO(self), buffer_size=CHUNK_SIZE)
+
+
+class _SeekableIO(io.RawIOBase):
+    """Raw file object over a SeekableReader"""
+
+    def __init__(self, container):
+        self._container = container
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self._container.size
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self._position = offset
+        return offset
+
+    def readinto(self, buffer):
+        data = self._container.read(self._position, len(buffer))
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+def open_reader(file, decryptor, threads=None):
+    """Reader of a container, seekable or not, to iterate over its chunks
+
+    Returns:
+        EncryptedReader or SeekableReader: Depending on the container
+    """
+    position = file.tell()
+    magic = file.read(len(SEEKABLE_MAGIC))
+    file.seek(position)
+    if magic == SEEKABLE_MAGIC:
+        return SeekableReader(file, decryptor, threads=threads)
+    return EncryptedReader(file, decryptor, threads=threads)
+
+
+class _ChunkIO(io.RawIOBase):
+    """Raw file object over an iterator of chunks"""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._chunk = b""
+        self._offset = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self._offset >= len(self._chunk):
+            self._chunk = next(self._chunks, None)
+            self._offset = 0
+            if self._chunk is None:
+                self._chunk = b""
+                return 0
+        size = min(len(buffer), len(self._chunk) - self._offset)
+        buffer[:size] = self._chunk[self._offset:self._offset + size]
+        self._offset += size
+        return size
+
+
+def is_stream(path_abs):
+    """Whether a file is a container rather than an OpenPGP message"""
+    with open(path_abs, "rb") as f:
+        return f.read(len(MAGIC)) in (MAGIC, SEEKABLE_MAGIC)
+
+
+def is_seekable(path_abs):
+    """Whether a file is a seekable container"""
+    with open(path_abs, "rb") as f:
+        return f.read(len(SEEKABLE_MAGIC)) == SEEKABLE_MAGIC
+
+
+def decrypt_file(path_abs_source, path_abs_dest, decryptor, job=None):
+    """Decrypt a container to a file, chunk by chunk
+
+    Args:
+        path_abs_source: Path to the container
+        path_abs_dest: Path to the decrypted file
+        decryptor: gpg.Decryptor holding a key of a recipient
+        job: jobs.Job advanced as bytes are decrypted
+
+    Returns:
+        bool: True once the whole container was decrypted
+    """
+    path_tmp = path_abs_dest + ".tmp"
+    try:
+        with open(path_abs_source, "rb") as source, open(path_tmp, "wb") as dest:
+            for chunk in open_reader(source, decryptor):
+                dest.write(chunk)
+                if job is not None:
+                    job.advance(nbytes=len(chunk))
+        os.replace(path_tmp, path_abs_dest)
+    finally:
+        if os.path.exists(path_tmp):
+            os.remove(path_tmp)
+    return True
@@ -0,0 +1,138 @@
+"""transaction.py - Atomic groups of writes to the password store
+
+Encrypted entries are staged as temporary files next to their destination,
+then renamed over it on commit, so that a crash never leaves a truncated
+entry. The staged files are synced together, and each directory once per
+transaction instead of once per entry, which lets the filesystem group the
+journal commits of many small writes.
+"""
+
+import os
+import uuid
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+# Threads syncing the staged files, concurrent fsyncs share journal commits
+SYNC_THREADS = 8
+
+
+def fsync_dir(path_abs_dir):
+    # Directories cannot be opened for syncing on Windows
+    if os.name == "nt":
+        return
+    fd = os.open(path_abs_dir, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_file(path_abs):
+    with open(path_abs, "rb+") as f:
+        os.fsync(f.fileno())
+
+
+class Transaction:
+    """Entries staged as temporary files, renamed into place on commit"""
+
+    def __init__(self):
+        self.token = uuid.uuid4().hex[:12]
+        self.staged = {}  # path_abs -> path_abs_tmp
+        self.changes = {}  # path_abs -> (path_rel, data_dict)
+        self.created = []  # Directories created while staging
+        self.committed = False
+
+    def __len__(self):
+        return len(self.staged)
+
+    def temp_path(self, path_abs, suffix):
+        # Hidden and without the .gpg extension, so the store walk skips it
+        path_abs_dir, name = os.path.split(path_abs)
+        return os.path.join(path_abs_dir, f".{name}.{self.token}.{suffix}")
+
+    def stage(self, path_abs, data, path_rel=None, data_dict=None):
+        """Write the new content of a file next to it
+
+        Args:
+            path_abs: Destination of the content
+            data: Encrypted content
+            path_rel: Relative path of the entry, recorded for the indexes
+            data_dict: Decrypted fields of the entry, recorded for the indexes
+        """
+        if self.committed:
+            raise ValueError("Transaction already committed")
+        path_abs_dir = os.path.dirname(path_abs)
+        missing = []
+        while path_abs_dir and not os.path.isdir(path_abs_dir):
+            missing.append(path_abs_dir)
+            path_abs_dir = os.path.dirname(path_abs_dir)
+        os.makedirs(os.path.dirname(path_abs), exist_ok=True)
+        self.created.extend(missing)
+        path_abs_tmp = self.temp_path(path_abs, "tmp")
+        with open(path_abs_tmp, "wb") as f:
+            f.write(data)
+        self.staged[path_abs] = path_abs_tmp
+        self.changes[path_abs] = (path_rel, data_dict)
+
+    def commit(self):
+        """Sync the staged files, rename them into place and sync their directories
+
+        If a rename fails, the entries already replaced are restored.
+
+        Returns:
+            list: (path_rel, data_dict) of the committed entries
+        """
+        if self.committed:
+            raise ValueError("Transaction already committed")
+        with ThreadPoolExecutor(max_workers=min(SYNC_THREADS, len(self.staged) or 1)) as executor:
+            list(executor.map(fsync_file, self.staged.values()))
+
+        backups = {}  # path_abs -> previous content kept until the end
+        renamed = []
+        try:
+            for path_abs, path_abs_tmp in self.staged.items():
+                if os.path.exists(path_abs):
+                    path_abs_bak = self.temp_path(path_abs, "bak")
+                    try:
+                        # The entry stays in place while it is backed up
+                        os.link(path_abs, path_abs_bak)
+                    except OSError:
+                        shutil.copy2(path_abs, path_abs_bak)
+                    backups[path_abs] = path_abs_bak
+                os.replace(path_abs_tmp, path_abs)
+                renamed.append(path_abs)
+        except BaseException:
+            for path_abs in reversed(renamed):
+                if path_abs in backups:
+                    os.replace(backups.pop(path_abs), path_abs)
+                else:
+                    os.remove(path_abs)
+            for path_abs_bak in backups.values():
+                os.remove(path_abs_bak)
+            raise
+
+        for path_abs_dir in {os.path.dirname(path_abs) for path_abs in self.staged}:
+            fsync_dir(path_abs_dir)
+        for path_abs_bak in backups.values():
+            os.remove(path_abs_bak)
+        self.committed = True
+        self.staged = {}
+        self.created = []
+        return list(self.changes.values())
+
+    def rollback(self):
+        """Drop the staged files and the directories created for them, the store is left untouched"""
+        for path_abs_tmp in self.staged.values():
+            try:
+                os.remove(path_abs_tmp)
+            except FileNotFoundError:
+                pass
+        # Deepest first, those holding other files are kept
+        for path_abs_dir in sorted(self.created, key=lambda path: path.count(os.sep), reverse=True):
+            try:
+                os.rmdir(path_abs_dir)
+            except OSError:
+                pass
+        self.staged = {}
+        self.changes = {}
+        self.created = []
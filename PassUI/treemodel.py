@@ -0,0 +1,281 @@
+"""treemodel.py - Lazy item model of the password store tree
+
+A QTreeWidget needs an item for every entry before it shows anything, so
+opening a large store built the whole tree up front. StoreTreeModel only
+creates the nodes of a directory when the view asks for them, through
+canFetchMore and fetchMore, and at most FETCH_SIZE at a time, so that the
+cost of opening the store is the cost of its top level. Each node keeps
+its relative path and whether it is a directory, the tree handlers no
+longer have to rebuild paths from the parents and stat them. Changes made
+from the UI insert, remove, rename or move single nodes, with the matching
+model signals, instead of reloading the tree.
+"""
+
+import os
+from PyQt5 import QtCore
+from PyQt5.QtCore import Qt
+
+# Nodes created per fetchMore
+FETCH_SIZE = 1000
+
+PATH_ROLE = Qt.UserRole
+IS_DIR_ROLE = Qt.UserRole + 1
+
+
+class Node:
+    """Entry or directory of the tree"""
+
+    __slots__ = ("name", "path_rel", "is_dir", "parent", "row", "children", "pending")
+
+    def __init__(self, name, parent=None, is_dir=False, tree=None):
+        """
+        Args:
+            name: Name of the entry (without .gpg) or of the directory
+            parent: Parent node, None for the root
+            is_dir: Whether the node is a directory
+            tree: Content of a directory, nested like utils.nest_rel_paths
+        """
+        self.name = name
+        self.parent = parent
+        self.path_rel = os.path.join(parent.path_rel, name) if parent is not None and parent.path_rel else name
+        self.is_dir = is_dir
+        self.row = 0
+        self.children = []
+        # Content not turned into nodes yet, sorted by name in reverse so
+        # that fetching pops from the end
+        self.pending = sorted((tree or {}).items(), key=lambda item: item[0], reverse=True)
+
+    def update_path(self):
+        """Recompute the paths of the node and its fetched descendants after a rename or a move"""
+        self.path_rel = os.path.join(self.parent.path_rel, self.name) if self.parent.path_rel else self.name
+        for child in self.children:
+            child.update_path()
+
+    def __repr__(self):
+        return f"Node({self.path_rel!r}, is_dir={self.is_dir})"
+
+
+class StoreTreeModel(QtCore.QAbstractItemModel):
+    """Single column model of the store, fetched directory by directory"""
+
+    # A name was edited in the view, (node, new name). The node is renamed
+    # with rename_node once the entry is renamed on disk.
+    nameEdited = QtCore.pyqtSignal(object, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = Node("", is_dir=True)
+
+    def load(self, tree):
+        """Replace the content of the model
+
+        Args:
+            tree: Nested dictionary of the store, as built by utils.nest_rel_paths
+        """
+        self.beginResetModel()
+        self.root = Node("", is_dir=True, tree=tree)
+        self.endResetModel()
+
+    def node(self, index):
+        """Node of an index, the root for an invalid index"""
+        if index.isValid():
+            return index.internalPointer()
+        return self.root
+
+    def index_of(self, node):
+        if node is None or node is self.root:
+            return QtCore.QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    # QAbstractItemModel interface
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        children = self.node(parent).children
+        if column != 0 or not 0 <= row < len(children):
+            return QtCore.QModelIndex()
+        return self.createIndex(row, 0, children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        return self.index_of(index.internalPointer().parent)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.node(parent).children)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        node = self.node(parent)
+        return node.is_dir and bool(node.children or node.pending)
+
+    def canFetchMore(self, parent):
+        return bool(self.node(parent).pending)
+
+    def fetchMore(self, parent):
+        self._fetch(self.node(parent), FETCH_SIZE)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return node.name
+        if role == PATH_ROLE:
+            return node.path_rel
+        if role == IS_DIR_ROLE:
+            return node.is_dir
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        node = index.internalPointer()
+        if value and value != node.name:
+            self.nameEdited.emit(node, value)
+        return False
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable | Qt.ItemIsDragEnabled
+        if index.internalPointer().is_dir:
+            flags |= Qt.ItemIsDropEnabled
+        return flags
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and section == 0:
+            return "Files"
+        return None
+
+    def supportedDropActions(self):
+        # Drops are handled by the view, which moves the entries on disk
+        return Qt.MoveAction
+
+    # Changes made from the UI
+
+    def _fetch(self, node, count=None):
+        pending = node.pending
+        if not pending:
+            return
+        batch = pending[-count:] if count else pending[:]
+        del pending[-len(batch):]
+        batch.reverse()
+        first = len(node.children)
+        self.beginInsertRows(self.index_of(node), first, first + len(batch) - 1)
+        for row, (name, tree) in enumerate(batch, first):
+            is_dir = isinstance(tree, dict)
+            child = Node(name, node, is_dir, tree if is_dir else None)
+            child.row = row
+            node.children.append(child)
+        self.endInsertRows()
+
+    def fetch_all(self, node):
+        """Create all the children of a directory, e.g. before changing it"""
+        self._fetch(node)
+
+    def child(self, node, name):
+        """Child of a directory by name, None if there is none"""
+        self.fetch_all(node)
+        for child in node.children:
+            if child.name == name:
+                return child
+        return None
+
+    def find(self, path_rel):
+        """Node of a relative path, the directories on the way are fetched
+
+        Args:
+            path_rel: Relative path of the entry, without .gpg, or of the directory
+
+        Returns:
+            Node: The node, None if not in the tree
+        """
+        node = self.root
+        for name in path_rel.split(os.sep):
+            node = self.child(node, name)
+            if node is None:
+                return None
+        return node
+
+    def _renumber(self, node, first=0):
+        for row in range(first, len(node.children)):
+            node.children[row].row = row
+
+    def _insert_row(self, parent, name):
+        """Row keeping the children of a fully fetched directory sorted"""
+        for row, child in enumerate(parent.children):
+            if child.name > name:
+                return row
+        return len(parent.children)
+
+    def _insert(self, parent, node):
+        self.fetch_all(parent)
+        row = self._insert_row(parent, node.name)
+        self.beginInsertRows(self.index_of(parent), row, row)
+        node.parent = parent
+        node.update_path()
+        parent.children.insert(row, node)
+        self._renumber(parent, row)
+        self.endInsertRows()
+
+    def add_node(self, parent, name, is_dir=False):
+        """Add an entry or a directory created on disk
+
+        Args:
+            parent: Directory node, the root for the top level
+            name: Name of the new node
+            is_dir: Whether the new node is a directory
+
+        Returns:
+            Node: The new node
+        """
+        node = Node(name, parent, is_dir)
+        self._insert(parent, node)
+        return node
+
+    def remove_node(self, node):
+        """Remove a node and its descendants, removed from disk"""
+        parent = node.parent
+        self.beginRemoveRows(self.index_of(parent), node.row, node.row)
+        del parent.children[node.row]
+        self._renumber(parent, node.row)
+        self.endRemoveRows()
+
+    def rename_node(self, node, name):
+        """Rename a node renamed on disk, moved to keep its directory sorted"""
+        parent = node.parent
+        self.fetch_all(parent)
+        old_row = node.row
+        node.name = name
+        del parent.children[old_row]
+        row = self._insert_row(parent, name)
+        parent.children.insert(old_row, node)
+        if row != old_row:
+            # beginMoveRows wants the destination row before the move
+            parent_index = self.index_of(parent)
+            destination = row + 1 if row >= old_row else row
+            self.beginMoveRows(parent_index, old_row, old_row, parent_index, destination)
+            del parent.children[old_row]
+            parent.children.insert(row, node)
+            self._renumber(parent, min(row, old_row))
+            self.endMoveRows()
+        node.update_path()
+        index = self.index_of(node)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+
+    def move_node(self, node, parent, name=None):
+        """Move a node moved on disk to another directory
+
+        Args:
+            node: Node to move
+            parent: Directory node to move it to, the root for the top level
+            name: New name of the node, unchanged if None
+        """
+        self.remove_node(node)
+        if name is not None:
+            node.name = name
+        self._insert(parent, node)
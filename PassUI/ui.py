@@ -8,111 +8,155 @@ import datetime
 import os
 import sys
 import types
-import shutil
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import filedialog
-import pyperclip
-import yaml
-from pathlib import Path
 import PyQt5
 import PyQt5.uic
 import PyQt5.QtCore
 import PyQt5.QtWidgets
 from PyQt5 import Qt, QtGui
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
-from PassUI import utils
+from PassUI import utils, config, jobs, attachments, treemodel
+
+
+# Steps of the progress bars of long operations
+PROGRESS_STEPS = 1000
+
+# Threads decrypting the entries selected in the tree. Decrypting mostly
+# holds the GIL and each selection supersedes the previous ones, more
+# threads would only take time from the GUI thread.
+DECRYPT_THREADS = 1
+
+# Shown in the details table while the selected entry is decrypted
+PLACEHOLDER = [("PASSWORD", "Decrypting...")]
 
 
 # Thread class for background operations
 class WorkerThread(QThread):
     """Worker thread for background tasks to avoid UI freezing"""
     result_signal = pyqtSignal(bool, str)
+    progress_signal = pyqtSignal(dict)
 
-    def __init__(self, function, *args, **kwargs):
+    def __init__(self, function, *args, job=None, **kwargs):
         super().__init__()
         self.function = function
         self.args = args
         self.kwargs = kwargs
+        self.job = job
+        if job is not None:
+            # The job reports from this thread, the signal brings it to the UI thread
+            job.callback = self.progress_signal.emit
+            self.kwargs["job"] = job
 
     def run(self):
         try:
             result = self.function(*self.args, **self.kwargs)
-            self.result_signal.emit(True, "Operation completed successfully" if result else "Operation failed")
+            message = "Operation completed successfully" if result else "Operation failed"
+            if self.job is not None:
+                message += "\n" + jobs.format_progress(self.job.summary(bool(result), message))
+            self.result_signal.emit(True, message)
+        except jobs.Cancelled:
+            if self.job is not None:
+                self.job.summary(False, "Operation cancelled")
+            self.result_signal.emit(False, "Operation cancelled")
         except Exception as e:
             self.result_signal.emit(False, str(e))
 
 
-def get_rel_path(item, file=False):
-    """Get the relative path for a tree item
-
-    Args:
-        item: The tree widget item
-        file: Whether the item is a file or directory
-
-    Returns:
-        str: The relative path
-    """
-    if file:
-        return os.path.join(get_rel_path(item), item.text(0) + ".gpg")
-
-    parents = []
-    current = item
-    while True:
-        if current is None:
-            break
-        parent = current.parent()
-        if parent is None:
-            break
-        parents.append(parent)
-        current = parent
-
-    parents.reverse()
-    return os.sep.join([parent.text(0) for parent in parents])
-
+class EntryLoader(PyQt5.QtCore.QObject):
+    """Decrypt the entries selected in the tree off the GUI thread
 
-def get_parent_path(item):
-    """Get the parent path for a tree item
-
-    Args:
-        item: Tree widget item
-
-    Returns:
-        str: Parent path, empty string if root
-    """
-    path_parts = []
-    parent = item.parent()
-
-    while parent is not None:
-        path_parts.insert(0, parent.text(0))
-        parent = parent.parent()
-
-    return os.path.join(*path_parts) if path_parts else ""
-
-
-def get_full_tree_path(item):
-    """Get the full path of a tree item by traversing parents
-
-    Args:
-        item: The tree widget item
-
-    Returns:
-        str: Full path with separators
+    Each request supersedes the previous ones: those not started yet are
+    skipped and the results of the one running are dropped, so that only
+    the latest selection reaches the details table.
     """
-    if item is None:
-        return ""
+    # Request id, tree node and decrypted entry.Entry, or the exception raised
+    loaded = pyqtSignal(int, object, object)
 
-    parts = [item.text(0)]
-    parent = item.parent()
+    def __init__(self, passpy_obj, parent=None):
+        """
+        Args:
+            passpy_obj: The PassStore object
+            parent: Parent QObject, the signal is delivered in its thread
+        """
+        super().__init__(parent)
+        self.passpy_obj = passpy_obj
+        self.request = 0
+        self.node = None
+        self.job = None
+        self.future = None
+        # Keys unlocked once, used by the decrypt thread only
+        self.decryptor = None
+        self.passphrase = None
+        self.executor = ThreadPoolExecutor(max_workers=DECRYPT_THREADS, thread_name_prefix="passui-decrypt")
+
+    def load(self, node, passphrase):
+        """Decrypt an entry in the background, cancelling the outstanding requests
 
-    while parent is not None:
-        parts.insert(0, parent.text(0))
-        parent = parent.parent()
+        Args:
+            node: Tree node of the entry
+            passphrase: Passphrase of the private key, asked by the GUI thread
 
-    return os.sep.join(parts)
+        Returns:
+            int: Id of the request, passed to loaded with the result
+        """
+        if node is self.node and self.future is not None and not self.future.done():
+            # Already on its way, e.g. selected then clicked
+            return self.request
+        self.cancel()
+        self.request += 1
+        self.node = node
+        self.job = jobs.Job()
+        self.future = self.executor.submit(self._run, self.request, self.job, node, passphrase)
+        return self.request
+
+    def cancel(self):
+        """Drop the outstanding requests"""
+        if self.job is not None:
+            self.job.cancel()
+        self.node = None
+
+    def is_current(self, request):
+        return request == self.request and self.node is not None
+
+    def forget(self):
+        """Unlock the keys again on the next request, e.g. after they changed"""
+        self.passphrase = None
+
+    def close(self):
+        self.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, request, job, node, passphrase):
+        if job.cancelled:
+            # Superseded before it started
+            return
+        try:
+            if self.decryptor is None or self.passphrase != passphrase:
+                # Unlocking and validating the keys costs far more than
+                # decrypting an entry, it is done once for all the selections
+                self.decryptor = None
+                try:
+                    self.decryptor = self.passpy_obj.decryptor(passphrase)
+                except ValueError:
+                    # A wrong passphrase must not stay cached
+                    self.passpy_obj.passphrase_provider.forget()
+                    raise
+                self.passphrase = passphrase
+            entry = self.passpy_obj.read_entry(node.path_rel, decryptor=self.decryptor)
+        except Exception as e:
+            print(f"Error reading key {node.path_rel}: {e}")
+            entry = e
+        if not job.cancelled:
+            self.loaded.emit(request, node, entry)
 
 
 class PassUI(PyQt5.QtWidgets.QMainWindow):
     """Main UI class for PassUI password manager"""
 
+    # Emitted once the config, the keys and the store are shown
+    loaded = pyqtSignal()
+
     def __init__(self, passpy_obj):
         """Initialize the UI
 
@@ -124,8 +168,9 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
         # Initialize core variables first
         self.clicked_item = None
         self.clicked_key = None
+        self.clicked_entry = None  # entry.Entry shown in the details table
+        self.copy_pending = None  # Tree node whose password is copied once decrypted
         self.edit_table = False
-        self.in_dupplicate = False
         self.worker_threads = []
         self.passpy_obj = passpy_obj
 
@@ -145,6 +190,13 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
                 self.show_error("UI Error", "treeWidget component missing from UI file")
                 sys.exit(1)
 
+            # The tree shows a lazy model of the store
+            self.tree_model = treemodel.StoreTreeModel(self)
+            self.ui.treeWidget.setModel(self.tree_model)
+
+            # Selected entries are decrypted in the background
+            self.entry_loader = EntryLoader(self.passpy_obj, self)
+
             # Setup drag and drop
             self.ui.treeWidget.dragMoveEvent = types.MethodType(PassUI.dragMoveEvent, self)
             self.ui.treeWidget.dropEvent = types.MethodType(PassUI.dropEvent, self)
@@ -152,59 +204,49 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
             # Set up event handlers
             self.setup_events()
 
-            # Load data with proper sequence and error handling
-            self.load_config()
-            self.load_keys()
-            self.load_tree()
-
+            # Paint the window first, the keyring and the store load after
             self.show()
+            PyQt5.QtWidgets.QApplication.processEvents()
+            PyQt5.QtCore.QTimer.singleShot(0, self.load_data)
         except Exception as e:
             # Show the specific exception and stack trace
             import traceback
             error_message = f"{str(e)}\n\nStack trace:\n{traceback.format_exc()}"
             self.show_error("Initialization Error", error_message)
 
+    def closeEvent(self, event):
+        """Stop decrypting entries nobody will see"""
+        if hasattr(self, "entry_loader"):
+            self.entry_loader.close()
+        super().closeEvent(event)
+
+    def load_data(self):
+        """Load the config, the keys and the store into the window"""
+        try:
+            self.load_config()
+            self.load_keys()
+            self.load_tree()
+        except Exception as e:
+            import traceback
+            error_message = f"{str(e)}\n\nStack trace:\n{traceback.format_exc()}"
+            self.show_error("Loading Error", error_message)
+        finally:
+            self.loaded.emit()
+
     def action_rename_item(self, item):
         """Rename a password or folder with a simpler, more robust approach
 
         Args:
-            item: Tree widget item to rename
+            item: Tree node to rename
         """
         try:
             # Store the current item and name for reference
             self.clicked_item = item
-            self.clicked_key = item.text(0)
-
-            # Store the full path
-            self.clicked_full_path = get_full_tree_path(item)
-
-            # Get current name and path
-            current_name = item.text(0)
-            parent_path = get_parent_path(item)
-
-            # Log full paths for debugging
-            source_file_path = os.path.join(self.passpy_obj.path_store, parent_path, f"{current_name}.gpg")
-            source_dir_path = os.path.join(self.passpy_obj.path_store, parent_path, current_name)
-
-            print(f"Debug - Rename operation:")
-            print(f"  Current name: {current_name}")
-            print(f"  Parent path: {parent_path}")
-            print(f"  Full path: {self.clicked_full_path}")
-            print(f"  Source file path: {source_file_path} (exists: {os.path.isfile(source_file_path)})")
-            print(f"  Source dir path: {source_dir_path} (exists: {os.path.isdir(source_dir_path)})")
-
-            # Determine if item is file or folder
-            is_file = os.path.isfile(source_file_path)
-            is_folder = os.path.isdir(source_dir_path)
-
-            if not is_file and not is_folder:
-                self.show_error("Item Not Found",
-                                f"Cannot find the item '{current_name}' in the password store.\n"
-                                f"Checked file path: {source_file_path}\n"
-                                f"Checked folder path: {source_dir_path}")
-                return
+            self.clicked_key = item.name
 
-            item_type = "password" if is_file else "folder"
+            # Get current name and type
+            current_name = item.name
+            item_type = "folder" if item.is_dir else "password"
 
             # Get new name from user
             new_name, ok = PyQt5.QtWidgets.QInputDialog.getText(
@@ -215,87 +257,87 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
             if not ok or not new_name or new_name == current_name:
                 return  # User cancelled or didn't change name
 
-            # Build source and target paths
-            source_path = source_file_path if is_file else source_dir_path
-            target_path = os.path.join(self.passpy_obj.path_store, parent_path,
-                                       f"{new_name}.gpg" if is_file else new_name)
+            if self.rename_node(item, new_name):
+                # Successfully renamed
+                self.show_info("Renamed", f"{item_type.capitalize()} successfully renamed to '{new_name}'")
 
-            # Log target paths for debugging
-            print(f"  Target path: {target_path} (exists: {os.path.exists(target_path)})")
+        except Exception as e:
+            import traceback
+            error_details = traceback.format_exc()
+            self.show_error("Error renaming item", f"{str(e)}\n\nDetails:\n{error_details}")
 
-            # Check if target already exists
-            if os.path.exists(target_path):
-                # If we're trying to rename to a name that already exists
-                self.show_error("Cannot Rename",
-                                f"A {item_type} with name '{new_name}' already exists at {os.path.dirname(target_path)}.")
-                return
+    def rename_node(self, item, new_name):
+        """Rename a password or folder on disk, then in the tree
 
-            # Double check source exists before attempting rename
-            if not os.path.exists(source_path):
-                self.show_error("Source Not Found",
-                                f"Cannot find the source {item_type} at {source_path}.")
-                return
+        Args:
+            item: Tree node to rename
+            new_name: New name of the password or folder
 
-            try:
-                # Perform the rename with explicit error handling
-                print(f"  Renaming from {source_path} to {target_path}")
-                os.rename(source_path, target_path)
-            except PermissionError:
-                self.show_error("Permission Denied",
-                                f"You don't have permission to rename this {item_type}. "
-                                f"Check if the file is in use by another program.")
-                return
-            except FileNotFoundError:
-                self.show_error("File Not Found",
-                                f"The source {item_type} no longer exists at {source_path}.")
-                return
-            except FileExistsError:
-                self.show_error("File Exists",
-                                f"A {item_type} with name '{new_name}' already exists.")
-                return
-            except OSError as e:
-                self.show_error("Operating System Error",
-                                f"Failed to rename: {str(e)}")
-                return
+        Returns:
+            bool: True if renamed
+        """
+        current_name = item.name
+        parent_path = item.parent.path_rel
+        is_file = not item.is_dir
+        item_type = "password" if is_file else "folder"
+
+        # Build source and target paths
+        source_path = os.path.join(self.passpy_obj.path_store, parent_path,
+                                   f"{current_name}.gpg" if is_file else current_name)
+        target_path = os.path.join(self.passpy_obj.path_store, parent_path,
+                                   f"{new_name}.gpg" if is_file else new_name)
+        print(f"Rename {item_type} from {source_path} to {target_path}")
+
+        # Check if target already exists
+        if os.path.exists(target_path):
+            # If we're trying to rename to a name that already exists
+            self.show_error("Cannot Rename",
+                            f"A {item_type} with name '{new_name}' already exists at {os.path.dirname(target_path)}.")
+            return False
 
-            # Update the tree item
-            self.in_dupplicate = True  # Prevent triggering rename handler
-            item.setText(0, new_name)
-            self.in_dupplicate = False
+        try:
+            # Perform the rename with explicit error handling
+            if is_file:
+                self.passpy_obj.move_entry(item.path_rel, os.path.join(parent_path, new_name))
+            else:
+                self.passpy_obj.move_folder(item.path_rel, os.path.join(parent_path, new_name))
+        except PermissionError:
+            self.show_error("Permission Denied",
+                            f"You don't have permission to rename this {item_type}. "
+                            f"Check if the file is in use by another program.")
+            return False
+        except FileNotFoundError:
+            self.show_error("File Not Found",
+                            f"The source {item_type} no longer exists at {source_path}.")
+            return False
+        except FileExistsError:
+            self.show_error("File Exists",
+                            f"A {item_type} with name '{new_name}' already exists.")
+            return False
+        except OSError as e:
+            self.show_error("Operating System Error",
+                            f"Failed to rename: {str(e)}")
+            return False
 
-            # Store updated values
-            self.clicked_item = item
+        # Update the tree node, its path and the paths below it follow
+        self.tree_model.rename_node(item, new_name)
+        if item is self.clicked_item:
             self.clicked_key = new_name
-
-            # Update the full path
-            if self.clicked_full_path:
-                parts = self.clicked_full_path.split(os.sep)
-                if parts:
-                    parts[-1] = new_name
-                    self.clicked_full_path = os.sep.join(parts)
-
-            # Successfully renamed
-            self.show_info("Renamed", f"{item_type.capitalize()} successfully renamed to '{new_name}'")
-
-        except Exception as e:
-            import traceback
-            error_details = traceback.format_exc()
-            self.show_error("Error renaming item", f"{str(e)}\n\nDetails:\n{error_details}")
+        return True
 
     def action_add_password(self, item):
         """Add a new password to a folder with simplified approach
 
         Args:
-            item: Parent folder tree item
+            item: Parent folder tree node
         """
         try:
             # Get folder path
-            parent_path = get_parent_path(item)
-            folder_name = item.text(0)
-            folder_path = os.path.join(self.passpy_obj.path_store, parent_path, folder_name)
+            folder_name = item.name
+            folder_path = os.path.join(self.passpy_obj.path_store, item.path_rel)
 
             # Verify it's a folder
-            if not os.path.isdir(folder_path):
+            if not item.is_dir:
                 self.show_error("Invalid Location", "Selected item is not a folder.")
                 return
 
@@ -323,7 +365,7 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
                                f"A password named '{base_name}' already exists. Creating '{name}' instead.")
 
             # Create relative path for the password store
-            rel_path = os.path.join(parent_path, folder_name, name) if parent_path else os.path.join(folder_name, name)
+            rel_path = os.path.join(item.path_rel, name)
 
             # Create password entry
             password_data = {
@@ -339,17 +381,10 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
                 self.show_error("Error", "Failed to create password file.")
                 return
 
-            # Create tree item
-            child = PyQt5.QtWidgets.QTreeWidgetItem()
-            child.setText(0, name)
-            child.setFlags(child.flags() | PyQt5.QtCore.Qt.ItemIsEditable)
-
-            # Add to parent
-            item.addChild(child)
-
-            # Expand parent and select new item
-            item.setExpanded(True)
-            self.ui.treeWidget.setCurrentItem(child)
+            # Add to parent, expand it and select the new node
+            child = self.tree_model.add_node(item, name)
+            self.ui.treeWidget.expand(self.tree_model.index_of(item))
+            self.select_node(child)
             self.clicked_item = child
             self.clicked_key = name
 
@@ -392,16 +427,9 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
                 self.show_error("Error", "Failed to create password file.")
                 return
 
-            # Create tree item
-            child = PyQt5.QtWidgets.QTreeWidgetItem()
-            child.setText(0, name)
-            child.setFlags(child.flags() | PyQt5.QtCore.Qt.ItemIsEditable)
-
-            # Add to root
-            self.ui.treeWidget.invisibleRootItem().addChild(child)
-
-            # Select new item
-            self.ui.treeWidget.setCurrentItem(child)
+            # Add to root and select the new node
+            child = self.tree_model.add_node(self.tree_model.root, name)
+            self.select_node(child)
             self.clicked_item = child
             self.clicked_key = name
 
@@ -412,16 +440,15 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
         """Add a new subfolder with simpler implementation
 
         Args:
-            item: Parent folder tree item
+            item: Parent folder tree node
         """
         try:
             # Get folder path
-            parent_path = get_parent_path(item)
-            folder_name = item.text(0)
-            folder_path = os.path.join(self.passpy_obj.path_store, parent_path, folder_name)
+            folder_name = item.name
+            folder_path = os.path.join(self.passpy_obj.path_store, item.path_rel)
 
             # Verify it's a folder
-            if not os.path.isdir(folder_path):
+            if not item.is_dir:
                 self.show_error("Invalid Location", "Selected item is not a folder.")
                 return
 
@@ -443,17 +470,10 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
             # Create folder
             os.makedirs(new_folder_path, exist_ok=False)
 
-            # Create tree item
-            child = PyQt5.QtWidgets.QTreeWidgetItem()
-            child.setText(0, name)
-            child.setFlags(child.flags() | PyQt5.QtCore.Qt.ItemIsEditable)
-
-            # Add to parent
-            item.addChild(child)
-
-            # Expand parent and select new item
-            item.setExpanded(True)
-            self.ui.treeWidget.setCurrentItem(child)
+            # Add to parent, expand it and select the new node
+            child = self.tree_model.add_node(item, name, is_dir=True)
+            self.ui.treeWidget.expand(self.tree_model.index_of(item))
+            self.select_node(child)
 
         except Exception as e:
             self.show_error("Error adding folder", str(e))
@@ -483,16 +503,9 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
             # Create folder
             os.makedirs(folder_path, exist_ok=False)
 
-            # Create tree item
-            child = PyQt5.QtWidgets.QTreeWidgetItem()
-            child.setText(0, name)
-            child.setFlags(child.flags() | PyQt5.QtCore.Qt.ItemIsEditable)
-
-            # Add to root
-            self.ui.treeWidget.invisibleRootItem().addChild(child)
-
-            # Select new item
-            self.ui.treeWidget.setCurrentItem(child)
+            # Add to root and select the new node
+            child = self.tree_model.add_node(self.tree_model.root, name, is_dir=True)
+            self.select_node(child)
 
         except Exception as e:
             self.show_error("Error adding folder", str(e))
@@ -501,16 +514,14 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
         """Duplicate a password file with simplified implementation
 
         Args:
-            item: Password tree item to duplicate
+            item: Password tree node to duplicate
         """
         try:
-            # Get source file path
-            parent_path = get_parent_path(item)
-            file_name = item.text(0)
-            source_path = os.path.join(self.passpy_obj.path_store, parent_path, f"{file_name}.gpg")
+            parent_path = item.parent.path_rel
+            file_name = item.name
 
             # Verify it's a file
-            if not os.path.isfile(source_path):
+            if item.is_dir:
                 self.show_error("Invalid Item", "Selected item is not a password file.")
                 return
 
@@ -533,175 +544,18 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
 
                 counter += 1
 
-            # Copy the file
-            shutil.copy(source_path, target_path)
-
-            # Create tree item
-            child = PyQt5.QtWidgets.QTreeWidgetItem()
-            child.setText(0, new_name)
-            child.setFlags(child.flags() | PyQt5.QtCore.Qt.ItemIsEditable)
-
-            # Add to parent (same as original)
-            parent = item.parent()
-            if parent is None:
-                self.ui.treeWidget.invisibleRootItem().addChild(child)
-            else:
-                parent.addChild(child)
+            # Copy the entry and its attachments
+            self.passpy_obj.copy_entry(item.path_rel, os.path.join(parent_path, new_name))
 
-            # Select new item
-            self.ui.treeWidget.setCurrentItem(child)
+            # Add to the same parent as the original and select the new node
+            child = self.tree_model.add_node(item.parent, new_name)
+            self.select_node(child)
             self.clicked_item = child
             self.clicked_key = new_name
 
         except Exception as e:
             self.show_error("Error duplicating password", str(e))
 
-    def on_item_tree_changed(self, item, column):
-        """Handle rename operations when tree item text is edited
-
-        Args:
-            item: Tree item being changed
-            column: Column index (always 0 for our tree)
-        """
-        try:
-            # Skip processing if we're programmatically changing items
-            if self.in_dupplicate:
-                return
-
-            # Get current and new names
-            new_name = item.text(0)
-            if not hasattr(self, 'clicked_key') or self.clicked_key is None:
-                # If we don't have a previous key stored, nothing to rename
-                print("Warning: No clicked_key stored, can't perform rename operation")
-                return
-
-            old_name = self.clicked_key
-
-            # Don't proceed if name hasn't changed
-            if old_name == new_name:
-                return
-
-            # Get parent path
-            parent_path = get_parent_path(item)
-
-            # Log debug info
-            print(f"Debug - Tree item changed:")
-            print(f"  Old name: {old_name}")
-            print(f"  New name: {new_name}")
-            print(f"  Parent path: {parent_path}")
-
-            # Build source and target paths for both file and folder scenarios
-            source_file_path = os.path.join(self.passpy_obj.path_store, parent_path, f"{old_name}.gpg")
-            source_folder_path = os.path.join(self.passpy_obj.path_store, parent_path, old_name)
-
-            target_file_path = os.path.join(self.passpy_obj.path_store, parent_path, f"{new_name}.gpg")
-            target_folder_path = os.path.join(self.passpy_obj.path_store, parent_path, new_name)
-
-            # Additional debug info
-            print(f"  Source file path: {source_file_path} (exists: {os.path.isfile(source_file_path)})")
-            print(f"  Source folder path: {source_folder_path} (exists: {os.path.isdir(source_folder_path)})")
-            print(f"  Target file path: {target_file_path} (exists: {os.path.exists(target_file_path)})")
-            print(f"  Target folder path: {target_folder_path} (exists: {os.path.exists(target_folder_path)})")
-
-            # Check if target already exists
-            if os.path.exists(target_file_path) or os.path.exists(target_folder_path):
-                # Revert name change
-                self.in_dupplicate = True
-                item.setText(0, old_name)
-                self.in_dupplicate = False
-
-                self.show_error("Cannot Rename",
-                                f"An item named '{new_name}' already exists in this location. "
-                                f"Please choose a different name.")
-                return
-
-            try:
-                # Perform rename based on item type
-                if os.path.isfile(source_file_path):
-                    # It's a password file
-                    print(f"  Renaming file from {source_file_path} to {target_file_path}")
-                    os.rename(source_file_path, target_file_path)
-
-                    # CRITICAL: Update the clicked_key to match the new name
-                    self.clicked_key = new_name
-
-                    # If we're tracking the full path, update that too
-                    if hasattr(self, 'clicked_full_path') and self.clicked_full_path:
-                        parts = self.clicked_full_path.split(os.sep)
-                        if parts:
-                            parts[-1] = new_name
-                            self.clicked_full_path = os.sep.join(parts)
-
-                    print(f"  File renamed successfully")
-
-                elif os.path.isdir(source_folder_path):
-                    # It's a folder
-                    print(f"  Renaming folder from {source_folder_path} to {target_folder_path}")
-                    os.rename(source_folder_path, target_folder_path)
-
-                    # CRITICAL: Update the clicked_key to match the new name
-                    self.clicked_key = new_name
-
-                    # If we're tracking the full path, update that too
-                    if hasattr(self, 'clicked_full_path') and self.clicked_full_path:
-                        parts = self.clicked_full_path.split(os.sep)
-                        if parts:
-                            parts[-1] = new_name
-                            self.clicked_full_path = os.sep.join(parts)
-
-                    print(f"  Folder renamed successfully")
-
-                else:
-                    # Item doesn't exist in filesystem
-                    self.show_error("Item Not Found",
-                                    f"Could not find {old_name} in the password store.\n"
-                                    f"Checked file: {source_file_path}\n"
-                                    f"Checked folder: {source_folder_path}")
-
-                    # Revert name change
-                    self.in_dupplicate = True
-                    item.setText(0, old_name)
-                    self.in_dupplicate = False
-                    return
-
-            except PermissionError:
-                # Revert name change
-                self.in_dupplicate = True
-                item.setText(0, old_name)
-                self.in_dupplicate = False
-
-                self.show_error("Permission Denied",
-                                "You don't have permission to rename this item. "
-                                "Check if the file is in use by another program.")
-                return
-            except FileNotFoundError:
-                # Revert name change
-                self.in_dupplicate = True
-                item.setText(0, old_name)
-                self.in_dupplicate = False
-
-                self.show_error("File Not Found",
-                                f"The source item no longer exists at {source_file_path} or {source_folder_path}.")
-                return
-            except OSError as e:
-                # Revert name change
-                self.in_dupplicate = True
-                item.setText(0, old_name)
-                self.in_dupplicate = False
-
-                self.show_error("Operating System Error", f"Failed to rename: {str(e)}")
-                return
-
-        except Exception as e:
-            # Revert name change on error
-            self.in_dupplicate = True
-            item.setText(0, self.clicked_key if hasattr(self, 'clicked_key') else item.text(0))
-            self.in_dupplicate = False
-
-            import traceback
-            error_details = traceback.format_exc()
-            self.show_error("Error renaming item", f"{str(e)}\n\nDetails:\n{error_details}")
-
     def dropEvent(self, event):
         """Handle moving items via drag and drop
 
@@ -709,50 +563,36 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
             event: Drop event
         """
         try:
-            # Prevent recursive change events
-            self.in_dupplicate = True
-
             # Get drop target
-            position = event.pos()
-            target_item = self.ui.treeWidget.itemAt(position)
+            target_item = self.tree_node_at(event.pos())
 
             # Get source item
-            source_item = self.ui.treeWidget.currentItem()
+            source_item = self.current_node()
             if source_item is None:
-                self.in_dupplicate = False
                 event.ignore()
                 return
 
             # Get source and target paths
-            source_name = source_item.text(0)
-            source_parent_path = get_parent_path(source_item)
+            source_name = source_item.name
 
             # For target, use target item if it's a folder, otherwise use its parent
             if target_item is None:
                 # Dropping at root level
-                target_path = ""
-            else:
-                target_folder = os.path.join(self.passpy_obj.path_store, get_parent_path(target_item),
-                                             target_item.text(0))
-                if os.path.isdir(target_folder):
-                    # Target is a folder
-                    target_path = os.path.join(get_parent_path(target_item), target_item.text(0))
-                else:
-                    # Target is a file, move to its parent folder
-                    target_path = get_parent_path(target_item)
-                    target_item = target_item.parent()
-
-            # Build source and destination file paths
-            source_file_path = os.path.join(self.passpy_obj.path_store, source_parent_path, f"{source_name}.gpg")
-            dest_file_path = os.path.join(self.passpy_obj.path_store, target_path, f"{source_name}.gpg")
-
-            # Verify source exists and is a file
-            if not os.path.isfile(source_file_path):
+                target_item = self.tree_model.root
+            elif not target_item.is_dir:
+                # Target is a file, move to its parent folder
+                target_item = target_item.parent
+            target_path = target_item.path_rel
+
+            # Verify source is a file
+            if source_item.is_dir:
                 self.show_error("Invalid Item", "Only password files can be moved.")
-                self.in_dupplicate = False
                 event.ignore()
                 return
 
+            # Build the destination file path
+            dest_file_path = os.path.join(self.passpy_obj.path_store, target_path, f"{source_name}.gpg")
+
             # Check if destination already exists
             if os.path.exists(dest_file_path):
                 # Generate unique name
@@ -767,27 +607,14 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
 
                 # Update item name
                 source_name = new_name
-                source_item.setText(0, source_name)
-
-            # Create destination directory if needed
-            os.makedirs(os.path.dirname(dest_file_path), exist_ok=True)
 
-            # Move the file
-            shutil.move(source_file_path, dest_file_path)
+            # Move the entry and its attachments
+            self.passpy_obj.move_entry(source_item.path_rel, os.path.join(target_path, source_name))
 
-            # Remove from old parent in tree
-            old_parent = source_item.parent()
-            if old_parent is None:
-                self.ui.treeWidget.takeTopLevelItem(self.ui.treeWidget.indexOfTopLevelItem(source_item))
-            else:
-                old_parent.removeChild(source_item)
-
-            # Add to new parent in tree
-            if target_item is None:
-                self.ui.treeWidget.invisibleRootItem().addChild(source_item)
-            else:
-                target_item.addChild(source_item)
-                target_item.setExpanded(True)
+            # Move the node in the tree and show it
+            self.tree_model.move_node(source_item, target_item, source_name)
+            if target_item is not self.tree_model.root:
+                self.ui.treeWidget.expand(self.tree_model.index_of(target_item))
 
             # Accept the event
             event.accept()
@@ -795,17 +622,20 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
         except Exception as e:
             self.show_error("Error moving item", str(e))
             event.ignore()
-        finally:
-            self.in_dupplicate = False
 
     def setup_events(self):
         """Set up all event handlers with explicit error handling"""
         try:
             # Tree events
-            self.ui.treeWidget.itemChanged.connect(self.on_item_tree_changed)
-            self.ui.treeWidget.itemClicked.connect(self.on_item_tree_clicked)
-            self.ui.treeWidget.itemExpanded.connect(self.on_item_tree_extend)
-            self.ui.treeWidget.itemCollapsed.connect(self.on_item_tree_extend)
+            self.tree_model.nameEdited.connect(self.on_item_tree_changed)
+            # Selected with the mouse or the keyboard, the entry is decrypted
+            self.ui.treeWidget.selectionModel().currentChanged.connect(
+                lambda index, _: index.isValid() and self.on_item_tree_clicked(self.tree_model.node(index), 0))
+            # Clicked, its password is copied too
+            self.ui.treeWidget.clicked.connect(lambda index: self.copy_password(self.tree_model.node(index)))
+            self.entry_loader.loaded.connect(self.on_entry_loaded)
+            self.ui.treeWidget.expanded.connect(self.on_item_tree_extend)
+            self.ui.treeWidget.collapsed.connect(self.on_item_tree_extend)
             self.ui.treeWidget.setContextMenuPolicy(PyQt5.QtCore.Qt.CustomContextMenu)
             self.ui.treeWidget.customContextMenuRequested.connect(self.context_menu_tree)
 
@@ -815,6 +645,14 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
             self.ui.tableWidget.setContextMenuPolicy(PyQt5.QtCore.Qt.CustomContextMenu)
             self.ui.tableWidget.customContextMenuRequested.connect(self.context_menu_table)
 
+            # Search events
+            if hasattr(self.ui, "searchEdit"):
+                self.ui.searchResults.hide()
+                self.ui.searchEdit.textChanged.connect(self.on_search_changed)
+                self.ui.searchEdit.returnPressed.connect(self.on_search_return)
+                self.ui.searchResults.itemClicked.connect(self.on_search_result_clicked)
+                self.ui.searchResults.itemActivated.connect(self.on_search_result_clicked)
+
             # Table settings events
             self.ui.table_settings.setContextMenuPolicy(PyQt5.QtCore.Qt.CustomContextMenu)
             self.ui.table_settings.customContextMenuRequested.connect(self.context_menu_table_settings)
@@ -873,19 +711,71 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
         else:
             self.show_error("Error", message)
 
-    def start_worker(self, function, *args, **kwargs):
-        """Start a background worker thread for long operations
+    def create_worker(self, function, *args, job=None, **kwargs):
+        """Build a background worker thread, started once its signals are connected
 
         Args:
             function: The function to run
             *args: Function arguments
+            job: jobs.Job passed to the function, reporting its progress
             **kwargs: Function keyword arguments
         """
-        worker = WorkerThread(function, *args, **kwargs)
+        worker = WorkerThread(function, *args, job=job, **kwargs)
         worker.result_signal.connect(self.handle_worker_result)
         self.worker_threads.append(worker)
         worker.finished.connect(lambda: self.worker_threads.remove(worker) if worker in self.worker_threads else None)
+        return worker
+
+    def start_worker(self, function, *args, job=None, on_finished=None, **kwargs):
+        """Start a background worker thread for long operations
+
+        Args:
+            function: The function to run
+            *args: Function arguments
+            job: jobs.Job passed to the function, reporting its progress
+            on_finished: Called once the worker is done
+            **kwargs: Function keyword arguments
+        """
+        worker = self.create_worker(function, *args, job=job, **kwargs)
+        if on_finished is not None:
+            worker.finished.connect(on_finished)
+        worker.start()
+        return worker
+
+    def start_job(self, title, function, *args, on_finished=None, **kwargs):
+        """Start a long operation with a progress dialog and a Cancel button
+
+        Args:
+            title: Description of the operation
+            function: The function to run, taking a job keyword argument
+            *args: Function arguments
+            on_finished: Called once the operation is done
+            **kwargs: Function keyword arguments
+        """
+        job = jobs.Job()
+        dialog = PyQt5.QtWidgets.QProgressDialog(title, "Cancel", 0, PROGRESS_STEPS, self)
+        dialog.setWindowTitle(title)
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.setMinimumDuration(500)
+        dialog.setAutoReset(False)
+        dialog.canceled.connect(job.cancel)
+        dialog.setValue(0)  # Shows the dialog once the operation lasts
+
+        def on_progress(progress):
+            if progress.get("success") is not None or dialog.wasCanceled():
+                return
+            if progress["bytes_total"]:
+                dialog.setValue(min(PROGRESS_STEPS, PROGRESS_STEPS * progress["bytes_done"] // progress["bytes_total"]))
+            dialog.setLabelText(f"{title}\n{jobs.format_progress(progress)}")
+
+        # Connected before the thread starts, so that no signal is missed
+        worker = self.create_worker(function, *args, job=job, **kwargs)
+        worker.progress_signal.connect(on_progress)
+        worker.finished.connect(dialog.reset)
+        if on_finished is not None:
+            worker.finished.connect(on_finished)
         worker.start()
+        return worker
 
     def load_config(self):
         """Load configuration into the settings table"""
@@ -921,6 +811,9 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
             # Clear existing table
             self.ui.gpg_keys_table.setRowCount(0)
 
+            # Entries are decrypted with the keys as they are now
+            self.entry_loader.forget()
+
             # Get keys from PassStore
             keys = self.passpy_obj.list_keys()
             if not keys:
@@ -989,7 +882,7 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
 
             # Confirm operation
             self.confirm(
-                lambda: self.start_worker(self.passpy_obj.encrypt_file, path_abs, replace=True),
+                lambda: self.start_job("Encrypting file", self.passpy_obj.encrypt_file, path_abs, replace=True),
                 f"Encrypt File {os.path.basename(path_abs)} at {os.path.dirname(path_abs)}"
             )
         except Exception as e:
@@ -1017,7 +910,8 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
 
             # Confirm operation
             self.confirm(
-                lambda: self.start_worker(self.passpy_obj.encrypt_directory, path_abs, replace=True, zip=use_zip),
+                lambda: self.start_job(
+                    "Encrypting directory", self.passpy_obj.encrypt_directory, path_abs, replace=True, zip=use_zip),
                 f"Encrypt Directory {os.path.basename(path_abs)} in {os.path.dirname(path_abs)}"
             )
         except Exception as e:
@@ -1035,9 +929,11 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
             if not path_abs:
                 return  # User cancelled dialog
 
-            # Confirm operation
+            # Confirm operation, the passphrase is asked here rather than in the worker
             self.confirm(
-                lambda: self.start_worker(self.passpy_obj.decrypt_file, path_abs, replace=True),
+                lambda: self.start_job(
+                    "Decrypting file", self.passpy_obj.decrypt_file, path_abs, replace=True,
+                    passphrase=self.passpy_obj.ask_passphrase()),
                 f"Decrypt File {os.path.basename(path_abs)}"
             )
         except Exception as e:
@@ -1063,9 +959,11 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
 
             use_zip = (zip_option == PyQt5.QtWidgets.QMessageBox.Yes)
 
-            # Confirm operation
+            # Confirm operation, the passphrase is asked here rather than in the worker
             self.confirm(
-                lambda: self.start_worker(self.passpy_obj.decrypt_directory, path_abs, replace=True, zip=use_zip),
+                lambda: self.start_job(
+                    "Decrypting directory", self.passpy_obj.decrypt_directory, path_abs, replace=True, zip=use_zip,
+                    passphrase=self.passpy_obj.ask_passphrase()),
                 f"Decrypt Directory {os.path.basename(path_abs)}"
             )
         except Exception as e:
@@ -1090,10 +988,10 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
     def event_tree(self):
         """Setup tree event handlers"""
         try:
-            self.ui.treeWidget.itemChanged.connect(self.on_item_tree_changed)
-            # self.ui.treeWidget.itemClicked.connect(self.on_item_tree_clicked)
-            self.ui.treeWidget.itemExpanded.connect(self.on_item_tree_extend)
-            self.ui.treeWidget.itemCollapsed.connect(self.on_item_tree_extend)
+            self.tree_model.nameEdited.connect(self.on_item_tree_changed)
+            # self.ui.treeWidget.clicked.connect(self.on_item_tree_clicked)
+            self.ui.treeWidget.expanded.connect(self.on_item_tree_extend)
+            self.ui.treeWidget.collapsed.connect(self.on_item_tree_extend)
             self.ui.treeWidget.setContextMenuPolicy(PyQt5.QtCore.Qt.CustomContextMenu)
             self.ui.treeWidget.customContextMenuRequested.connect(self.context_menu_tree)
         except Exception as e:
@@ -1152,133 +1050,39 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
         except Exception as e:
             self.show_error("Error editing settings", str(e))
 
-    @PyQt5.QtCore.pyqtSlot(PyQt5.QtWidgets.QTreeWidgetItem, int)
-    def on_item_tree_changed(self, item, _):
-        """Tree item changed event handler with full path support"""
-        try:
-            # Skip if in duplicate mode
-            if self.in_dupplicate:
-                return
-
-            # Get the new name from the item
-            new_name = item.text(0)
-
-            # If no clicked item or key, nothing to do
-            if self.clicked_item is None or self.clicked_key is None:
-                print("Warning: No clicked item or key when handling tree item change")
-                return
-
-            # Don't do anything if the name hasn't changed
-            if new_name == self.clicked_key:
-                return
-
-            # Use the stored full path instead of just the item name
-            if not hasattr(self, 'clicked_full_path') or not self.clicked_full_path:
-                print("Warning: No full path stored for this item")
-                self.clicked_full_path = get_full_tree_path(item)
-
-            # Get the parent path by removing the last component
-            parent_path = os.path.dirname(self.clicked_full_path)
-
-            # Build source and target paths using the parent path
-            if parent_path:
-                source_file_path = os.path.join(self.passpy_obj.path_store, parent_path, f"{self.clicked_key}.gpg")
-                source_dir_path = os.path.join(self.passpy_obj.path_store, parent_path, self.clicked_key)
-                target_file_path = os.path.join(self.passpy_obj.path_store, parent_path, f"{new_name}.gpg")
-                target_dir_path = os.path.join(self.passpy_obj.path_store, parent_path, new_name)
-            else:
-                # Root level
-                source_file_path = os.path.join(self.passpy_obj.path_store, f"{self.clicked_key}.gpg")
-                source_dir_path = os.path.join(self.passpy_obj.path_store, self.clicked_key)
-                target_file_path = os.path.join(self.passpy_obj.path_store, f"{new_name}.gpg")
-                target_dir_path = os.path.join(self.passpy_obj.path_store, new_name)
-
-            # Print debug information
-            print(f"Rename operation:")
-            print(f"  Clicked key: {self.clicked_key}")
-            print(f"  Full path: {self.clicked_full_path}")
-            print(f"  Parent path: {parent_path}")
-            print(f"  New name: {new_name}")
-            print(f"  Source file path: {source_file_path} (exists: {os.path.isfile(source_file_path)})")
-            print(f"  Source dir path: {source_dir_path} (exists: {os.path.isdir(source_dir_path)})")
-            print(f"  Target file path: {target_file_path} (exists: {os.path.exists(target_file_path)})")
-            print(f"  Target dir path: {target_dir_path} (exists: {os.path.exists(target_dir_path)})")
-
-            renamed = False
-
-            # Check if destination already exists
-            if os.path.exists(target_file_path) or os.path.exists(target_dir_path):
-                # Revert the rename in the UI
-                self.in_dupplicate = True
-                item.setText(0, self.clicked_key)
-                self.in_dupplicate = False
-
-                # Show error
-                item_type = "file" if os.path.isfile(source_file_path) else "folder"
-                self.show_error("Rename Error",
-                                f"A {item_type} with the name '{new_name}' already exists.")
-                return
-
-            # First check if we're dealing with a file
-            if os.path.isfile(source_file_path):
-                # It's a file
-                os.rename(source_file_path, target_file_path)
-                # Update the stored path
-                if parent_path:
-                    self.clicked_full_path = os.path.join(parent_path, new_name)
-                else:
-                    self.clicked_full_path = new_name
-                self.clicked_key = new_name
-                renamed = True
-
-            # Then check if it's a directory
-            elif os.path.isdir(source_dir_path):
-                # It's a directory
-                os.rename(source_dir_path, target_dir_path)
-                # Update the stored path
-                if parent_path:
-                    self.clicked_full_path = os.path.join(parent_path, new_name)
-                else:
-                    self.clicked_full_path = new_name
-                self.clicked_key = new_name
-                renamed = True
-
-            # If we got here and nothing was renamed, handle the error
-            if not renamed:
-                print(f"WARNING: Could not find item '{self.clicked_key}' at path '{self.clicked_full_path}' to rename")
-
-                # Revert the item text to the original clicked key
-                self.in_dupplicate = True  # Prevent triggering this handler again
-                item.setText(0, self.clicked_key)
-                self.in_dupplicate = False
+    def on_item_tree_changed(self, item, new_name):
+        """Rename a password or folder whose name was edited in the tree
 
+        Args:
+            item: Tree node being renamed
+            new_name: Name typed in the tree
+        """
+        try:
+            self.rename_node(item, new_name)
         except Exception as e:
             print(f"Error in on_item_tree_changed: {str(e)}")
 
-            # Revert the item text
-            self.in_dupplicate = True
-            item.setText(0, self.clicked_key)
-            self.in_dupplicate = False
-
             # Show error dialog
             self.show_error("Rename Error", str(e))
 
     def context_menu_tree(self, position):
         """Tree context menu handler"""
         try:
-            item = self.ui.treeWidget.itemAt(position)
+            item = self.tree_node_at(position)
             if item is None:
                 return self.add_context([
                     ["Add folder", self.action_add_folder_top],
                     ["Add password", self.action_add_password_top],
+                    ["Import passwords", self.action_import_passwords],
                     ["Change Path Store", self.change_path_store],
                 ], self.treeWidget, position)
 
-            if os.path.isfile(self.get_abs_path(item)):
+            if not item.is_dir:
                 return self.add_context([
                     ["Rename password", self.action_rename_item],
                     ["Delete password", self.action_remove],
                     ["Copy infos", self.action_copy_clipboard],
+                    ["Attach file", self.action_attach_file],
                     ["Dupplicate file", self.action_dupplicate],
                     ["Ignore file", self.action_ignore_file],
                 ], item, position)
@@ -1293,11 +1097,37 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
         except Exception as e:
             self.show_error("Error showing context menu", str(e))
 
+    def action_import_passwords(self, _):
+        """Import a CSV or JSON export of another password manager"""
+        try:
+            path_abs = filedialog.askopenfilename(
+                title="Select a password manager export",
+                filetypes=[("CSV or JSON export", "*.csv *.json")]
+            )
+
+            if not path_abs:
+                return  # User cancelled dialog
+
+            conflict, ok = PyQt5.QtWidgets.QInputDialog.getItem(
+                self,
+                "Import passwords",
+                "Existing passwords:",
+                ["skip", "rename", "overwrite"],
+                0,
+                False
+            )
+            if not ok:
+                return  # User cancelled dialog
+
+            self.start_worker(self.passpy_obj.import_file, path_abs, conflict=conflict, on_finished=self.load_tree)
+        except Exception as e:
+            self.show_error("Error importing passwords", str(e))
+
     def action_ignore_folder(self, item):
         """Ignore folder action handler"""
         try:
             # Safely get folder path
-            folder_path = os.path.join(get_rel_path(item), item.text(0))
+            folder_path = item.path_rel
 
             # Ensure config paths exist
             if "settings" not in self.passpy_obj.config:
@@ -1310,11 +1140,7 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
             utils.write_config(self.passpy_obj.config)
 
             # Remove from tree
-            parent = item.parent()
-            if parent is not None:
-                parent.removeChild(item)
-            else:
-                self.ui.treeWidget.takeTopLevelItem(self.ui.treeWidget.indexOfTopLevelItem(item))
+            self.tree_model.remove_node(item)
 
             # Refresh config display
             self.load_config()
@@ -1324,14 +1150,10 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
     def action_ignore_file(self, item):
         """Ignore file action handler"""
         try:
-            self.ignore_file(get_rel_path(item, file=True))
+            self.ignore_file(item.path_rel + ".gpg")
 
             # Remove from tree
-            parent = item.parent()
-            if parent is not None:
-                parent.removeChild(item)
-            else:
-                self.ui.treeWidget.takeTopLevelItem(self.ui.treeWidget.indexOfTopLevelItem(item))
+            self.tree_model.remove_node(item)
         except Exception as e:
             self.show_error("Error ignoring file", str(e))
 
@@ -1429,8 +1251,7 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
                 return
 
             # Load default config
-            default_config = yaml.safe_load(Path(os.path.join(
-                os.path.dirname(__file__), "data", "PassUI.yml")).read_text())
+            default_config = config.read_yaml(utils.get_app_config_path())
 
             # Check if setting exists in default config
             if section in default_config and key in default_config[section]:
@@ -1547,6 +1368,15 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
                 ["Remove", self.action_remove_field],
                 ["Add", self.action_add_field],
             ]
+            field_item = self.ui.tableWidget.item(index.row(), 0)
+            field_name = field_item.text() if field_item is not None else ""
+            if field_name.startswith(attachments.FIELD_PREFIX):
+                name = field_name[len(attachments.FIELD_PREFIX):]
+                actions_bind = [
+                    ["Save attachment", lambda _: self.action_save_attachment(name)],
+                    ["Copy attachment", lambda _: self.action_copy_attachment(name)],
+                    ["Remove attachment", lambda _: self.action_remove_attachment(name)],
+                ]
             for action, func in actions_bind:
                 actions.append(menu.addAction(action))
 
@@ -1741,85 +1571,53 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
     def remove_fields(self, rows):
         """Remove multiple fields from password"""
         try:
-            if self.clicked_item is None:
+            if self.clicked_entry is None:
                 return
 
-            item = self.clicked_item
-            path = os.path.join(get_rel_path(item), item.text(0))
-            infos = self.passpy_obj.read_key(path)
-
             for row in rows:
-                field_name = self.ui.tableWidget.item(row, 0).text()
-                if field_name in infos:
-                    del infos[field_name]
                 self.ui.tableWidget.removeRow(row)
-
-            self.passpy_obj.write_key(path, infos)
+            self.save_table()
         except Exception as e:
             self.show_error("Error removing fields", str(e))
 
     def remove_field(self, row):
         """Remove a single field from password"""
         try:
-            if self.clicked_item is None:
+            if self.clicked_entry is None:
                 return
 
-            item = self.clicked_item
-            path = os.path.join(get_rel_path(item), item.text(0))
-            infos = self.passpy_obj.read_key(path)
-
-            field_name = self.ui.tableWidget.item(row, 0).text()
-            if field_name in infos:
-                del infos[field_name]
-
             self.ui.tableWidget.removeRow(row)
-            self.passpy_obj.write_key(path, infos)
+            self.save_table()
         except Exception as e:
             self.show_error("Error removing field", str(e))
 
     def action_add_field(self, index):
-        """Add a new field to password"""
+        """Add a new field to password, below the clicked row"""
         try:
+            if self.clicked_entry is None:
+                return
             self.edit_table = True
             row = index.row()
 
-            if self.clicked_item is None:
-                self.edit_table = False
-                return
-
-            item = self.clicked_item
-            path = os.path.join(get_rel_path(item), item.text(0))
-            infos = self.passpy_obj.read_key(path)
-
-            # Create a new dictionary with fields in the right order
-            new_infos = {}
-
             # Find a unique field name
+            field_names = {
+                self.ui.tableWidget.item(line, 0).text()
+                for line in range(self.ui.tableWidget.rowCount())
+                if self.ui.tableWidget.item(line, 0) is not None}
             field_name = "field"
             i = 0
-            while field_name in infos:
+            while field_name in field_names:
                 i += 1
                 field_name = f"field_{i}"
 
-            # Insert the new field at the specified position
-            field_names = list(infos.keys())
-            for i, key in enumerate(field_names):
-                if i == row:
-                    new_infos[field_name] = ""
-                new_infos[key] = infos[key]
-
-            # If adding at the end, ensure new field is added
-            if row >= len(field_names):
-                new_infos[field_name] = ""
-
             # Update the UI
             self.ui.tableWidget.insertRow(row + 1)
             self.ui.tableWidget.setItem(row + 1, 0, PyQt5.QtWidgets.QTableWidgetItem(field_name))
             self.ui.tableWidget.setItem(row + 1, 1, PyQt5.QtWidgets.QTableWidgetItem(""))
+            self.edit_table = False
 
             # Save changes
-            self.passpy_obj.write_key(path, new_infos)
-            self.edit_table = False
+            self.save_table()
         except Exception as e:
             self.edit_table = False
             self.show_error("Error adding field", str(e))
@@ -1850,8 +1648,8 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
     def action_remove_folder(self, item):
         """Remove a folder and its contents"""
         try:
-            path = get_rel_path(item)
-            abs_path = os.path.join(self.passpy_obj.path_store, path, item.text(0))
+            path = item.parent.path_rel
+            abs_path = os.path.join(self.passpy_obj.path_store, item.path_rel)
 
             # Don't allow removing the store root
             if not path and abs_path == self.passpy_obj.path_store:
@@ -1860,7 +1658,7 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
 
             self.confirm(
                 lambda: self.remove_folder(item),
-                f"Delete folder '{item.text(0)}' in '{path if path else 'root'}' and all its contents?"
+                f"Delete folder '{item.name}' in '{path if path else 'root'}' and all its contents?"
             )
         except Exception as e:
             self.show_error("Error removing folder", str(e))
@@ -1868,16 +1666,10 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
     def remove_folder(self, item):
         """Remove folder implementation"""
         try:
-            path_to_remove = self.get_abs_path(item, folder=True)
-            shutil.rmtree(path_to_remove)
+            self.passpy_obj.remove_folder(item.path_rel)
 
             # Remove from tree
-            parent = item.parent()
-            if parent is None:
-                index = self.ui.treeWidget.indexOfTopLevelItem(item)
-                self.ui.treeWidget.takeTopLevelItem(index)
-            else:
-                parent.removeChild(item)
+            self.tree_model.remove_node(item)
         except Exception as e:
             self.show_error("Error removing folder", str(e))
 
@@ -1886,7 +1678,7 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
         try:
             self.confirm(
                 lambda: self.remove_password(item),
-                f"Delete password '{item.text(0)}' in '{get_rel_path(item)}'"
+                f"Delete password '{item.name}' in '{item.parent.path_rel}'"
             )
         except Exception as e:
             self.show_error("Error removing password", str(e))
@@ -1894,12 +1686,13 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
     def action_copy_clipboard(self, item):
         """Copy password information to clipboard"""
         try:
-            info = self.passpy_obj.read_key(os.path.join(get_rel_path(item), item.text(0)))
+            info = self.passpy_obj.read_key(item.path_rel)
 
             # Format as plain text
             formatted_info = "\n".join([f"{key}: {value}" for key, value in info.items()])
 
             # Copy to clipboard
+            import pyperclip
             pyperclip.copy(formatted_info)
 
             # Notify user
@@ -1909,6 +1702,72 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
         except Exception as e:
             self.show_error("Error copying to clipboard", str(e))
 
+    def action_attach_file(self, item):
+        """Attach a file to a password, encrypted apart from it"""
+        try:
+            path_abs = filedialog.askopenfilename(title="Select file to attach")
+            if not path_abs:
+                return  # User cancelled dialog
+
+            # Asked here, the worker thread cannot show the passphrase dialog
+            passphrase = self.passpy_obj.ask_passphrase()
+            self.start_job(
+                "Attaching file", self.passpy_obj.attach, item.path_rel, path_abs, passphrase=passphrase,
+                on_finished=lambda: self.on_item_tree_clicked(item, 0))
+        except Exception as e:
+            self.show_error("Error attaching file", str(e))
+
+    def clicked_rel_path(self):
+        return self.clicked_item.path_rel
+
+    def action_save_attachment(self, name):
+        """Decrypt an attachment of the clicked password to a file"""
+        try:
+            if self.clicked_item is None:
+                return
+            path_abs = filedialog.asksaveasfilename(title="Save attachment", initialfile=name)
+            if not path_abs:
+                return  # User cancelled dialog
+
+            # Asked here, the worker thread cannot show the passphrase dialog
+            passphrase = self.passpy_obj.ask_passphrase()
+            self.start_job(
+                "Saving attachment", self.passpy_obj.save_attachment, self.clicked_rel_path(), name, path_abs,
+                passphrase=passphrase)
+        except Exception as e:
+            self.show_error("Error saving attachment", str(e))
+
+    def action_copy_attachment(self, name):
+        """Copy a text attachment of the clicked password, e.g. a certificate"""
+        try:
+            if self.clicked_item is None:
+                return
+            data = self.passpy_obj.read_attachment(self.clicked_rel_path(), name)
+            try:
+                text = data.decode("utf-8")
+            except UnicodeDecodeError:
+                self.show_error("Error copying attachment", f"{name} is not text, save it instead")
+                return
+
+            import pyperclip
+            pyperclip.copy(text)
+            self.show_info("Copied", f"Attachment '{name}' copied to clipboard")
+        except Exception as e:
+            self.show_error("Error copying attachment", str(e))
+
+    def action_remove_attachment(self, name):
+        """Remove an attachment of the clicked password"""
+        try:
+            if self.clicked_item is None:
+                return
+            item = self.clicked_item
+            self.confirm(
+                lambda: self.passpy_obj.detach(self.clicked_rel_path(), name) and self.on_item_tree_clicked(item, 0),
+                f"Delete attachment '{name}' ?"
+            )
+        except Exception as e:
+            self.show_error("Error removing attachment", str(e))
+
     def confirm(self, func, txt, execute=True):
         """Show a confirmation dialog
 
@@ -1937,15 +1796,10 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
     def remove_password(self, item):
         """Remove a password file"""
         try:
-            path_to_remove = self.get_abs_path(item)
-            os.remove(path_to_remove)
+            self.passpy_obj.remove_entry(item.path_rel)
 
             # Remove from tree
-            parent = item.parent()
-            if parent is not None:
-                parent.removeChild(item)
-            else:
-                self.ui.treeWidget.takeTopLevelItem(self.ui.treeWidget.indexOfTopLevelItem(item))
+            self.tree_model.remove_node(item)
 
             # Clear password details table
             self.ui.tableWidget.setRowCount(0)
@@ -1956,7 +1810,7 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
         """Get absolute path for an item with improved tracking
 
         Args:
-            item: Tree widget item
+            item: Tree node
             folder: Whether the item is a folder
 
         Returns:
@@ -1967,16 +1821,7 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
                 return self.passpy_obj.path_store
             return None
 
-        # Build the full path by traversing up the tree
-        parts = [item.text(0)]
-        parent = item.parent()
-
-        while parent is not None:
-            parts.insert(0, parent.text(0))
-            parent = parent.parent()
-
-        # Construct the path
-        rel_path = os.path.join(*parts) if parts else ""
+        rel_path = item.path_rel
 
         if folder:
             return os.path.join(self.passpy_obj.path_store, rel_path)
@@ -1995,12 +1840,13 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
 
             if col == 1:  # Value column
                 # Copy to clipboard
+                import pyperclip
                 pyperclip.copy(value)
                 self.show_info("Copied", f"Value of '{field_name}' copied to clipboard")
         except Exception as e:
             self.show_error("Error handling table click", str(e))
 
-    def on_item_tree_extend(self):
+    def on_item_tree_extend(self, _=None):
         """Handle tree item expand/collapse"""
         try:
             self.ui.tableWidget.setRowCount(0)
@@ -2009,19 +1855,19 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
             self.show_error("Error handling tree expansion", str(e))
 
     def resize_tree(self):
-        """Resize tree columns to fit content"""
+        """Resize the tree column to fit the rows shown"""
         try:
-            self.ui.treeWidget.invisibleRootItem().setExpanded(True)
             self.ui.treeWidget.resizeColumnToContents(0)
-            self.ui.treeWidget.invisibleRootItem().setExpanded(False)
         except Exception as e:
             print(f"Error resizing tree: {e}")  # Don't show error dialog to avoid loops
 
     def load_tree(self):
-        """Load the password store into the tree view"""
-        try:
-            self.ui.treeWidget.clear()
+        """Load the password store into the tree view
 
+        Only the top level gets nodes, the directories are filled in as
+        they are expanded.
+        """
+        try:
             # Get the password store structure
             rel_paths = self.passpy_obj.rel_paths_gpg
 
@@ -2031,114 +1877,168 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
                                 f"Expected dictionary but got {type(rel_paths).__name__}")
                 return
 
-            # Fill the tree
-            self.fill_item(
-                self.ui.treeWidget.invisibleRootItem(),
-                rel_paths
-            )
-
-            # Reset clicked item and key when loading the tree
+            # Reset clicked item and key when loading the tree, its nodes are replaced
             self.clicked_item = None
             self.clicked_key = None
+            self.clicked_entry = None
 
-            # Debug the entire tree structure
-            self.debug_tree_structure()
+            # Fill the tree
+            self.tree_model.load(rel_paths)
+            self.resize_tree()
 
         except Exception as e:
             import traceback
             error_message = f"{str(e)}\n\nStack trace:\n{traceback.format_exc()}"
             self.show_error("Error loading password store", error_message)
 
-    def debug_tree_structure(self):
-        """Print the entire tree structure for debugging"""
-        try:
-            print("\n--- TREE STRUCTURE DEBUG ---")
+    def tree_node_at(self, position):
+        """Tree node at a position of the tree, None over empty space"""
+        index = self.ui.treeWidget.indexAt(position)
+        return self.tree_model.node(index) if index.isValid() else None
+
+    def current_node(self):
+        """Current tree node, None if there is none"""
+        index = self.ui.treeWidget.currentIndex()
+        return self.tree_model.node(index) if index.isValid() else None
 
-            def _print_item(item, indent=0):
-                # Print current item
-                name = item.text(0)
-                print(f"{'  ' * indent}{name}")
+    def select_node(self, item):
+        """Make a tree node current and scroll to it"""
+        index = self.tree_model.index_of(item)
+        self.ui.treeWidget.setCurrentIndex(index)
+        self.ui.treeWidget.scrollTo(index)
 
-                # Print all children
-                for i in range(item.childCount()):
-                    _print_item(item.child(i), indent + 1)
+    def on_item_tree_clicked(self, item, _):
+        """Handle tree node click or selection, the entry is decrypted in the background"""
+        try:
+            key = item.name
+            self.clicked_item = item
+            self.clicked_key = key
+            # Not editable until the entry is decrypted
+            self.clicked_entry = None
+            if item is not self.copy_pending:
+                self.copy_pending = None
+            print(f"Clicked on: {item.path_rel}")
+
+            # Check if this is a password file
+            if item.is_dir:
+                self.entry_loader.cancel()
+                if not self.ui.tableWidget.isEnabled():
+                    # Drop the placeholder of the cancelled entry
+                    self.ui.tableWidget.setRowCount(0)
+                    self.ui.tableWidget.setEnabled(True)
+                return
 
-            # Print all top-level items
-            root = self.ui.treeWidget.invisibleRootItem()
-            for i in range(root.childCount()):
-                _print_item(root.child(i))
+            # Only the passphrase dialog, if any, runs here
+            passphrase = self.passpy_obj.ask_passphrase()
+            self.entry_loader.load(item, passphrase)
 
-            print("--- END TREE STRUCTURE DEBUG ---\n")
+            # Shown until the entry is decrypted, and not editable
+            self.fill_table(PLACEHOLDER)
+            self.ui.tableWidget.setEnabled(False)
         except Exception as e:
-            print(f"Error in debug_tree_structure: {e}")
+            self.show_error("Error handling tree click", str(e))
 
-    def fill_item(self, item, value):
-        """Recursively fill tree with items
+    def on_entry_loaded(self, request, item, entry):
+        """Show an entry decrypted in the background, if it is still the selected one
 
         Args:
-            item: Parent tree item
-            value: Dictionary of items to add
+            request: Id of the request returned by EntryLoader.load
+            item: Tree node of the entry
+            entry: Decrypted entry.Entry, or the exception raised
         """
-        try:
-            # Ensure we're working with a dictionary
-            if not isinstance(value, dict):
-                print(f"Warning: Expected dictionary in fill_item but got {type(value).__name__}")
+        if not self.entry_loader.is_current(request) or item is not self.clicked_item:
+            # Superseded by a later selection
+            return
+        try:
+            self.ui.tableWidget.setEnabled(True)
+            if isinstance(entry, Exception):
+                # Shown but not editable, saving it would overwrite the entry
+                self.fill_table([("PASSWORD", ""), ("error", str(entry))])
                 return
 
-            # Sort items by name
-            for key in sorted(value.keys()):
-                val = value[key]
+            # Fill the table with password details
+            self.clicked_entry = entry
+            self.fill_table(entry.to_items())
 
-                child = PyQt5.QtWidgets.QTreeWidgetItem()
-                child.setText(0, key)
-                item.addChild(child)
+            if self.copy_pending is item:
+                self.copy_password(item)
+        except Exception as e:
+            self.show_error("Error loading password", str(e))
 
-                if isinstance(val, dict):
-                    self.fill_item(child, val)
-                elif isinstance(val, str) and val:
-                    # If it's a string value (like a path), don't try to iterate it
-                    pass
+    def copy_password(self, item):
+        """Copy the password of an entry clicked in the tree, once it is decrypted
 
-                child.setFlags(child.flags() | PyQt5.QtCore.Qt.ItemIsEditable)
+        Only explicit clicks copy, not selecting entries with the keyboard.
 
-            self.resize_tree()
+        Args:
+            item: Tree node of the entry
+        """
+        try:
+            if item.is_dir:
+                return
+            if item is not self.clicked_item or self.clicked_entry is None:
+                # Copied by on_entry_loaded
+                self.copy_pending = item
+                return
+            self.copy_pending = None
+            import pyperclip
+            pyperclip.copy(self.clicked_entry.password)
         except Exception as e:
-            print(f"Error filling tree item: {e}")  # Don't show error dialog to avoid loops
+            self.show_error("Error copying password", str(e))
 
-    # @PyQt5.QtCore.pyqtSlot(PyQt5.QtWidgets.QTreeWidgetItem, int)
-    def on_item_tree_clicked(self, item, _):
-        """Handle tree item click with full path tracking"""
+    def on_search_changed(self, text):
+        """Show the best fuzzy matches of the search box below the tree
+
+        Args:
+            text: Current search query
+        """
         try:
-            key = item.text(0)
-            self.clicked_item = item
-            self.clicked_key = key
+            if not text:
+                self.ui.searchResults.clear()
+                self.ui.searchResults.hide()
+                return
 
-            # Store the full path for this item
-            self.clicked_full_path = get_full_tree_path(item)
-            print(f"Clicked on: {key}")
-            print(f"Full path: {self.clicked_full_path}")
+            if self.ui.searchResults.isHidden():
+                # New search, catch up with renames and moves done in the tree
+                self.passpy_obj.sync_search()
 
-            # Check if this is a password file
-            abs_path = self.get_abs_path(item)
-            if os.path.isfile(abs_path):
-                print(f"Loading password file: {abs_path}")
+            self.ui.searchResults.clear()
+            self.ui.searchResults.addItems(self.passpy_obj.find(text, limit=50))
+            self.ui.searchResults.show()
+        except Exception as e:
+            self.show_error("Error searching passwords", str(e))
 
-                # Try to load the password
-                try:
-                    # Use the full path for reading the key
-                    rel_path = os.path.join(get_rel_path(item), item.text(0))
-                    infos = self.passpy_obj.read_key(rel_path)
+    def on_search_return(self):
+        """Open the best search result"""
+        if self.ui.searchResults.count():
+            self.on_search_result_clicked(self.ui.searchResults.item(0))
 
-                    # Copy password to clipboard if available
-                    if "PASSWORD" in infos:
-                        pyperclip.copy(infos["PASSWORD"])
+    def on_search_result_clicked(self, result):
+        """Select the tree item of a search result and load it
 
-                    # Fill the table with password details
-                    self.fill_table(infos)
-                except Exception as e:
-                    self.show_error("Error loading password", str(e))
+        Args:
+            result: Clicked search result list item
+        """
+        try:
+            item = self.find_tree_item(result.text())
+            if item is None:
+                self.show_error("Item Not Found", f"Cannot find '{result.text()}' in the tree.")
+                return
+            self.select_node(item)
+            self.on_item_tree_clicked(item, 0)
         except Exception as e:
-            self.show_error("Error handling tree click", str(e))
+            self.show_error("Error opening search result", str(e))
+
+    def find_tree_item(self, rel_path):
+        """Find the tree node of a relative path, fetching the folders on the way
+
+        Args:
+            rel_path: Relative path of the entry, without .gpg
+
+        Returns:
+            treemodel.Node: The node, None if not in the tree
+        """
+        return self.tree_model.find(rel_path)
 
     def on_item_table_changed(self):
         """Handle password details table changes"""
@@ -2146,58 +2046,34 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
             # Skip if we're programmatically changing the table
             if self.edit_table:
                 return
-
-            # Make sure we have a password selected
-            if self.clicked_item is None:
-                return
-
-            # Build a new password dictionary
-            new_data = {}
-            for row in range(self.ui.tableWidget.rowCount()):
-                key_item = self.ui.tableWidget.item(row, 0)
-                value_item = self.ui.tableWidget.item(row, 1)
-
-                if key_item is None or value_item is None:
-                    continue
-
-                key = key_item.text()
-                value = value_item.text()
-
-                # Handle duplicate keys by adding an index
-                i = 0
-                original_key = key
-                while key in new_data:
-                    i += 1
-                    if i == 1:
-                        key = f"{original_key}_1"
-                    else:
-                        # Extract base name if already indexed
-                        parts = original_key.split('_')
-                        if parts[-1].isdigit():
-                            base = '_'.join(parts[:-1])
-                        else:
-                            base = original_key
-                        key = f"{base}_{i}"
-
-                # Update UI if key was changed
-                if i > 0:
-                    self.ui.tableWidget.setItem(row, 0, PyQt5.QtWidgets.QTableWidgetItem(key))
-
-                # Add to dictionary
-                new_data[key] = value
-
-            # Save changes
-            item = self.clicked_item
-            path = os.path.join(get_rel_path(item), item.text(0))
-            self.passpy_obj.write_key(path, new_data)
+            self.save_table()
         except Exception as e:
             self.show_error("Error saving password changes", str(e))
 
-    def fill_table(self, infos):
+    def save_table(self):
+        """Write the fields of the details table back to the clicked entry
+
+        The entry is changed in place, so that duplicate fields, lines that
+        are not fields and unchanged lines are written back as they were.
+        """
+        entry = self.clicked_entry
+        if self.clicked_item is None or entry is None:
+            return
+        items = []
+        for row in range(self.ui.tableWidget.rowCount()):
+            key_item = self.ui.tableWidget.item(row, 0)
+            value_item = self.ui.tableWidget.item(row, 1)
+            if key_item is None or value_item is None:
+                continue
+            items.append((key_item.text(), value_item.text()))
+        entry.update_items(items)
+        self.passpy_obj.write_key(self.clicked_item.path_rel, entry)
+
+    def fill_table(self, rows):
         """Fill table with password details
 
         Args:
-            infos: Dictionary of password details
+            rows: Fields in order as (key, value), e.g. from Entry.to_items
         """
         try:
             # Prevent triggering change events
@@ -2207,9 +2083,7 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
             self.ui.tableWidget.setRowCount(0)
 
             # Add rows for each field
-            for line, info_key in enumerate(infos):
-                value = infos[info_key]
-
+            for line, (info_key, value) in enumerate(rows):
                 # Add a new row
                 self.ui.tableWidget.insertRow(line)
 
@@ -2232,28 +2106,25 @@ class PassUI(PyQt5.QtWidgets.QMainWindow):
         """Handle drag move events for tree items"""
         try:
             position = event.pos()
-            item_at_position = self.ui.treeWidget.itemAt(position)
+            item_at_position = self.tree_node_at(position)
 
             # If dragging to empty space, accept
             if item_at_position is None:
                 return event.accept()
 
             # Get the item being dragged
-            current_item = self.ui.treeWidget.currentItem()
+            current_item = self.current_node()
             if current_item is None:
                 return event.ignore()
 
             # Get parent of current item
-            parent_current = current_item.parent()
-
-            # Check if the drop target is a directory
-            path_dir_dest = self.get_abs_path(item_at_position, folder=True)
+            parent_current = current_item.parent
 
             # Don't allow dropping on parent (no-op)
-            if item_at_position == parent_current:
+            if item_at_position is parent_current:
                 return event.ignore()
             # Allow dropping in directories
-            elif os.path.isdir(path_dir_dest):
+            elif item_at_position.is_dir:
                 return event.accept()
             # Don't allow dropping on non-directories
             else:
@@ -0,0 +1,229 @@
+"""urlindex.py - Encrypted reverse index from hostnames to entries
+
+This module resolves "which entry belongs to this host" from the url fields
+of the entries without decrypting the store. Hostnames are kept reversed
+("com.example.login") in a sorted list, so that the longest known suffix of
+a host and the entries of its registrable domain are found by bisection.
+"""
+
+import bisect
+import ipaddress
+import json
+from urllib.parse import urlsplit
+from PassUI import metaindex
+
+# Field names holding URLs, values starting with a scheme are indexed too
+URL_FIELDS = frozenset(["url", "urls", "uri", "website", "site", "login_uri", "host", "hostname"])
+
+# Public suffixes of more than one label, for the registrable domain
+MULTI_LABEL_SUFFIXES = frozenset([
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "me.uk", "net.uk",
+    "com.au", "net.au", "org.au", "edu.au", "gov.au",
+    "co.nz", "org.nz", "co.jp", "ne.jp", "or.jp", "ac.jp",
+    "com.br", "net.br", "org.br", "com.cn", "net.cn", "org.cn",
+    "co.in", "net.in", "org.in", "co.za", "org.za", "com.mx", "org.mx",
+    "com.tr", "com.tw", "com.hk", "com.sg", "co.kr", "co.il", "com.ar",
+])
+
+
+def normalize_host(url):
+    """Extract the normalized hostname of a URL or bare host
+
+    Args:
+        url: URL, with or without scheme
+
+    Returns:
+        str: Lowercase IDNA hostname without "www.", None if there is none
+    """
+    url = str(url).strip()
+    if not url:
+        return None
+    if "://" not in url:
+        url = "//" + url
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    host = host.rstrip(".").lower()
+    try:
+        host = host.encode("idna").decode("ascii")
+    except UnicodeError:
+        pass
+    if host.startswith("www."):
+        host = host[len("www."):]
+    return host or None
+
+
+def extract_hosts(data_dict):
+    """Hostnames of the URL fields of an entry
+
+    Args:
+        data_dict: Decrypted fields of the entry
+
+    Returns:
+        list: Sorted normalized hostnames
+    """
+    hosts = set()
+    for field, value in data_dict.items():
+        if field == "PASSWORD":
+            continue
+        value = str(value)
+        if field.lower() in URL_FIELDS or value.startswith(("http://", "https://")):
+            for url in value.split():
+                host = normalize_host(url)
+                if host:
+                    hosts.add(host)
+    return sorted(hosts)
+
+
+def is_ip(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def registrable_domain(host):
+    """Registrable domain of a hostname, e.g. example.co.uk for a.example.co.uk
+
+    Args:
+        host: Normalized hostname
+
+    Returns:
+        str: Registrable domain, the host itself for IPs and single labels
+    """
+    if is_ip(host):
+        return host
+    labels = host.split(".")
+    if len(labels) >= 3 and ".".join(labels[-2:]) in MULTI_LABEL_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def reverse_host(host):
+    if is_ip(host):
+        return host
+    return ".".join(reversed(host.split(".")))
+
+
+class UrlIndex(metaindex.EncryptedIndex):
+    """Sorted reverse index of hostnames to entries"""
+
+    INDEX_NAME = ".passui-urls.bgpg"
+    DELTAS_NAME = ".passui-urls.d"
+
+    def __init__(self, path_store):
+        """Create an empty index
+
+        Args:
+            path_store: Absolute path to the password store
+        """
+        super().__init__(path_store)
+        self.entries = {}  # path_rel -> list of hosts
+        self.by_host = {}  # reversed host -> set of path_rel
+        self.hosts = []  # sorted reversed hosts
+
+    def __len__(self):
+        return len(self.entries)
+
+    def update(self, path_rel, data_dict):
+        """Index the URLs of one entry, replacing its previous ones
+
+        Args:
+            path_rel: Relative path of the entry, without .gpg
+            data_dict: Decrypted fields, or a list of hosts from the disk
+        """
+        self.remove(path_rel)
+        hosts = extract_hosts(data_dict) if isinstance(data_dict, dict) else sorted(set(data_dict))
+        if not hosts:
+            return
+        self.entries[path_rel] = hosts
+        for host in hosts:
+            key = reverse_host(host)
+            paths = self.by_host.get(key)
+            if paths is None:
+                self.by_host[key] = {path_rel}
+                bisect.insort(self.hosts, key)
+            else:
+                paths.add(path_rel)
+
+    def remove(self, path_rel):
+        hosts = self.entries.pop(path_rel, None)
+        if hosts is None:
+            return
+        for host in hosts:
+            key = reverse_host(host)
+            paths = self.by_host.get(key)
+            if paths is None:
+                continue
+            paths.discard(path_rel)
+            if not paths:
+                del self.by_host[key]
+                i = bisect.bisect_left(self.hosts, key)
+                if i < len(self.hosts) and self.hosts[i] == key:
+                    del self.hosts[i]
+
+    def delta_payload(self, data_dict):
+        return extract_hosts(data_dict)
+
+    def rename(self, path_rel_old, path_rel_new):
+        hosts = self.entries.get(path_rel_old)
+        if hosts is None:
+            return
+        self.remove(path_rel_old)
+        self.update(path_rel_new, hosts)
+
+    def copy(self, path_rel, path_rel_new):
+        hosts = self.entries.get(path_rel)
+        if hosts is not None:
+            self.update(path_rel_new, hosts)
+
+    def _has(self, key):
+        i = bisect.bisect_left(self.hosts, key)
+        return i < len(self.hosts) and self.hosts[i] == key
+
+    def lookup(self, url):
+        """Find the entries of a URL
+
+        The entries of the longest indexed suffix of the host win, down to
+        its registrable domain. Without any, the entries of other hosts of
+        the same registrable domain are returned.
+
+        Args:
+            url: URL or hostname
+
+        Returns:
+            list: Sorted relative paths of the matching entries
+        """
+        host = normalize_host(url)
+        if host is None:
+            return []
+        if is_ip(host):
+            return sorted(self.by_host.get(host, ()))
+
+        domain = registrable_domain(host)
+        labels = host.split(".")
+        nb_domain_labels = domain.count(".") + 1
+        for nb_labels in range(len(labels), nb_domain_labels - 1, -1):
+            key = reverse_host(".".join(labels[-nb_labels:]))
+            if self._has(key):
+                return sorted(self.by_host[key])
+
+        # Siblings sharing the registrable domain
+        prefix = reverse_host(domain) + "."
+        res = set()
+        i = bisect.bisect_left(self.hosts, prefix)
+        while i < len(self.hosts) and self.hosts[i].startswith(prefix):
+            res.update(self.by_host[self.hosts[i]])
+            i += 1
+        return sorted(res)
+
+    def dumps(self):
+        return json.dumps(self.entries, separators=(",", ":"))
+
+    def loads(self, data_str):
+        for path_rel, hosts in json.loads(data_str).items():
+            self.update(path_rel, hosts)
@@ -0,0 +1,87 @@
+"""Time the directory archive codecs on a mixed directory
+
+Usage: python benchmarks/archive_codecs.py [size_mb] [path_dir]
+
+Without path_dir, a directory of text logs, incompressible media and many
+small files is generated. Each archive is encrypted to the keys of the
+keyring, as encrypt_directory does, or only archived if there is none.
+"""
+
+import io
+import os
+import sys
+import time
+import tempfile
+from PassUI import archive, gpg, stream
+
+CASES = [
+    ("zip", "gz", 6, 1),
+    ("tar", "none", None, 1),
+    ("tar", "gz", 1, 1),
+    ("tar", "gz", 6, 1),
+    ("tar", "gz", 6, None),
+    ("tar", "bz2", 9, None),
+    ("tar", "xz", 1, None),
+    ("tar", "xz", 6, None),
+]
+
+
+def make_directory(path_abs_dir, size_mb):
+    """A third of text logs, a third of random media and a third of small files"""
+    size = size_mb << 20
+    os.makedirs(os.path.join(path_abs_dir, "logs"))
+    os.makedirs(os.path.join(path_abs_dir, "media"))
+    os.makedirs(os.path.join(path_abs_dir, "notes"))
+    line = b"2024-01-01T00:00:00 INFO GET /api/v1/items?page=%d 200 12ms\n"
+    with open(os.path.join(path_abs_dir, "logs", "app.log"), "wb") as f:
+        for i in range(size // 3 // len(line)):
+            f.write(line % (i % 1000))
+    with open(os.path.join(path_abs_dir, "media", "video.mp4"), "wb") as f:
+        f.write(os.urandom(size // 3))
+    for i in range(size // 3 // 4096):
+        with open(os.path.join(path_abs_dir, "notes", f"note{i:05d}.txt"), "wb") as f:
+            f.write((f"note {i} " * 512)[:4096].encode())
+
+
+class Counter(io.RawIOBase):
+    def __init__(self):
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+
+def run(path_abs_dir):
+    recipients = gpg.GPG().recipients()
+    print(f"{'format':6} {'codec':5} {'level':>5} {'threads':>7} {'seconds':>8} {'MB/s':>7} {'ratio':>6}")
+    size = sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, dirs, files in os.walk(path_abs_dir) for name in files)
+    for format, codec, level, threads in CASES:
+        counter = Counter()
+        start = time.perf_counter()
+        writer = stream.EncryptedWriter(counter, recipients) if recipients else counter
+        if format == "zip":
+            archive.write_zip(path_abs_dir, writer, compresslevel=level)
+        else:
+            archive.write_tar(path_abs_dir, writer, codec=codec, level=level, threads=threads)
+        if recipients:
+            writer.close()
+        duration = time.perf_counter() - start
+        print(
+            f"{format:6} {codec:5} {str(level or '-'):>5} {str(threads or os.cpu_count()):>7} "
+            f"{duration:8.2f} {size / duration / (1 << 20):7.1f} {counter.size / size:6.3f}")
+
+
+if __name__ == "__main__":
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 96
+    if len(sys.argv) > 2:
+        run(sys.argv[2])
+    else:
+        with tempfile.TemporaryDirectory() as path_abs_tmp:
+            make_directory(os.path.join(path_abs_tmp, "mixed"), size_mb)
+            run(os.path.join(path_abs_tmp, "mixed"))
@@ -0,0 +1,69 @@
+"""Time the encryption and decryption of one large file by number of threads
+
+Usage: python benchmarks/stream_threads.py [size_mb] [path_file]
+
+Without path_file, a file of random bytes is generated. The file is
+encrypted to the keys of the keyring into a seekable container, then
+decrypted back, with 1, 2, 4... threads up to the number of CPUs.
+"""
+
+import io
+import os
+import sys
+import time
+import tempfile
+from PassUI import gpg, stream, passphrase
+
+
+class Counter(io.RawIOBase):
+    def __init__(self):
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+
+def run(path_abs_file):
+    gpg_obj = gpg.GPG()
+    recipients = gpg_obj.recipients()
+    decryptor = gpg_obj.decryptor(passphrase.default_provider()())
+    size = os.path.getsize(path_abs_file)
+    threads_list = [1]
+    while threads_list[-1] * 2 <= (os.cpu_count() or 1):
+        threads_list.append(threads_list[-1] * 2)
+    print(f"{'threads':>7} {'encrypt MB/s':>12} {'decrypt MB/s':>12}")
+    with tempfile.TemporaryDirectory() as path_abs_tmp:
+        path_abs_container = os.path.join(path_abs_tmp, "file.bgpg")
+        for threads in threads_list:
+            start = time.perf_counter()
+            with open(path_abs_file, "rb") as source, open(path_abs_container, "wb") as f:
+                with stream.SeekableWriter(f, recipients, threads=threads) as writer:
+                    while True:
+                        data = source.read(stream.CHUNK_SIZE * stream.RUN_CHUNKS)
+                        if not data:
+                            break
+                        writer.write(data)
+            encrypt = time.perf_counter() - start
+            start = time.perf_counter()
+            with open(path_abs_container, "rb") as f:
+                for chunk in stream.SeekableReader(f, decryptor, threads=threads):
+                    pass
+            decrypt = time.perf_counter() - start
+            print(f"{threads:7} {size / encrypt / (1 << 20):12.1f} {size / decrypt / (1 << 20):12.1f}")
+
+
+if __name__ == "__main__":
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    if len(sys.argv) > 2:
+        run(sys.argv[2])
+    else:
+        with tempfile.TemporaryDirectory() as path_abs_tmp:
+            path_abs_file = os.path.join(path_abs_tmp, "random.bin")
+            with open(path_abs_file, "wb") as f:
+                for i in range(size_mb):
+                    f.write(os.urandom(1 << 20))
+            run(path_abs_file)
@@ -1,12 +1,7 @@
-
 def main():
-    from PyQt5 import QtWidgets
-    import PassUI
+    from PassUI.__main__ import run
 
-    app = QtWidgets.QApplication([])  # Create an instance of QtWidgets.QApplication
-    passpy_obj = PassUI.passstore.PassStore()  # Init of backend
-    PassUI.ui.PassUI(passpy_obj)  # Init of frontend
-    app.exec_()  # Start the application
+    run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,12 @@
+import pytest
+from PassUI import passstore, passphrase
+
+
+@pytest.fixture
+def passstore_obj(tmp_path_factory):
+    """PassStore on an empty temporary store apart from tmp_path, with the passphrase of the test key"""
+    passstore_obj = passstore.PassStore(
+        passphrase_provider=passphrase.CallbackProvider(lambda prompt: "test"))
+    passstore_obj.path_store = str(tmp_path_factory.mktemp("store"))
+    yield passstore_obj
+    passstore_obj.close()
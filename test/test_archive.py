@@ -0,0 +1,93 @@
+import io
+import os
+import zipfile
+import tempfile
+from PassUI import archive, passphrase
+
+
+def test_zip_directory(passstore_obj, tmp_path):
+    path_abs_tmp = str(tmp_path)
+    path_abs_dir = os.path.join(path_abs_tmp, "folder")
+    os.makedirs(os.path.join(path_abs_dir, "sub", "empty"))
+    files = {"a.txt": b"hello", os.path.join("sub", "big.bin"): os.urandom(3 << 20)}
+    for path_rel, data in files.items():
+        with open(os.path.join(path_abs_dir, path_rel), "wb") as f:
+            f.write(data)
+
+    for format, codec, name in (("zip", None, "folder.zip.bgpg"), ("tar", "xz", "folder.tar.xz.bgpg")):
+        assert passstore_obj.encrypt_directory(path_abs_dir, replace=True, zip=True, format=format, codec=codec)
+        assert os.listdir(path_abs_tmp) == [name]
+        assert passstore_obj.decrypt_directory(os.path.join(path_abs_tmp, name), replace=True, zip=True)
+        for path_rel, data in files.items():
+            with open(os.path.join(path_abs_dir, path_rel), "rb") as f:
+                assert f.read() == data
+        assert os.path.isdir(os.path.join(path_abs_dir, "sub", "empty"))
+
+
+def test_extract_unsafe():
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as zf:
+        zf.writestr("../evil.txt", b"evil")
+    with tempfile.TemporaryDirectory() as path_abs_tmp:
+        try:
+            archive.extract_zip(io.BufferedReader(io.BytesIO(data.getvalue())), path_abs_tmp)
+            assert False
+        except ValueError:
+            pass
+        assert not os.path.exists(os.path.join(os.path.dirname(path_abs_tmp), "evil.txt"))
+
+
+def test_tar_codecs():
+    with tempfile.TemporaryDirectory() as path_abs_tmp:
+        path_abs_dir = os.path.join(path_abs_tmp, "folder")
+        os.makedirs(os.path.join(path_abs_dir, "logs"))
+        files = {
+            os.path.join("logs", "app.log"): b"GET /index.html 200\n" * 50000,
+            "media.bin": os.urandom(300000),
+        }
+        for path_rel, data in files.items():
+            with open(os.path.join(path_abs_dir, path_rel), "wb") as f:
+                f.write(data)
+        for codec in archive.CODECS:
+            data = io.BytesIO()
+            # Small blocks so that the stream has several members
+            if codec == "none":
+                archive.write_tar(path_abs_dir, data, codec=codec)
+            else:
+                compressor = archive.BlockCompressor(data, codec, level=1, threads=4, block_size=100000)
+                with io.BufferedWriter(compressor) as writer:
+                    writer.write(b"x" * 350000)
+                assert archive.StreamDecompressor(io.BufferedReader(io.BytesIO(data.getvalue())), codec).read() == b"x" * 350000
+                data = io.BytesIO()
+                archive.write_tar(path_abs_dir, data, codec=codec, threads=2)
+            reader = io.BufferedReader(io.BytesIO(data.getvalue()))
+            assert archive.detect_codec(reader) == codec
+            path_abs_dest = os.path.join(path_abs_tmp, codec)
+            assert archive.extract(reader, path_abs_dest) == 2
+            for path_rel, content in files.items():
+                with open(os.path.join(path_abs_dest, path_rel), "rb") as f:
+                    assert f.read() == content
+
+
+def test_extract_member(passstore_obj, tmp_path):
+    path_abs_tmp = str(tmp_path)
+    path_abs_dir = os.path.join(path_abs_tmp, "folder")
+    os.makedirs(os.path.join(path_abs_dir, "sub"))
+    files = {"a.txt": b"hello", os.path.join("sub", "big.bin"): os.urandom(2 << 20)}
+    for path_rel, data in files.items():
+        with open(os.path.join(path_abs_dir, path_rel), "wb") as f:
+            f.write(data)
+    assert passstore_obj.encrypt_directory(path_abs_dir, zip=True, seekable=True)
+    path_abs = path_abs_dir + ".zip.bgpg"
+    assert sorted(passstore_obj.list_members(path_abs)) == ["a.txt", "sub/big.bin"]
+    path_abs_dest = os.path.join(path_abs_tmp, "a.txt")
+    assert passstore_obj.extract_member(path_abs, "a.txt", path_abs_dest)
+    with open(path_abs_dest, "rb") as f:
+        assert f.read() == b"hello"
+    assert not passstore_obj.extract_member(path_abs, "missing", path_abs_dest)
+
+    # Still extracted whole like other archives, with the passphrase asked beforehand
+    passstore_obj.passphrase_provider = passphrase.CallbackProvider(lambda prompt: None)
+    assert passstore_obj.decrypt_directory(path_abs, zip=True, passphrase="test")
+    with open(os.path.join(path_abs_dir, "sub", "big.bin"), "rb") as f:
+        assert f.read() == files[os.path.join("sub", "big.bin")]
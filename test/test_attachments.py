@@ -0,0 +1,66 @@
+import os
+from PassUI import attachments, passphrase
+
+
+def test_attach(passstore_obj, tmp_path):
+    path_rel = "test_attachment"
+    passstore_obj.write_key(path_rel, {"PASSWORD": "test", "login": "me"})
+    path_abs_tmp = str(tmp_path)
+    path_abs_file = os.path.join(path_abs_tmp, "cert.pem")
+    data = os.urandom(300 * 1024)
+    with open(path_abs_file, "wb") as f:
+        f.write(data)
+    assert passstore_obj.attach(path_rel, path_abs_file)
+    assert not passstore_obj.attach(path_rel, path_abs_file, name="../escape")
+
+    # The entry only links to the blob
+    assert os.path.getsize(os.path.join(passstore_obj.path_store, path_rel + ".gpg")) < 4096
+    assert passstore_obj.read_key(path_rel) == {
+        "PASSWORD": "test", "login": "me", "attachment/cert.pem": str(len(data))}
+    assert passstore_obj.attachments(path_rel) == ["cert.pem"]
+
+    assert passstore_obj.read_attachment(path_rel, "cert.pem") == data
+    path_abs_dest = os.path.join(path_abs_tmp, "saved.pem")
+    assert passstore_obj.save_attachment(path_rel, "cert.pem", path_abs_dest)
+    with open(path_abs_dest, "rb") as f:
+        assert f.read() == data
+
+    assert passstore_obj.detach(path_rel, "cert.pem")
+    assert passstore_obj.attachments(path_rel) == []
+    assert not os.path.exists(attachments.directory(passstore_obj.path_store, path_rel))
+
+
+def test_copy_move(passstore_obj, tmp_path):
+    passstore_obj.git_commit = True
+    path_abs_tmp = str(tmp_path)
+    passstore_obj.write_key("entry", {"PASSWORD": "test"})
+    path_abs_file = os.path.join(path_abs_tmp, "cert.pem")
+    with open(path_abs_file, "wb") as f:
+        f.write(b"cert")
+    # The passphrase is asked by the caller, e.g. on the GUI thread
+    passstore_obj.passphrase_provider = passphrase.CallbackProvider(lambda prompt: None)
+    assert passstore_obj.attach("entry", path_abs_file, passphrase="test")
+
+    # Duplicated with its attachments
+    passstore_obj.copy_entry("entry", "entry_1")
+    assert passstore_obj.read_attachment("entry_1", "cert.pem", passphrase="test") == b"cert"
+    assert passstore_obj.read_attachment("entry", "cert.pem", passphrase="test") == b"cert"
+
+    # Dragged to a folder with its attachments
+    passstore_obj.move_entry("entry_1", os.path.join("folder", "entry_1"))
+    assert passstore_obj.read_attachment(os.path.join("folder", "entry_1"), "cert.pem", passphrase="test") == b"cert"
+    assert not os.path.exists(attachments.directory(passstore_obj.path_store, "entry_1"))
+    assert sorted(passstore_obj.index_rel_paths()) == ["entry", os.path.join("folder", "entry_1")]
+
+    # The blobs are committed along with their entries
+    git_store = passstore_obj.git_store
+    git_store.commit()
+    assert git_store.run("ls-tree", "-r", "--name-only", "HEAD").splitlines() == [
+        "entry.attachments/cert.pem.bgpg", "entry.gpg",
+        "folder/entry_1.attachments/cert.pem.bgpg", "folder/entry_1.gpg"]
+    assert git_store.run("status", "--porcelain", "--untracked-files=no") == ""
+
+    passstore_obj.remove_entry("entry")
+    git_store.commit()
+    assert git_store.run("ls-tree", "-r", "--name-only", "HEAD").splitlines() == [
+        "folder/entry_1.attachments/cert.pem.bgpg", "folder/entry_1.gpg"]
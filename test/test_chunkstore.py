@@ -0,0 +1,62 @@
+import io
+import os
+from PassUI import chunkstore
+
+
+def make_dump(rows, inserted=()):
+    lines = [b"INSERT INTO t VALUES (%d, 'name%d', %d);\n" % (i, i * 7 % 1000, i % 97) for i in range(rows)]
+    for position, line in inserted:
+        lines.insert(position, line)
+    return b"".join(lines)
+
+
+def test_iter_chunks():
+    data = make_dump(20000)
+    chunks = list(chunkstore.iter_chunks(io.BytesIO(data), 1234, min_size=1024, max_size=16384, mask_bits=6))
+    assert b"".join(chunks) == data
+    assert all(len(chunk) <= 16384 for chunk in chunks)
+    assert all(len(chunk) >= 1024 for chunk in chunks[:-1])
+    # An insertion only changes the chunks around it
+    changed = make_dump(20000, [(10000, b"INSERT INTO t VALUES (0, 'new', 0);\n")])
+    chunks_changed = list(chunkstore.iter_chunks(
+        io.BytesIO(changed), 1234, min_size=1024, max_size=16384, mask_bits=6))
+    assert len(set(chunks_changed) - set(chunks)) <= 2
+
+
+def test_versions(passstore_obj, tmp_path):
+    path_abs_tmp = str(tmp_path)
+    path_abs_store = os.path.join(path_abs_tmp, "store")
+    chunkstore.ChunkStore(
+        path_abs_store, recipients=passstore_obj.recipients(), min_size=4096, max_size=65536, mask_bits=6)
+    path_abs = os.path.join(path_abs_tmp, "dump.sql")
+    dumps = [make_dump(50000), make_dump(50000, [(25000, b"INSERT INTO t VALUES (0, 'new', 0);\n")])]
+    reports = []
+    for dump in dumps:
+        with open(path_abs, "wb") as f:
+            f.write(dump)
+        reports.append(passstore_obj.store_version(path_abs, path_abs_store))
+    assert reports[0]["written"] == len(dumps[0])
+    assert reports[1]["written"] < len(dumps[1]) / 10
+    assert reports[0]["name"] != reports[1]["name"]
+
+    store = chunkstore.ChunkStore(path_abs_store)
+    assert store.versions() == sorted(report["name"] for report in reports)
+    for dump, report in zip(dumps, reports):
+        assert passstore_obj.restore_version(path_abs_store, report["name"], path_abs)
+        with open(path_abs, "rb") as f:
+            assert f.read() == dump
+
+    assert passstore_obj.remove_version(path_abs_store, reports[0]["name"])
+    assert store.versions() == [reports[1]["name"]]
+    assert passstore_obj.restore_version(path_abs_store, reports[1]["name"], path_abs)
+    with open(path_abs, "rb") as f:
+        assert f.read() == dumps[1]
+
+    # Closed, the keys of the store are forgotten
+    with chunkstore.ChunkStore(path_abs_store, passstore_obj.decryptor("test")) as store:
+        assert store.manifest(reports[1]["name"])["size"] == len(dumps[1])
+    try:
+        store.manifest(reports[1]["name"])
+        assert False
+    except ValueError:
+        pass
@@ -0,0 +1,29 @@
+import os
+import time
+import tempfile
+from PassUI import config
+
+
+def test_write_yaml():
+    with tempfile.TemporaryDirectory() as path_abs_tmp:
+        path = os.path.join(path_abs_tmp, "passui.yml")
+        assert config.read_yaml(path) == {}
+        assert config.write_yaml(path, {"settings": {"a": 1}})
+        assert not config.write_yaml(path, {"settings": {"a": 1}})
+        data = config.read_yaml(path)
+        data["settings"]["a"] = 2  # Callers get a copy of the cache
+        assert config.read_yaml(path) == {"settings": {"a": 1}}
+        assert os.listdir(path_abs_tmp) == ["passui.yml"]
+
+
+def test_schedule_write():
+    with tempfile.TemporaryDirectory() as path_abs_tmp:
+        path = os.path.join(path_abs_tmp, "passui.yml")
+        for i in range(10):
+            config.schedule_write(path, {"i": i}, delay=0.2)
+        assert not os.path.exists(path)
+        time.sleep(0.5)
+        assert config.read_yaml(path) == {"i": 9}
+        config.schedule_write(path, {"i": 10}, delay=60)
+        # Reading flushes the pending write first
+        assert config.read_yaml(path) == {"i": 10}
@@ -0,0 +1,61 @@
+from PassUI import utils
+from PassUI.entry import Entry
+
+
+def test_entry():
+    raw = "secret\nlogin: me\nnotes: first line\n  second line\nfree text\nurl: a\nurl: b\n"
+    entry = Entry(raw)
+    assert entry.password == "secret"
+    assert entry["notes"] == "first line\n second line"
+    assert entry.get_all("url") == ["a", "b"]
+    assert entry.get("missing") is None
+    assert entry.keys() == ["login", "notes", "url", "url"]
+    assert entry.serialize() == raw
+
+    # Only the changed lines are rebuilt
+    entry.set("login", "you")
+    entry.add("pin", "12\n34")
+    assert entry.serialize() == (
+        "secret\nlogin: you\nnotes: first line\n  second line\nfree text\nurl: a\nurl: b\npin: 12\n 34\n")
+    assert Entry(entry.serialize())["pin"] == "12\n34"
+    entry.set("url", "c")
+    entry.password = "new"
+    assert Entry(entry.serialize()).to_dict() == {
+        "PASSWORD": "new", "login": "you", "notes": "first line\n second line", "url": "c", "pin": "12\n34"}
+
+
+def test_update_items():
+    raw = "secret\nurl: a\nfree text\nurl:b\nnotes: first\n  second\n"
+    entry = Entry(raw)
+    items = entry.to_items()
+    assert items == [("PASSWORD", "secret"), ("url", "a"), ("url", "b"), ("notes", "first\n second")]
+    entry.update_items(items)
+    assert entry.serialize() == raw
+
+    # Edited like in the details table: the second url changed, a field added
+    items[2] = ("url", "c")
+    entry.update_items(items + [("url", "d")])
+    assert entry.serialize() == "secret\nurl: a\nfree text\nurl: c\nnotes: first\n  second\nurl: d\n"
+
+    # A removed row drops its field only, the free text stays
+    entry = Entry(entry.serialize())
+    entry.update_items([("PASSWORD", "new"), ("url", "a"), ("url", "c")])
+    assert entry.serialize() == "new\nurl: a\nfree text\nurl: c\n"
+    assert Entry(entry.serialize()).get_all("url") == ["a", "c"]
+
+    # A row inserted in the table is inserted at the same place in the entry
+    entry.update_items([("PASSWORD", "new"), ("url", "a"), ("url", "c"), ("url", "a")])
+    entry.update_items([("PASSWORD", "new"), ("url", "a"), ("user", "me"), ("url", "c"), ("url", "a")])
+    assert entry.serialize() == "new\nurl: a\nfree text\nuser: me\nurl: c\nurl: a\n"
+
+
+def test_data_str():
+    data_str = "pass\nuser: me\nhttp://example.com\nkey:value: with colons\n"
+    assert utils.data_str_to_dict(data_str) == {
+        "PASSWORD": "pass", "user": "me", "http": "//example.com", "key:value": "with colons"}
+    assert utils.data_str_to_dict("") == {"PASSWORD": ""}
+    data_dict = {"PASSWORD": "pass", "user": "me"}
+    assert utils.data_dict_to_str(data_dict) == "pass\nuser: me\n"
+    # Without password the first line stays empty, not taken by a field
+    assert utils.data_dict_to_str({"user": "me"}) == "\nuser: me\n"
+    assert utils.data_str_to_dict(utils.data_dict_to_str(data_dict)) == data_dict
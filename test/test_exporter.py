@@ -0,0 +1,44 @@
+import io
+import os
+import csv
+import json
+from PassUI import gpg, stream
+
+
+def test_stream():
+    gpg_obj = gpg.GPG()
+    data = os.urandom(10000)
+    f = io.BytesIO()
+    with stream.EncryptedWriter(f, gpg_obj.recipients(), chunk_size=1000) as writer:
+        writer.write(data[:4000])
+        writer.write(data[4000:])
+    decryptor = gpg_obj.decryptor("test")
+    assert b"".join(stream.EncryptedReader(io.BytesIO(f.getvalue()), decryptor)) == data
+    # Dropping the final chunk is detected
+    truncated = f.getvalue()[:-(1000 + stream.TAG_SIZE + stream.LENGTH.size)]
+    try:
+        b"".join(stream.EncryptedReader(io.BytesIO(truncated), decryptor))
+        assert False
+    except ValueError:
+        pass
+
+
+def test_export(passstore_obj, tmp_path):
+    path_abs_tmp = str(tmp_path)
+    for i in range(70):
+        passstore_obj.write_key(os.path.join("work", f"entry{i:02d}"), {"PASSWORD": f"pw{i}", "user": "jdoe"})
+    passstore_obj.write_key(os.path.join("perso", "mail"), {"PASSWORD": "pw", "pin": "1234"})
+    path_export = os.path.join(path_abs_tmp, "export.bin")
+    path_plain = os.path.join(path_abs_tmp, "export.jsonl")
+    assert passstore_obj.export(path_export, subtree="work", workers=2) == {"exported": 70, "failed": 0}
+    passstore_obj.decrypt_export(path_export, path_plain)
+    with open(path_plain) as f:
+        lines = [json.loads(line) for line in f]
+    assert lines[0] == {"path": "work/entry00", "PASSWORD": "pw0", "user": "jdoe"}
+    assert len(lines) == 70
+    assert passstore_obj.export(path_export, subtree="perso", format="csv")["exported"] == 1
+    passstore_obj.decrypt_export(path_export, path_plain)
+    with open(path_plain, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0]["path"] == "perso/mail"
+    assert rows[0]["fields"] == "pin: 1234"
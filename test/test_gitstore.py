@@ -0,0 +1,40 @@
+import os
+
+
+def test_git_commit(passstore_obj):
+    passstore_obj.git_commit = True
+    with passstore_obj.batch():
+        for i in range(3):
+            passstore_obj.write_key(f"entry{i}", {"PASSWORD": f"pw{i}"})
+    git_store = passstore_obj.git_store
+    assert git_store.run("rev-list", "--count", "HEAD") == "1"
+
+    # Single edits wait for the debounce window, then share one commit
+    passstore_obj.write_key("entry0", {"PASSWORD": "changed"})
+    passstore_obj.write_key("entry1", {"PASSWORD": "changed"})
+    assert git_store.run("rev-list", "--count", "HEAD") == "1"
+    history = passstore_obj.history("entry0")
+    assert git_store.run("rev-list", "--count", "HEAD") == "2"
+    assert [commit["message"].splitlines()[0] for commit in history] == ["Update 2 files", "Update 3 entries"]
+    assert git_store.run("status", "--porcelain", "--", "entry0.gpg", "entry1.gpg", "entry2.gpg") == ""
+
+
+def test_git_commit_paths(passstore_obj):
+    passstore_obj.git_commit = True
+    passstore_obj.write_key("entry", {"PASSWORD": "pw"})
+    git_store = passstore_obj.git_store
+    git_store.commit()
+    # Staged by the user, not by PassUI
+    with open(os.path.join(passstore_obj.path_store, "notes.txt"), "w") as f:
+        f.write("notes")
+    git_store.run("add", "notes.txt")
+
+    passstore_obj.move_entry("entry", os.path.join("dir", "moved"))
+    git_store.commit()
+    assert git_store.run("ls-tree", "-r", "--name-only", "HEAD").splitlines() == ["dir/moved.gpg"]
+    assert git_store.run("status", "--porcelain", "--untracked-files=no") == "A  notes.txt"
+
+    passstore_obj.remove_folder("dir")
+    git_store.commit()
+    assert git_store.run("ls-tree", "-r", "--name-only", "HEAD") == ""
+    assert passstore_obj.index_rel_paths() == []
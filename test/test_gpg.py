@@ -47,6 +47,30 @@ def test_rw_created():
     os.remove(path_tmp)
 
 
+def test_decryptor_fallback(monkeypatch):
+    gpg_obj = gpg.GPG()
+    with tempfile.NamedTemporaryFile(delete=False) as tmp:
+        path_tmp = tmp.name
+    gpg_obj.write(path_tmp, "test", passphrase="test")
+    with open(path_tmp, "rb") as file:
+        data = file.read()
+    os.remove(path_tmp)
+    assert gpg_obj.decryptor("test").decrypt(data) == "test"
+
+    def moved(message):
+        raise AttributeError("_sessionkeys")
+
+    # Private attributes of pgpy moved after the keys were prepared
+    decryptor = gpg_obj.decryptor("test")
+    monkeypatch.setattr(decryptor, "_decrypt_rsa", moved)
+    assert decryptor.decrypt(data) == "test"
+    assert not decryptor._rsa_keys
+
+    # Or before
+    monkeypatch.setattr(gpg, "_rsa_private_keys", moved)
+    assert gpg_obj.decryptor("test").decrypt(data) == "test"
+
+
 def test_rw_import():
     gpg_obj = gpg.GPG()
     with tempfile.NamedTemporaryFile(delete=False) as tmp:
@@ -0,0 +1,41 @@
+import os
+import json
+from PassUI import gpg, health
+
+
+def fill_store(passstore_obj):
+    for i in range(70):
+        passstore_obj.write_key(f"entry{i:02d}", {"PASSWORD": f"pw{i}"})
+    passstore_obj.write_key("empty", {"PASSWORD": "", "user": "jdoe"})
+    with open(os.path.join(passstore_obj.path_store, "corrupt.gpg"), "wb") as f:
+        f.write(b"not a message")
+
+
+def test_verify(passstore_obj, tmp_path):
+    fill_store(passstore_obj)
+    path_abs_tmp = str(tmp_path)
+    findings = []
+    path_report = os.path.join(path_abs_tmp, "report.json")
+    report = passstore_obj.verify(
+        workers=2, callback=lambda *finding: findings.append(finding), path_abs_report=path_report)
+    assert report["checked"] == 72
+    assert report["healthy"] == 70
+    assert [(path_rel, problem) for path_rel, problem, detail in findings] == [
+        ("corrupt", "corrupt"), ("empty", "empty_password")]
+    with open(path_report) as f:
+        assert json.load(f)["problems"]["corrupt"] == 1
+
+
+def test_fast(passstore_obj, tmp_path):
+    fill_store(passstore_obj)
+    path_abs_tmp = str(tmp_path)
+    report = passstore_obj.verify(fast=True, workers=1, path_abs_report=os.path.join(path_abs_tmp, "r.json"))
+    assert report["healthy"] == 71
+    assert report["problems"]["corrupt"] == 1
+
+    # A recipient added since the entries were written
+    recipient_key_ids = [gpg.key_ids(key) for key in passstore_obj.recipients()]
+    private_key_ids = [key_id for ids in recipient_key_ids for key_id in ids]
+    checker = health.Checker(recipient_key_ids + [["0123456789ABCDEF"]], private_key_ids)
+    findings = checker.check(os.path.join(passstore_obj.path_store, "entry00.gpg"))
+    assert findings == [("stale_recipients", "missing 0123456789ABCDEF")]
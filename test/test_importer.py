@@ -0,0 +1,51 @@
+import io
+import os
+import json
+from PassUI import importer, utils
+
+
+def test_iter_json_values():
+    export = {
+        "encrypted": False,
+        "folders": [{"id": "f1", "name": "Work"}],
+        "items": [{"name": f"item{i}", "value": 12345 * i} for i in range(50)],
+    }
+    values = list(importer.iter_json_values(io.StringIO(json.dumps(export, indent=2)), chunk_size=7))
+    assert values[0] == ("encrypted", False)
+    assert values[1] == ("folders", {"id": "f1", "name": "Work"})
+    assert [value for key, value in values[2:]] == export["items"]
+    assert list(importer.iter_json_values(io.StringIO("[]"))) == []
+
+
+def test_import_file(passstore_obj, tmp_path):
+    path_abs_tmp = str(tmp_path)
+    path_csv = os.path.join(path_abs_tmp, "export.csv")
+    with open(path_csv, "w", newline="") as f:
+        f.write("folder,favorite,type,name,notes,fields,reprompt,login_uri,login_username,login_password,login_totp\n")
+        f.write('Work,,login,gitlab,"line1\nline2",,0,https://gitlab.com,jdoe,secret,\n')
+        f.write(",,login,mail,,,0,,jdoe@mail.com,secret2,\n")
+    report = passstore_obj.import_file(path_csv, workers=1)
+    assert report["imported"] == 2
+    path_json = os.path.join(path_abs_tmp, "export.json")
+    with open(path_json, "w") as f:
+        json.dump([{"path": "Work/gitlab", "password": "other", "username": "jdoe"}], f)
+    assert passstore_obj.import_file(path_json, workers=1)["skipped"] == 1
+    assert passstore_obj.import_file(path_json, conflict="rename", workers=2)["renamed"] == 1
+    data_dict = passstore_obj.read_key(os.path.join("Work", "gitlab"))
+    assert data_dict == {
+        "PASSWORD": "secret", "user": "jdoe", "url": "https://gitlab.com", "notes": "line1\nline2"}
+    assert passstore_obj.read_key(os.path.join("Work", "gitlab_1"))["PASSWORD"] == "other"
+    assert sorted(passstore_obj.index_rel_paths()) == sorted([
+        os.path.join("Work", "gitlab"), os.path.join("Work", "gitlab_1"), "mail"])
+    assert os.path.isfile(utils.rel_to_abs(passstore_obj.path_store, "mail"))
+
+
+def test_import_failed(passstore_obj, tmp_path):
+    path_abs_tmp = str(tmp_path)
+    # An entry that cannot be replaced
+    os.makedirs(utils.rel_to_abs(passstore_obj.path_store, "gitlab"))
+    path_json = os.path.join(path_abs_tmp, "export.json")
+    with open(path_json, "w") as f:
+        json.dump([{"path": "gitlab", "password": "other"}, {"path": "mail", "password": "secret"}], f)
+    report = passstore_obj.import_file(path_json, conflict="overwrite", workers=1)
+    assert report == {"imported": 1, "renamed": 0, "overwritten": 0, "skipped": 0, "failed": 1}
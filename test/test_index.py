@@ -0,0 +1,39 @@
+import os
+import tempfile
+from PassUI import index, utils
+
+
+def make_store(path_abs_store, rel_paths):
+    for path_rel in rel_paths:
+        path_abs = utils.rel_to_abs(path_abs_store, path_rel)
+        os.makedirs(os.path.dirname(path_abs), exist_ok=True)
+        with open(path_abs, "wb") as f:
+            f.write(b"x")
+
+
+def test_reconcile():
+    with tempfile.TemporaryDirectory() as path_abs_tmp:
+        path_abs_store = os.path.join(path_abs_tmp, "store")
+        path_db = os.path.join(path_abs_tmp, "passui.db")
+        make_store(path_abs_store, ["a", os.path.join("b", "c"), os.path.join(".git", "d")])
+        index_obj = index.StoreIndex(path_abs_store, [".git"], path_db=path_db)
+        assert index_obj.reconcile() == 2
+        assert index_obj.rel_paths() == ["a", os.path.join("b", "c")]
+        index_obj.close()
+
+        # Reopening the snapshot does not rescan unchanged directories
+        make_store(path_abs_store, [os.path.join("b", "e", "f")])
+        os.remove(utils.rel_to_abs(path_abs_store, "a"))
+        index_obj = index.StoreIndex(path_abs_store, [".git"], path_db=path_db)
+        index_obj.reconcile()
+        assert index_obj.rel_paths() == [os.path.join("b", "c"), os.path.join("b", "e", "f")]
+        assert index_obj.rel_paths(ignored_files=[os.path.join("b", "c.gpg")]) == [os.path.join("b", "e", "f")]
+        index_obj.close()
+
+
+def test_nest_rel_paths():
+    rel_paths = ["a", os.path.join("b", "c"), os.path.join("b", "d", "e")]
+    assert utils.nest_rel_paths(rel_paths) == {
+        "a": "a",
+        "b": {"c": os.path.join("b", "c"), "d": {"e": os.path.join("b", "d", "e")}},
+    }
@@ -0,0 +1,74 @@
+import os
+from PassUI import jobs
+
+
+def make_directory(path_abs_dir):
+    os.makedirs(path_abs_dir)
+    for i in range(5):
+        with open(os.path.join(path_abs_dir, f"file{i}.bin"), "wb") as f:
+            f.write(os.urandom(3 << 20))
+
+
+def test_progress(passstore_obj, tmp_path):
+    path_abs_tmp = str(tmp_path)
+    path_abs_dir = os.path.join(path_abs_tmp, "folder")
+    make_directory(path_abs_dir)
+    reports = []
+    job = jobs.Job(callback=reports.append, interval=0)
+    assert passstore_obj.encrypt_directory(path_abs_dir, zip=True, format="tar", codec="none", job=job)
+    summary = job.summary(True)
+    assert summary["files_done"] == summary["files_total"] == 5
+    assert summary["bytes_done"] == summary["bytes_total"] == 15 << 20
+    assert reports[-1] is summary and len(reports) > 5
+    assert "MB/s" in jobs.format_progress(summary)
+
+
+def test_cancel(passstore_obj, tmp_path):
+    path_abs_tmp = str(tmp_path)
+    path_abs_dir = os.path.join(path_abs_tmp, "folder")
+    make_directory(path_abs_dir)
+
+    def cancel_after_two_files(progress):
+        if progress["files_done"] >= 2:
+            job.cancel()
+
+    for zip in (True, False):
+        job = jobs.Job(callback=cancel_after_two_files, interval=0)
+        try:
+            passstore_obj.encrypt_directory(path_abs_dir, replace=True, zip=zip, job=job)
+            assert False
+        except jobs.Cancelled:
+            pass
+        assert job.files_done == 2
+    # The archive was dropped, the two files encrypted one by one are kept
+    assert sorted(os.listdir(path_abs_tmp)) == ["folder"]
+    names = os.listdir(path_abs_dir)
+    assert len(names) == 5 and len([name for name in names if name.endswith(".bgpg")]) == 2
+
+
+def test_cancel_file(passstore_obj, tmp_path):
+    path_abs_tmp = str(tmp_path)
+    path_abs_dir = os.path.join(path_abs_tmp, "folder")
+    make_directory(path_abs_dir)
+    path_abs = os.path.join(path_abs_dir, "file0.bin")
+
+    def cancel_after_1_mb(progress):
+        if progress["bytes_done"] >= 1 << 20:
+            job.cancel()
+
+    job = jobs.Job(callback=cancel_after_1_mb, interval=0)
+    try:
+        passstore_obj.encrypt_file(path_abs, seekable=True, job=job)
+        assert False
+    except jobs.Cancelled:
+        pass
+    # Stopped between chunks, the partial container was dropped
+    assert job.files_done == 0 and job.bytes_done < 3 << 20
+    assert not [name for name in os.listdir(path_abs_dir) if name.startswith("file0.bin.")]
+
+    job = jobs.Job(interval=0)
+    assert passstore_obj.encrypt_file(path_abs, replace=True, seekable=True, job=job)
+    assert job.bytes_done == 3 << 20
+    job = jobs.Job(interval=0)
+    assert passstore_obj.decrypt_file(path_abs + ".bgpg", job=job)
+    assert job.files_done == 1 and job.bytes_done == 3 << 20
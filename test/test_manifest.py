@@ -0,0 +1,54 @@
+import os
+import hashlib
+from PassUI import jobs, manifest
+
+
+def test_incremental(passstore_obj, tmp_path):
+    path_abs_dir = str(tmp_path)
+    os.makedirs(os.path.join(path_abs_dir, "sub"))
+    paths_rel = ["a.txt", "b.txt", os.path.join("sub", "c.txt")]
+    for path_rel in paths_rel:
+        with open(os.path.join(path_abs_dir, path_rel), "w") as f:
+            f.write(path_rel)
+    # A .bgpg left by an earlier run without manifest is written again
+    with open(os.path.join(path_abs_dir, "a.txt.bgpg"), "wb") as f:
+        f.write(b"stale")
+
+    # Interrupted after the first file, then resumed
+    def cancel(progress):
+        job.cancel()
+
+    job = jobs.Job(callback=cancel, interval=0)
+    try:
+        manifest.encrypt_directory(passstore_obj, path_abs_dir, job=job)
+        assert False
+    except jobs.Cancelled:
+        pass
+    assert manifest.encrypt_directory(passstore_obj, path_abs_dir) == {"encrypted": 2, "unchanged": 1, "failed": 0}
+    assert manifest.encrypt_directory(passstore_obj, path_abs_dir) == {"encrypted": 0, "unchanged": 3, "failed": 0}
+
+    # Touched files are hashed, only modified files are encrypted again
+    os.utime(os.path.join(path_abs_dir, "a.txt"), (0, 0))
+    with open(os.path.join(path_abs_dir, "b.txt"), "w") as f:
+        f.write("changed")
+    assert passstore_obj.encrypt_directory(path_abs_dir, incremental=True)
+    assert manifest.Manifest(path_abs_dir).entries["a.txt"]["stat"][1] == 0
+    assert manifest.encrypt_directory(passstore_obj, path_abs_dir) == {"encrypted": 0, "unchanged": 3, "failed": 0}
+    passstore_obj.decrypt_file(os.path.join(path_abs_dir, "b.txt.bgpg"))
+    with open(os.path.join(path_abs_dir, "b.txt")) as f:
+        assert f.read() == "changed"
+
+
+def test_keyed_hash(passstore_obj, tmp_path):
+    path_abs_dir = str(tmp_path)
+    # Temporary files of the user are encrypted, those of a run are not
+    for name in ("notes.tmp", "a.txt.bgpg.tmp", manifest.MANIFEST_NAME + ".123.tmp"):
+        with open(os.path.join(path_abs_dir, name), "w") as f:
+            f.write("notes")
+    assert list(manifest.iter_files(path_abs_dir)) == ["notes.tmp"]
+    assert manifest.encrypt_directory(passstore_obj, path_abs_dir) == {"encrypted": 1, "unchanged": 0, "failed": 0}
+    # The manifest does not tell the plain hash of the content
+    with open(os.path.join(path_abs_dir, manifest.MANIFEST_NAME)) as f:
+        assert hashlib.sha256(b"notes").hexdigest() not in f.read()
+    assert manifest.Manifest(path_abs_dir).entries["notes.tmp"]["hash"] == manifest.file_hash(
+        os.path.join(path_abs_dir, "notes.tmp"), manifest.hash_key())
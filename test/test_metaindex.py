@@ -0,0 +1,31 @@
+import tempfile
+from PassUI import gpg, metaindex
+
+
+def test_search():
+    metadata = metaindex.MetadataIndex(tempfile.gettempdir())
+    metadata.update("work/grafana", {"PASSWORD": "secret", "user": "jdoe", "url": "https://grafana.example.com"})
+    metadata.update("perso/mail", {"PASSWORD": "secret", "user": "JDoe", "url": "https://mail.example.com"})
+    assert metadata.search("user", "jdoe") == ["perso/mail", "work/grafana"]
+    assert metadata.search("url", "grafana", contains=True) == ["work/grafana"]
+    assert metadata.search(value="https://mail.example.com") == ["perso/mail"]
+    assert metadata.search("PASSWORD") == []
+    metadata.rename("perso/mail", "perso/gmail")
+    metadata.remove("work/grafana")
+    assert metadata.search("user", "jdoe") == ["perso/gmail"]
+
+
+def test_deltas():
+    gpg_obj = gpg.GPG()
+    with tempfile.TemporaryDirectory() as path_abs_store:
+        metadata = metaindex.MetadataIndex(path_abs_store)
+        metadata.write_delta(gpg_obj, "a", {"PASSWORD": "secret", "user": "jdoe"})
+        metadata.write_delta(gpg_obj, "b", {"PASSWORD": "secret", "user": "jdoe"})
+        metadata.write_delta(gpg_obj, "a", None)
+        metadata = metaindex.MetadataIndex(path_abs_store)
+        metadata.load(gpg_obj, passphrase="test")
+        assert metadata.search("user", "jdoe") == ["b"]
+        assert metadata.list_deltas() == []
+        metadata = metaindex.MetadataIndex(path_abs_store)
+        metadata.load(gpg_obj, passphrase="test")
+        assert metadata.entries == {"b": {"user": "jdoe"}}
@@ -0,0 +1,37 @@
+import io
+import os
+from PassUI import gpg, packets
+
+
+def test_parse_header():
+    gpg_obj = gpg.GPG()
+    recipients = gpg_obj.recipients()
+    data = gpg_obj.encrypt_bytes(b"secret" * 10000)
+    message = gpg.PGPMessage.from_blob(data)
+    header = packets.parse_header(io.BytesIO(data))
+    assert header["data"] == "SEIPD"
+    assert {recipient["key_id"] for recipient in header["recipients"]} == set(message.encrypters)
+    assert all(recipient["algorithm"] == "RSA" for recipient in header["recipients"])
+    assert len(header["recipients"]) == len(recipients)
+    # Armored messages are read from their first lines too
+    assert packets.parse_header(io.BytesIO(str(message).encode()))["recipients"] == header["recipients"]
+    try:
+        packets.parse_header(io.BytesIO(b"not a message"))
+        assert False
+    except ValueError:
+        pass
+
+
+def test_audit_store(passstore_obj):
+    passstore_obj.write_key(os.path.join("work", "mail"), {"PASSWORD": "pw"})
+    with open(os.path.join(passstore_obj.path_store, "broken.gpg"), "wb") as f:
+        f.write(b"\x00")
+    path_abs = os.path.join(passstore_obj.path_store, "work", "mail.gpg")
+    assert packets.read_header(path_abs) is packets.read_header(path_abs)
+
+    report = passstore_obj.audit_recipients()
+    key_ids = sorted(key_info["key"] for key_info in passstore_obj.list_keys())
+    assert report["files"] == {os.path.join("work", "mail.gpg"): key_ids}
+    assert list(report["errors"]) == ["broken.gpg"]
+    assert all(key_info["files"] == 1 for key_info in report["keys"].values())
+    assert report["stale"] == [] and report["unknown"] == {}
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+import threading
+from PassUI import passphrase
+
+
+def test_providers():
+    asked = []
+    provider = passphrase.CachedProvider(
+        passphrase.CallbackProvider(lambda prompt: asked.append(prompt) or "test"), ttl=60)
+    assert provider.get_passphrase() == "test"
+    assert provider() == "test"
+    assert len(asked) == 1
+    provider.forget()
+    assert provider.get_passphrase() == "test"
+    assert len(asked) == 2
+
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"from fd\nignored")
+    os.close(write_fd)
+    provider = passphrase.EnvProvider(variable="PASSUI_TEST_PASSPHRASE", fd=read_fd)
+    assert provider.get_passphrase() == "from fd"
+    assert provider.get_passphrase() == "from fd"
+    os.close(read_fd)
+    try:
+        passphrase.CallbackProvider(lambda prompt: None).get_passphrase()
+        assert False
+    except ValueError:
+        pass
+
+
+def test_cached_unlocked():
+    asking, answer = threading.Event(), threading.Event()
+
+    def ask(prompt):
+        asking.set()
+        answer.wait(5)
+        return "test"
+
+    provider = passphrase.CachedProvider(passphrase.CallbackProvider(ask))
+    thread = threading.Thread(target=provider.get_passphrase)
+    thread.start()
+    assert asking.wait(5)
+    # Not blocked by the open prompt
+    forgetting = threading.Thread(target=provider.forget)
+    forgetting.start()
+    forgetting.join(1)
+    assert not forgetting.is_alive()
+    answer.set()
+    thread.join()
+    asking.clear()
+    assert provider.get_passphrase() == "test"
+    assert not asking.is_set()
+
+
+def test_backend_without_qt():
+    code = "import sys, PassUI.passstore; assert not any(m.startswith('PyQt5') for m in sys.modules)"
+    subprocess.run([sys.executable, "-c", code], check=True)
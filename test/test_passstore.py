@@ -1,6 +1,6 @@
 import os
 import tempfile
-from PassUI import passstore
+from PassUI import passstore, passphrase, utils, config
 
 
 def test_init():
@@ -20,7 +20,8 @@ def test_change_path_store():
 
 
 def test_wr():
-    passstore_obj = passstore.PassStore()
+    passstore_obj = passstore.PassStore(
+        passphrase_provider=passphrase.CallbackProvider(lambda prompt: "test"))
     data_input = {
         "PASSWORD": "test",
         "test": "test",
@@ -33,3 +34,74 @@ def test_wr():
     for key in data_input:
         assert data_input[key] == data_output[key]
     os.remove(os.path.join(passstore_obj.path_store, "test" + ".gpg"))
+
+
+def test_read_entry_decryptor(passstore_obj):
+    passstore_obj.write_key("test", {"PASSWORD": "test", "user": "me"})
+    decryptor = passstore_obj.decryptor("test")
+    # No passphrase asked, the keys are unlocked already
+    passstore_obj.passphrase_provider = passphrase.CallbackProvider(lambda prompt: None)
+    data_output = passstore_obj.read_entry("test", decryptor=decryptor)
+    assert data_output.to_dict() == {"PASSWORD": "test", "user": "me"}
+
+
+def test_batch(passstore_obj):
+    path_abs_store = passstore_obj.path_store
+    try:
+        with passstore_obj.batch():
+            assert passstore_obj.write_key(os.path.join("a", "b"), {"PASSWORD": "first"})
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert not os.path.exists(os.path.join(path_abs_store, "a"))
+    with passstore_obj.batch():
+        passstore_obj.write_key(os.path.join("a", "b"), {"PASSWORD": "first"})
+        passstore_obj.write_key("c", {"PASSWORD": "second"})
+        assert not os.path.exists(os.path.join(path_abs_store, "c.gpg"))
+    assert sorted(name for name in os.listdir(path_abs_store) if name != ".gpg-id") == ["a", "c.gpg"]
+    assert os.listdir(os.path.join(path_abs_store, "a")) == ["b.gpg"]
+    assert sorted(passstore_obj.index_rel_paths()) == [os.path.join("a", "b"), "c"]
+    assert passstore_obj.read_key("c")["PASSWORD"] == "second"
+
+
+def test_move_search_fields(passstore_obj):
+    passstore_obj.metadata_index = True
+    passstore_obj.write_key("entry", {"PASSWORD": "test", "user": "jdoe"})
+    assert passstore_obj.search_fields("user", "jdoe") == ["entry"]
+
+    # Loaded index
+    passstore_obj.move_entry("entry", os.path.join("folder", "entry"))
+    passstore_obj.copy_entry(os.path.join("folder", "entry"), "copy")
+    assert passstore_obj.search_fields("user", "jdoe") == ["copy", os.path.join("folder", "entry")]
+
+    # Deltas, the fields follow the entries without decrypting them
+    passstore_obj._encrypted_indexes.clear()
+    passstore_obj.move_folder("folder", "moved")
+    assert passstore_obj.search_fields("user", "jdoe") == ["copy", os.path.join("moved", "entry")]
+
+
+def test_open(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "get_config_path", lambda: tmp_path / "passui.yml")
+    monkeypatch.setattr(utils, "get_index_path", lambda: tmp_path / "passui.db")
+    path_store = tmp_path / "store"
+    path_store.mkdir()
+    config.write_yaml(utils.get_config_path(), {"settings": {"path_store": str(path_store)}})
+    provider = passphrase.CallbackProvider(lambda prompt: "test")
+    passstore_obj = passstore.PassStore(passphrase_provider=provider)
+    assert passstore_obj.write_key("test", {"PASSWORD": "test"})
+    passstore_obj.close()
+    config.flush()
+    stats = {
+        path: os.stat(path).st_mtime_ns
+        for path in (utils.get_config_path(), utils.get_index_path())
+        if os.path.isfile(path)}
+
+    passstore_obj = passstore.PassStore.open(passphrase_provider=provider)
+    assert passstore_obj.path_store == str(path_store)
+    assert passstore_obj.read_key("test")["PASSWORD"] == "test"
+    assert "test" in passstore_obj.rel_paths_gpg
+    assert not passstore_obj.write_key("test", {"PASSWORD": "changed"})
+    assert passstore_obj.read_key("test")["PASSWORD"] == "test"
+    config.flush()
+    for path, mtime_ns in stats.items():
+        assert os.stat(path).st_mtime_ns == mtime_ns
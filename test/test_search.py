@@ -0,0 +1,28 @@
+import os
+from PassUI import search
+
+
+def test_query_ranking():
+    search_obj = search.PathSearch([
+        os.path.join("work", "gitlab"),
+        os.path.join("work", "github", "token"),
+        os.path.join("perso", "mail"),
+        os.path.join("perso", "gmail", "backup"),
+    ])
+    paths = [path for score, path in search_obj.query("gitlab")]
+    assert paths[0] == os.path.join("work", "gitlab")
+    paths = [path for score, path in search_obj.query("gmail")]
+    assert paths[0] == os.path.join("perso", "gmail", "backup")
+    paths = [path for score, path in search_obj.query("wgt")]
+    assert os.path.join("work", "github", "token") in paths
+    assert search_obj.query("zzz") == []
+
+
+def test_incremental():
+    search_obj = search.PathSearch(["a/mail", "b/mail"])
+    search_obj.remove("a/mail")
+    search_obj.add("c/mail")
+    assert sorted(path for score, path in search_obj.query("mail")) == ["b/mail", "c/mail"]
+    assert search_obj.sync(["b/mail", "d/mail"]) == (1, 1)
+    assert sorted(path for score, path in search_obj.query("mail")) == ["b/mail", "d/mail"]
+    assert len(search_obj) == 2
@@ -0,0 +1,97 @@
+import io
+import os
+from PassUI import stream, passstore, passphrase
+
+
+def test_seekable():
+    passstore_obj = passstore.PassStore(
+        passphrase_provider=passphrase.CallbackProvider(lambda prompt: "test"))
+    decryptor = passstore_obj.decryptor("test")
+    data = os.urandom(5 * stream.CHUNK_SIZE + 123)
+    f = io.BytesIO()
+    with stream.SeekableWriter(f, passstore_obj.recipients()) as writer:
+        for i in range(0, len(data), 10000):
+            writer.write(data[i:i + 10000])
+
+    reader = stream.open_reader(io.BytesIO(f.getvalue()), decryptor)
+    assert isinstance(reader, stream.SeekableReader)
+    assert reader.size == len(data) and len(reader) == 6
+    assert b"".join(reader) == data
+    for offset, length in ((0, 10), (stream.CHUNK_SIZE - 5, 10), (100, 3 * stream.CHUNK_SIZE), (len(data) - 3, 10)):
+        assert reader.read(offset, length) == data[offset:offset + length]
+    file = reader.reader()
+    file.seek(-100, os.SEEK_END)
+    assert file.read() == data[-100:]
+
+    # Dropping the last chunk leaves the index pointing past the data
+    container = f.getvalue()
+    footer = container[-stream.FOOTER.size:]
+    index_length = stream.FOOTER.unpack(footer)[0]
+    truncated = container[:len(container) - stream.FOOTER.size - index_length - 123 - stream.TAG_SIZE]
+    truncated += container[len(container) - stream.FOOTER.size - index_length:]
+    reader = stream.SeekableReader(io.BytesIO(truncated), decryptor)
+    try:
+        reader.read(len(data) - 10, 10)
+        assert False
+    except ValueError:
+        pass
+    try:
+        stream.SeekableReader(io.BytesIO(container[:-1]), decryptor)
+        assert False
+    except ValueError:
+        pass
+
+
+def test_seekable_file(passstore_obj, tmp_path):
+    path_abs_tmp = str(tmp_path)
+    path_abs = os.path.join(path_abs_tmp, "file.bin")
+    data = os.urandom(1 << 20)
+    with open(path_abs, "wb") as f:
+        f.write(data)
+    assert passstore_obj.encrypt_file(path_abs, replace=True, seekable=True)
+    assert stream.is_seekable(path_abs + ".bgpg")
+    assert passstore_obj.read_range(path_abs + ".bgpg", 1000, 200000) == data[1000:201000]
+    # The passphrase is asked by the caller, e.g. on the GUI thread
+    passstore_obj.passphrase_provider = passphrase.CallbackProvider(lambda prompt: None)
+    assert passstore_obj.decrypt_file(path_abs + ".bgpg", passphrase="test")
+    with open(path_abs, "rb") as f:
+        assert f.read() == data
+
+
+def test_threads():
+    passstore_obj = passstore.PassStore(
+        passphrase_provider=passphrase.CallbackProvider(lambda prompt: "test"))
+    decryptor = passstore_obj.decryptor("test")
+    data = os.urandom(100 * 1024 + 7)
+    for writer_class in (stream.EncryptedWriter, stream.SeekableWriter):
+        containers = []
+        for threads in (1, 4):
+            f = io.BytesIO()
+            writer = writer_class(f, passstore_obj.recipients(), chunk_size=1000, threads=threads)
+            for i in range(0, len(data), 3000):
+                writer.write(data[i:i + 3000])
+            writer.close()
+            containers.append(f.getvalue())
+        # Same layout whatever the number of threads, the wrapped keys aside
+        sizes = [
+            len(container) - len(stream.MAGIC) - stream.LENGTH.size
+            - stream.LENGTH.unpack_from(container, len(stream.MAGIC))[0] for container in containers]
+        assert sizes[0] == sizes[1]
+        for container in containers:
+            for threads in (1, 3):
+                reader = stream.open_reader(io.BytesIO(container), decryptor, threads=threads)
+                assert b"".join(reader) == data
+        if writer_class is stream.SeekableWriter:
+            reader = stream.SeekableReader(io.BytesIO(containers[1]), decryptor, threads=3)
+            assert reader.read(1500, 60000) == data[1500:61500]
+            # Swapped chunks fail the check of their nonce
+            container = bytearray(containers[1])
+            start = reader._offsets[40]
+            size = 1000 + stream.TAG_SIZE
+            container[start:start + size], container[start + size:start + 2 * size] = (
+                container[start + size:start + 2 * size], container[start:start + size])
+            try:
+                b"".join(stream.SeekableReader(io.BytesIO(bytes(container)), decryptor, threads=3))
+                assert False
+            except ValueError:
+                pass
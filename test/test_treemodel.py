@@ -0,0 +1,63 @@
+import os
+from PyQt5 import QtCore, QtTest
+from PassUI import treemodel, utils
+
+
+def names(node):
+    return [child.name for child in node.children]
+
+
+def test_lazy_fetch(monkeypatch):
+    monkeypatch.setattr(treemodel, "FETCH_SIZE", 2)
+    model = treemodel.StoreTreeModel()
+    model.load(utils.nest_rel_paths(["b", "a", "c", os.path.join("d", "e"), os.path.join("d", "f", "g")]))
+    assert model.rowCount() == 0
+    assert model.canFetchMore(QtCore.QModelIndex())
+    model.fetchMore(QtCore.QModelIndex())
+    assert names(model.root) == ["a", "b"]
+    model.fetchMore(QtCore.QModelIndex())
+    model.fetchMore(QtCore.QModelIndex())
+    assert names(model.root) == ["a", "b", "c", "d"]
+    assert not model.canFetchMore(QtCore.QModelIndex())
+
+    node_d = model.root.children[3]
+    assert node_d.is_dir and model.hasChildren(model.index_of(node_d))
+    assert model.rowCount(model.index_of(node_d)) == 0
+    node_g = model.find(os.path.join("d", "f", "g"))
+    assert node_g.path_rel == os.path.join("d", "f", "g") and not node_g.is_dir
+    assert model.data(model.index_of(node_g), treemodel.PATH_ROLE) == node_g.path_rel
+    assert model.find(os.path.join("d", "x")) is None
+    # Fetches and checks the rest of the model
+    QtTest.QAbstractItemModelTester(model, QtTest.QAbstractItemModelTester.FailureReportingMode.Fatal)
+
+
+def test_changes():
+    model = treemodel.StoreTreeModel()
+    tester = QtTest.QAbstractItemModelTester(model, QtTest.QAbstractItemModelTester.FailureReportingMode.Fatal)
+    model.load(utils.nest_rel_paths(["a", "c", os.path.join("d", "e")]))
+    node_b = model.add_node(model.root, "b")
+    assert names(model.root) == ["a", "b", "c", "d"]
+    assert [child.row for child in model.root.children] == [0, 1, 2, 3]
+
+    model.rename_node(node_b, "z")
+    assert names(model.root) == ["a", "c", "d", "z"]
+    model.rename_node(node_b, "0")
+    assert names(model.root) == ["0", "a", "c", "d"]
+
+    node_d = model.find("d")
+    model.rename_node(node_d, "dir")
+    assert model.find(os.path.join("dir", "e")).path_rel == os.path.join("dir", "e")
+
+    model.move_node(node_b, node_d, "b")
+    assert node_b.path_rel == os.path.join("dir", "b")
+    assert names(node_d) == ["b", "e"]
+
+    model.remove_node(node_d)
+    assert names(model.root) == ["a", "c"]
+    assert model.find(os.path.join("dir", "b")) is None
+
+    edited = []
+    model.nameEdited.connect(lambda node, name: edited.append((node.name, name)))
+    model.setData(model.index_of(model.find("a")), "x")
+    assert edited == [("a", "x")] and model.find("a") is not None
+    del tester
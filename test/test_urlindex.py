@@ -0,0 +1,27 @@
+import tempfile
+from PassUI import urlindex
+
+
+def test_normalize_host():
+    assert urlindex.normalize_host("https://www.Example.com:8443/login?x=1") == "example.com"
+    assert urlindex.normalize_host("grafana.example.com") == "grafana.example.com"
+    assert urlindex.normalize_host("") is None
+    assert urlindex.registrable_domain("a.b.example.co.uk") == "example.co.uk"
+    assert urlindex.registrable_domain("a.b.example.com") == "example.com"
+
+
+def test_lookup():
+    url_index = urlindex.UrlIndex(tempfile.gettempdir())
+    url_index.update("example", {"PASSWORD": "x", "url": "https://example.com"})
+    url_index.update("gitlab", {"PASSWORD": "x", "url": "https://gitlab.example.com/users/sign_in"})
+    url_index.update("other", {"PASSWORD": "x", "notes": "http://other.org"})
+    url_index.update("ip", {"PASSWORD": "x", "url": "http://10.0.0.1:8080"})
+    assert url_index.lookup("https://ci.gitlab.example.com") == ["gitlab"]
+    assert url_index.lookup("www.example.com") == ["example"]
+    assert url_index.lookup("http://other.org/a") == ["other"]
+    assert url_index.lookup("10.0.0.1") == ["ip"]
+    assert url_index.lookup("example.org") == []
+    url_index.remove("example")
+    # Siblings of the same registrable domain are the fallback
+    assert url_index.lookup("wiki.example.com") == ["gitlab"]
+    assert urlindex.UrlIndex(tempfile.gettempdir()).lookup("example.com") == []